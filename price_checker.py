@@ -9,27 +9,105 @@ Versión simplificada: Sin rich, colorama o tabulate. Solo texto plano.
 """
 from __future__ import annotations
 
+import time
+
+# --profile-startup: marcas de arranque (etiqueta -> perf_counter), la primera gana
+STARTUP_MARKS = {"start": time.perf_counter()}
+
+import abc
 import argparse
+import base64
+import bisect
+import concurrent.futures
+import contextlib
+import csv
+import functools
+import gc
+import hashlib
+import heapq
+import importlib.util
+import io
+import json
 import logging
+import math
+import operator
 import os
+import queue
+import random
 import shutil
+import signal
+import socket
+import struct
 import sys
-import time
+import threading
+import unicodedata
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, UTC
-from typing import Dict, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+STARTUP_MARKS.setdefault("stdlib imports", time.perf_counter())
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+STARTUP_MARKS.setdefault("requests/urllib3", time.perf_counter())
+
 # >>> INTEGRACIÓN COINBASE - AJUSTADA PARA SDK 'coinbase' <<<
-try:
+# El SDK se importa en su primer uso (create_coinbase_client_instance); aquí solo se comprueba que exista
+HAS_COINBASE = importlib.util.find_spec("coinbase") is not None
+if TYPE_CHECKING:
     from coinbase.wallet.client import Client as CoinbaseClient
-    HAS_COINBASE = True
-except ImportError:
-    HAS_COINBASE = False
 # >>> FIN INTEGRACIÓN COINBASE <<<
 
+# Los subsistemas opcionales (NumPy, servidores HTTP, procesos, TLS, tracemalloc...) se importan en su
+# primer uso: un arranque normal solo paga requests. Aquí solo se comprueba qué hay instalado.
+if TYPE_CHECKING:
+    import multiprocessing
+    import tracemalloc
+    from http.server import ThreadingHTTPServer
+
+
+def _lazy_import(name: str) -> Optional[Any]:
+    """Module `name` registered in sys.modules but executed on first attribute access (None if missing)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# Decodificadores JSON rápidos opcionales (orjson > msgspec > json de la stdlib)
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+HAS_MSGSPEC = importlib.util.find_spec("msgspec") is not None
+
+# 'resource' no existe en Windows; solo se usa para medir el pico de RSS
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+# NumPy es opcional: habilita el motor de señales vectorizado (se ejecuta al primer acceso a np.*)
+np = _lazy_import("numpy")
+HAS_NUMPY = np is not None
+
+# tomllib (3.11+) solo hace falta para archivos --config en TOML; JSON siempre funciona
+HAS_TOMLLIB = importlib.util.find_spec("tomllib") is not None
+
+STARTUP_MARKS.setdefault("optional deps (numpy/orjson/...)", time.perf_counter())
+
 # --- 1. CONFIGURACIÓN & CREDENCIALES ---
 
 # Credenciales de Plataformas (Obtenidas de variables de entorno)
@@ -38,6 +116,11 @@ TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
 COINBASE_API_KEY = os.environ.get("COINBASE_API_KEY", "")
 COINBASE_API_SECRET = os.environ.get("COINBASE_API_SECRET", "")
 DEFAULT_TRADE_AMOUNT_USD = 10.0 # Monto de la orden de compra en USD
+ACCOUNT_INDEX_TTL = 15 * 60     # Segundos antes de refrescar el índice de cuentas de Coinbase
+ACCOUNT_MISS_REFRESH = 60       # Mínimo entre refrescos forzados por una moneda desconocida
+ORDER_COOLDOWN_SECONDS = 60 * 60  # No recomprar la misma moneda dentro de esta ventana
+ORDER_MAX_PARALLEL = 4
+COINBASE_AUTH_TIMEOUT = 30.0   # Lo que la etapa 'trade' espera a la autenticación en segundo plano
 
 # Defaults
 DEFAULT_CRYPTOS = "bitcoin,ethereum,solana,boricoin,ripple,binancecoin,cardano,avalanche-2,chainlink,polygon,dogecoin,arbitrum,render-token,fetch-ai,pepe,bonk,shiba-inu,xyo"
@@ -47,6 +130,10 @@ DEFAULT_INTERVAL = 10 # seconds
 # CoinGecko API
 API_URL = "https://api.coingecko.com/api/v3/coins/markets"
 RATE_LIMIT_WAIT_TIME = 60 
+MAX_IDS_PARAM_CHARS = 1800  # Longitud máxima del parámetro 'ids' por petición (URL segura)
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_CALLS_PER_MINUTE = 30  # Cuota aproximada del plan gratuito de CoinGecko
+BENCH_CALLS_PER_MINUTE = 60_000  # El benchmark pasa por el limitador sin que la cuota real lo frene
 
 # Logging configuration
 logger = logging.getLogger("price_checker")
@@ -56,11 +143,192 @@ formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 logger.addHandler(handler)
 
 
+# --- 1.1 INSTRUMENTACIÓN (histogramas de latencia y contadores) ---
+
+# Límites superiores (segundos) de los buckets; preasignados una vez
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram; observe() is a bisect plus two additions
+    under a lock (the fetch pool observes from several threads at once).
+    """
+    __slots__ = ("bounds", "counts", "total", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # último bucket = +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.total += value
+            self.count += 1
+
+    def read(self) -> Tuple[List[int], float, int]:
+        """Consistent (counts, sum, count) copy for exporters."""
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class MetricsRegistry:
+    """Process-wide histograms (per instrumented stage) and monotonic counters."""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> Histogram:
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.get(name) or self.histograms.setdefault(name, Histogram())
+        return hist
+
+    def inc(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _read(self) -> Tuple[Dict[str, Tuple[Histogram, List[int], float, int]], Dict[str, float]]:
+        with self._lock:
+            histograms, counters = list(self.histograms.items()), dict(self.counters)
+        return {name: (h, *h.read()) for name, h in histograms}, counters
+
+    def snapshot(self) -> Dict[str, Any]:
+        histograms, counters = self._read()
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "counters": counters,
+            "stages": {
+                name: {"count": count, "sum_seconds": total, "buckets": dict(zip([*map(str, h.bounds), "+Inf"], counts))}
+                for name, (h, counts, total, count) in histograms.items()
+            },
+        }
+
+    def prometheus(self) -> str:
+        histograms, counters = self._read()
+        lines = ["# TYPE price_checker_stage_seconds histogram"]
+        for name, (h, counts, total, count) in histograms.items():
+            cumulative = 0
+            for bound, bucket_count in zip([*map(str, h.bounds), "+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f'price_checker_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'price_checker_stage_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'price_checker_stage_seconds_count{{stage="{name}"}} {count}')
+        for name, value in counters.items():
+            lines.append(f"# TYPE price_checker_{name} counter")
+            lines.append(f"price_checker_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def instrumented(stage: str):
+    """Decorator recording each call's wall time (monotonic clock) in METRICS[stage]."""
+    def decorator(func):
+        hist = METRICS.histogram(stage)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@functools.lru_cache(maxsize=None)
+def _with_bases(methods: type, *bases: str) -> type:
+    """
+    `methods` mixed over `bases` ("module:Class"). Request handlers and servers
+    are declared as plain mixins and assembled on first use, so importing this
+    module does not load http.server/socketserver.
+    """
+    resolved = tuple(getattr(importlib.import_module(module), name) for module, _, name in (base.partition(":") for base in bases))
+    return type(methods.__name__, (methods, *resolved), {"__module__": methods.__module__, "__doc__": methods.__doc__})
+
+
+class MetricsRequestHandler:
+    """GET /metrics (Prometheus text) and /metrics.json (over http.server:BaseHTTPRequestHandler)."""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(METRICS.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = METRICS.prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves the metrics on a local port from a daemon thread."""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _with_bases(MetricsRequestHandler, "http.server:BaseHTTPRequestHandler"))
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("📈 Metrics available at http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+
+def start_metrics_dump(path: str, every: float = 60.0) -> threading.Thread:
+    """Periodically writes METRICS.snapshot() as JSON (atomic replace) from a daemon thread."""
+    def loop() -> None:
+        while True:
+            time.sleep(every)
+            tmp = f"{path}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(METRICS.snapshot(), f)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning("Could not write metrics dump %s: %s", path, e)
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
+
+
+def print_startup_profile(stream: Any = None) -> None:
+    """Prints the --profile-startup breakdown: each mark with its delta and cumulative time."""
+    stream = stream or sys.stderr
+    marks = sorted(STARTUP_MARKS.items(), key=operator.itemgetter(1))
+    origin = previous = marks[0][1]
+    print("\n=== STARTUP PROFILE ===", file=stream)
+    print(f"{'Etapa':<36} {'Δ ms':>9} {'Total ms':>9}", file=stream)
+    for label, at in marks[1:]:
+        print(f"{label:<36} {(at - previous) * 1000:>9.1f} {(at - origin) * 1000:>9.1f}", file=stream)
+        previous = at
+    print("(Detalle por módulo: python -X importtime price_checker.py ...)", file=stream)
+
+
 # --- 2. AUXILIARY CONNECTION AND UTILITY FUNCTIONS ---
 
-def create_session(retries: int = 3, backoff_factor: float = 1.0, status_forcelist: Optional[List[int]] = None) -> requests.Session:
-    """Configures an HTTP session with retries for network errors and rate limits."""
-    status_forcelist = status_forcelist or [429, 500, 502, 503, 504] 
+def create_session(retries: int = 3, backoff_factor: float = 1.0, status_forcelist: Optional[List[int]] = None, pool_maxsize: int = 10,
+                   respect_retry_after: bool = False) -> requests.Session:
+    """
+    Configures an HTTP session with retries for network and server errors.
+    429s are not retried here: urllib3 would otherwise sleep on Retry-After
+    behind the limiter's back, which owns the backoff (TokenBucketLimiter).
+    """
+    status_forcelist = status_forcelist or [500, 502, 503, 504]
     session = requests.Session()
     retry = Retry(
         total=retries,
@@ -69,14 +337,211 @@ def create_session(retries: int = 3, backoff_factor: float = 1.0, status_forceli
         allowed_methods=["HEAD", "GET", "OPTIONS"],
         raise_on_redirect=True,
         raise_on_status=False,
-        respect_retry_after_header=True, 
+        respect_retry_after_header=respect_retry_after, 
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
 
 
+class TokenBucketLimiter:
+    """
+    Client-side token bucket placed in front of every CoinGecko call.
+    Each caller reserves the earliest allowed slot and sleeps only until then;
+    429/Retry-After feedback halves the rate, successes slowly restore it.
+    """
+
+    def __init__(self, calls_per_minute: float, burst: Optional[int] = None, min_calls_per_minute: float = 1.0):
+        if not calls_per_minute > 0 or not min_calls_per_minute > 0:
+            raise ValueError(f"El límite de llamadas por minuto debe ser > 0 (recibido {calls_per_minute})")
+        self.max_rate = calls_per_minute / 60.0
+        self.min_rate = min(min_calls_per_minute, calls_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = float(burst if burst is not None else max(1, int(calls_per_minute // 10)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0  # Respuestas 429 recibidas
+        self.delayed = 0    # Peticiones que tuvieron que esperar su turno
+        self.rejected = 0   # Peticiones descartadas por superar max_wait
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """Blocks until the next allowed slot; returns False (without consuming) if that is beyond max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1.0 - self._tokens) / self.rate, self._blocked_until - now)
+            if max_wait is not None and wait > max_wait:
+                self.rejected += 1
+                return False
+            self._tokens -= 1.0
+            if wait > 0:
+                self.delayed += 1
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def feedback(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Adapts the rate from the response: back off on 429, recover on success."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status_code == 429:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2.0)
+                pause = retry_after if retry_after is not None else 1.0 / self.rate
+                self._blocked_until = max(self._blocked_until, now + pause)
+                self._tokens = min(self._tokens, 0.0)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls_per_minute": round(self.rate * 60.0, 2),
+            "throttled": self.throttled,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+        }
+
+
+class CachedResponse:
+    """One cached /coins/markets page: decoded payload plus HTTP validators."""
+    __slots__ = ("payload", "digest", "etag", "last_modified", "fresh_until", "stored_at")
+
+    def __init__(self, payload: List[MarketRecord], digest: bytes, etag: Optional[str], last_modified: Optional[str], fresh_until: float):
+        self.payload = payload
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+        self.stored_at = time.monotonic()
+
+
+class ResponseCache:
+    """
+    Bounded LRU of CoinGecko responses keyed by normalized request params.
+    Fresh entries (Cache-Control max-age minus Age) are served without a request;
+    stale ones are revalidated with If-None-Match / If-Modified-Since. On 304, or on
+    a 200 whose body is byte-identical, the previously decoded payload object is
+    reused, so callers can detect "unchanged" by identity and skip recomputation.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 15 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[Tuple[str, str], ...], CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.merged: Tuple[Tuple[Any, ...], List[MarketRecord]] = ((), [])
+
+    @staticmethod
+    def key(params: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        normalized = {k: str(v) for k, v in params.items()}
+        if "ids" in normalized:
+            normalized["ids"] = ",".join(sorted(i.strip() for i in normalized["ids"].split(",") if i.strip()))
+        return tuple(sorted(normalized.items()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.merged = ((), [])
+
+    def get(self, key: Tuple[Tuple[str, str], ...]) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key: Tuple[Tuple[str, str], ...], resp: requests.Response, previous: Optional[CachedResponse]) -> Optional[List[MarketRecord]]:
+        """Stores a 200/304 response and returns the payload to use (reused when unchanged)."""
+        # Primero todas las directivas: no-cache/no-store mandan sobre max-age sea cual sea el orden
+        directives: Dict[str, str] = {}
+        for directive in resp.headers.get("Cache-Control", "").lower().split(","):
+            name, _, value = directive.strip().partition("=")
+            directives[name] = value.strip().strip('"')
+        if "no-store" in directives:
+            with self._lock:
+                self._entries.pop(key, None)
+            if resp.status_code == 304:
+                return previous.payload if previous is not None else None
+            return self._decode(resp)
+        max_age_value = directives.get("max-age", "")
+        max_age = float(max_age_value) if max_age_value.isdigit() and "no-cache" not in directives else 0.0
+        try:
+            age = float(resp.headers.get("Age", 0))
+        except ValueError:
+            age = 0.0
+        fresh_until = time.monotonic() + max(0.0, max_age - age)
+
+        if resp.status_code == 304:
+            if previous is None:
+                return None
+            METRICS.inc("cache_not_modified_total")
+            payload, digest = previous.payload, previous.digest
+        else:
+            digest = hashlib.blake2b(resp.content, digest_size=16).digest()
+            if previous is not None and previous.digest == digest:
+                METRICS.inc("cache_identical_body_total")
+                payload = previous.payload
+            else:
+                payload = self._decode(resp)
+                if payload is None:
+                    return None
+
+        entry = CachedResponse(payload, digest, resp.headers.get("ETag") or (previous.etag if previous else None),
+                               resp.headers.get("Last-Modified") or (previous.last_modified if previous else None), fresh_until)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    @staticmethod
+    def _decode(resp: requests.Response) -> Optional[List[MarketRecord]]:
+        # Un cuerpo que no se puede decodificar no se guarda: la próxima petición lo pide entero
+        try:
+            return decode_market_payload(resp.content)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Malformed response from CoinGecko (not cached): %s", e)
+            return None
+
+    def merge(self, pages: Sequence[Optional[List[MarketRecord]]]) -> List[MarketRecord]:
+        """merge_market_pages() that returns the previous list when every page is unchanged."""
+        pages = tuple(pages)
+        previous_pages, previous = self.merged
+        if len(previous_pages) == len(pages) and all(a is b for a, b in zip(previous_pages, pages)):
+            return previous
+        merged = merge_market_pages(pages)
+        self.merged = (pages, merged)
+        return merged
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
 def clear_terminal() -> None:
     """Clears the terminal (works on Windows, Linux, and Termux)."""
     if os.name == "nt":
@@ -85,23 +550,39 @@ def clear_terminal() -> None:
         os.system("clear")
 
 
-def fetch_data(session: requests.Session, cryptos: str, currency: str, per_page: int = 100, timeout: int = 10) -> Optional[List[dict]]:
-    """Fetches data from CoinGecko with retry handling."""
-    params = {
-        "vs_currency": currency,
-        "ids": cryptos,
-        "order": "market_cap_desc",
-        "per_page": per_page,
-        "page": 1,
-        "sparkline": "false",
-        "price_change_percentage": "24h,7d",
-    }
+def _fetch_page(session: requests.Session, params: Dict[str, Any], timeout: int, limiter: Optional[TokenBucketLimiter] = None, max_wait: Optional[float] = None,
+                cache: Optional[ResponseCache] = None) -> Optional[List[MarketRecord]]:
+    """Performs a single /coins/markets request with the usual error handling."""
+    key = cached = None
+    headers: Dict[str, str] = {}
+    if cache is not None:
+        key = ResponseCache.key(params)
+        cached = cache.get(key)
+        if cached is not None:
+            if time.monotonic() < cached.fresh_until:
+                METRICS.inc("cache_fresh_hits_total")
+                return cached.payload
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+    if limiter is not None and not limiter.acquire(max_wait):
+        logger.debug("CoinGecko request skipped: no rate-limit slot within %ss.", max_wait)
+        return None
     try:
-        resp = session.get(API_URL, params=params, timeout=timeout)
+        resp = session.get(API_URL, params=params, timeout=timeout, headers=headers or None)
+        _count_response(resp)
+        if limiter is not None:
+            limiter.feedback(resp.status_code, parse_retry_after(resp.headers.get("Retry-After")))
         resp.raise_for_status()
-        return resp.json()
+        if cache is not None and (resp.status_code == 200 or (resp.status_code == 304 and cached is not None)):
+            return cache.store(key, resp, cached)
+        return decode_market_payload(resp.content)
     except requests.exceptions.HTTPError as e:
-        if resp.status_code == 429:
+        if resp.status_code == 429 and limiter is not None:
+            logger.warning("Rate Limit (429) hit. ⚠️ Throttling to %.1f calls/min.", limiter.rate * 60.0)
+        elif resp.status_code == 429:
             logger.error(f"Rate Limit (429) hit. ⚠️ Waiting {RATE_LIMIT_WAIT_TIME} seconds...")
             time.sleep(RATE_LIMIT_WAIT_TIME)
         else:
@@ -110,369 +591,4831 @@ def fetch_data(session: requests.Session, cryptos: str, currency: str, per_page:
     except requests.exceptions.RequestException as e:
         logger.warning("Connection Error with CoinGecko: %s", e)
         return None
+    except (ValueError, TypeError, AttributeError) as e:
+        # Cuerpo truncado, HTML de un proxy o forma inesperada: se trata como un fallo de red
+        logger.warning("Malformed response from CoinGecko: %s", e)
+        return None
 
-# --- 3. FORMATTING AND ALERT LOGIC FUNCTIONS ---
-
-def format_price(price: Optional[float], decimal_limit: int = 2) -> str:
-    """Formats the price, using more decimals for very low values."""
-    if price is None:
-        return "N/A"
-    try:
-        if price < 0.1:
-            return f"${price:,.8f}"
-        return f"${price:,.{decimal_limit}f}"
-    except (ValueError, TypeError):
-        return str(price)
 
-def format_percent(value: Optional[float]) -> str:
-    """Formats the percentage change with a sign."""
-    if value is None:
-        return "N/A"
-    return f"{value:+.2f}%"
+def _count_response(resp: requests.Response) -> None:
+    """Updates the HTTP counters (requests, 429s, urllib3 retries, bytes received)."""
+    METRICS.inc("coingecko_requests_total")
+    if resp.status_code == 429:
+        METRICS.inc("coingecko_429_total")
+    retries = getattr(getattr(resp.raw, "retries", None), "history", None)
+    if retries:
+        METRICS.inc("coingecko_retries_total", len(retries))
+    METRICS.inc("coingecko_bytes_received_total", len(resp.content))
 
-# Se elimina la función escape_markdown_v2 ya que se usa HTML Parse Mode
 
-def compute_alert(change_24h: Optional[float], change_7d: Optional[float]) -> str:
-    """Calculates the buy/sell/risk alert (texto plano) con más variedades."""
-    if change_24h is None or change_7d is None:
-        return ""
+def _json_loads(data: Union[bytes, str]) -> Any:
+    """Decodes with the fastest installed codec; the first call imports it and rebinds this name."""
+    global _json_loads
+    if HAS_ORJSON:
+        import orjson
+        _json_loads = orjson.loads
+    elif HAS_MSGSPEC:
+        import msgspec.json
+        _json_loads = msgspec.json.decode
+    else:
+        _json_loads = json.loads
+    return _json_loads(data)
 
-    # 1. Señal de VENTA / EUFORIA (FOMO)
-    if change_24h > 10.0 and change_7d > 15.0:
-        return "💸 VENTA! (FOMO)"
 
-    # 2. Señal de RIESGO / VENTA (BULL TRAP)
-    elif change_24h > 6.0 and change_7d < 0.0:
-        return "⚠️ BULL TRAP / VENTA C/P"
+def _json_dumps(obj: Any) -> bytes:
+    """Encodes to compact UTF-8 JSON; like _json_loads, binds the codec on first call."""
+    global _json_dumps
+    if HAS_ORJSON:
+        import orjson
+        _json_dumps = orjson.dumps
+    elif HAS_MSGSPEC:
+        import msgspec.json
+        _json_dumps = msgspec.json.encode
+    else:
+        _json_dumps = _stdlib_json_dumps
+    return _json_dumps(obj)
 
-    # 3. Señal de RIESGO MÁXIMO (CAPITULACIÓN)
-    elif change_24h < -8.0 and change_7d < -15.0:
-        return "💀 CAPITULACIÓN/PÁNICO"
 
-    # 4. Señal de COMPRA FUERTE (REVERSIÓN V o B) - Rebote en 24h tras caída de 7d
-    # Ocurre cuando ya viste Capitulación y el precio rebota fuerte
-    elif change_24h > 4.0 and change_7d < -5.0:
-        return "📈 REVERSIÓN V/B (COMPRA)"
+def _stdlib_json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
 
-    # 5. Señal de RUPTURA ALCISTA (CONTINUACIÓN)
-    elif change_24h > 5.0 and change_7d > 3.0 and change_7d < 10.0:
-        return "🚀 RUPTURA ALCISTA (COMPRA)"
+# Campos de /coins/markets que usa el analizador -> atributo de MarketRecord
+MARKET_FIELDS = {
+    "id": "id",
+    "symbol": "symbol",
+    "current_price": "price",
+    "market_cap": "market_cap",
+    "price_change_percentage_24h_in_currency": "change_24h",
+    "price_change_percentage_7d_in_currency": "change_7d",
+}
 
-    # 6. Señal de COMPRA (DIP) - Corrección dentro de una tendencia alcista sana
-    elif change_24h < -4.0 and change_7d > 0.0:
-        return "📉 COMPRA! (DIP)"
 
-    # 7. Señal de ACUMULACIÓN (Largo Plazo)
-    elif change_24h < -1.0 and change_24h > -4.0 and change_7d < -10.0:
-        return "💎 ACUMULACIÓN FUERTE (LT)"
+class MarketRecord:
+    """
+    Compact projection of one /coins/markets entry (6 of its ~30 fields).
+    Ids and symbols are interned so they are shared across ticks. get() and
+    record[field] accept the CoinGecko field names, so code written against the
+    raw dicts keeps working.
+    """
+    __slots__ = ("id", "symbol", "price", "market_cap", "change_24h", "change_7d")
 
-    # 8. Señal de CRECIMIENTO SALUDABLE (MOMENTUM)
-    elif change_24h > 2.0 and change_7d > 8.0:
-        return "🟢 MOMENTUM SALUDABLE"
+    def __init__(self, id: str, symbol: str, price: Optional[float], market_cap: Optional[float],
+                 change_24h: Optional[float], change_7d: Optional[float]):
+        self.id = id
+        self.symbol = symbol
+        self.price = price
+        self.market_cap = market_cap
+        self.change_24h = change_24h
+        self.change_7d = change_7d
 
-    # 9. Señal de ADVERTENCIA (CORRECCIÓN C/P)
-    elif -4.0 <= change_24h < -2.0 and change_7d > 10.0:
-        return "⚠️ CORRECCIÓN C/P"
+    @classmethod
+    def from_coin(cls, coin: dict) -> "MarketRecord":
+        return cls(sys.intern(coin.get("id") or ""), sys.intern(coin.get("symbol") or ""), coin.get("current_price"),
+                   coin.get("market_cap"), coin.get("price_change_percentage_24h_in_currency"),
+                   coin.get("price_change_percentage_7d_in_currency"))
 
-    # 10. Señal de CONSOLIDACIÓN (RANGO)
-    elif -1.5 <= change_24h <= 1.5 and -3.0 <= change_7d <= 3.0:
-        return "😴 RANGO/CONSOLIDACIÓN"
+    def get(self, key: str, default: Any = None) -> Any:
+        attr = MARKET_FIELDS.get(key)
+        value = getattr(self, attr) if attr is not None else None
+        return default if value is None else value
 
-    # 11. Señal de ESTABILIDAD (Cierre, debe ser la última)
-    elif -1.0 <= change_24h <= 1.0:
-        return "⚖️ ESTABLE"
+    def __getitem__(self, key: str) -> Any:
+        attr = MARKET_FIELDS.get(key)
+        if attr is None:
+            raise KeyError(key)
+        return getattr(self, attr)
 
-    else:
-        return ""
+    def as_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, attr) for field, attr in MARKET_FIELDS.items()}
 
-def compute_projection(current_price: Optional[float], change_24h: Optional[float]) -> str:
-    """Calculates a simple 48-hour price projection (LINEAR ASSUMPTION)."""
-    if current_price is None or change_24h is None:
-        return "N/A"
 
-    try:
-        projection_factor = 1 + (change_24h / 100.0)
-        projected_price = current_price * projection_factor
+@instrumented("json_decode")
+def decode_market_payload(content: bytes) -> List[MarketRecord]:
+    """Decodes a /coins/markets response body (fast backend when available) into compact records."""
+    from_coin = MarketRecord.from_coin
+    return [from_coin(coin) for coin in _json_loads(content)]
 
-        return format_price(projected_price)
 
-    except (ValueError, TypeError):
-        return "N/A"
+def _market_params(currency: str, ids: str, per_page: int, page: int) -> Dict[str, Any]:
+    return {
+        "vs_currency": currency,
+        "ids": ids,
+        "order": "market_cap_desc",
+        "per_page": per_page,
+        "page": page,
+        "sparkline": "false",
+        "price_change_percentage": "24h,7d",
+    }
 
-def compute_technical_sentiment(change_24h: Optional[float], change_7d: Optional[float]) -> str:
-    """Simulates a technical analysis summary (e.g., Moving Averages + RSI) based on momentum (texto plano)."""
-    if change_24h is None or change_7d is None:
-        return ""
-
-    if change_24h > 5.0 and change_7d > 10.0:
-        return "FUERTE COMPRA (Golden Cross)"
-    elif change_24h > 2.0 and change_7d > 0:
-        return "COMPRA"
-    elif change_24h < -5.0 and change_7d < -10.0:
-        return "FUERTE VENTA (Death Cross)"
-    elif change_24h < -2.0 and change_7d < 0:
-        return "VENTA"
-    elif -2.0 <= change_24h <= 2.0 and -5.0 <= change_7d <= 5.0:
-        return "NEUTRAL"
-    elif change_24h > 7.0 and change_7d > 20.0:
-        return "NEUTRAL (Sobrecompra)"
-    else:
-        return "NEUTRAL"
 
-def compute_time_to_plr(current_price: Optional[float], change_24h: Optional[float], suggested_limit_price: Optional[float]) -> str:
-    """Estimates the time it would take for the price to reach the Suggested Limit Price (PLR)."""
-    if current_price is None or change_24h is None or suggested_limit_price is None or suggested_limit_price == 0:
-        return "N/A"
+def chunk_ids(ids: Sequence[str], max_chars: int = MAX_IDS_PARAM_CHARS) -> List[List[str]]:
+    """Splits the id list into chunks whose comma-joined form stays under max_chars."""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for coin_id in ids:
+        extra = len(coin_id) + (1 if current else 0)
+        if current and length + extra > max_chars:
+            chunks.append(current)
+            current, length = [], 0
+            extra = len(coin_id)
+        current.append(coin_id)
+        length += extra
+    if current:
+        chunks.append(current)
+    return chunks
 
-    target_change_pct = ((suggested_limit_price - current_price) / current_price) * 100
-    velocity_per_hour = change_24h / 24.0
 
-    if abs(velocity_per_hour) < 0.001:
-        return "N/A (Velocidad 0)"
+def plan_market_requests(ids: Sequence[str], currency: str, per_page: int) -> List[Dict[str, Any]]:
+    """Query params for every (URL-safe chunk, page) needed to cover the id list."""
+    requests_to_make = []
+    for chunk in chunk_ids(ids):
+        pages = max(1, math.ceil(len(chunk) / per_page))
+        joined = ",".join(chunk)
+        requests_to_make.extend(_market_params(currency, joined, per_page, page) for page in range(1, pages + 1))
+    return requests_to_make
 
-    if (target_change_pct > 0 and velocity_per_hour < 0) or \
-       (target_change_pct < 0 and velocity_per_hour > 0):
-        return "N/A (Dir. Incompatible)"
 
-    try:
-        hours_needed = target_change_pct / velocity_per_hour
-
-        if hours_needed < 0: 
-            return "N/A (Reversión Necesaria)"
-
-        if hours_needed >= 24 * 30: 
-            months = round(hours_needed / (24 * 30))
-            return f"~{months} meses"
-        elif hours_needed >= 24: 
-            days = round(hours_needed / 24)
-            return f"~{days} días"
-        elif hours_needed > 1: 
-            return f"~{round(hours_needed, 1)} horas"
-        else: 
-            minutes = max(1, round(hours_needed * 60))
-            return f"~{minutes} minutos"
+def merge_market_pages(pages: Sequence[Optional[List[MarketRecord]]]) -> List[MarketRecord]:
+    """Deduplicates coins across pages and orders them by market cap."""
+    merged: Dict[str, dict] = {}
+    for page in pages:
+        for coin in page or []:
+            merged.setdefault(coin.get("id"), coin)
+    return sorted(merged.values(), key=lambda c: -(c.get("market_cap") or 0))
 
-    except (ZeroDivisionError, ValueError, TypeError):
-        return "N/A"
 
-# --- 4. TABLE PRINTING, TELEGRAM NOTIFICATION Y COINBASE ORDER FUNCTION ---
+def fetch_data_chunked(session: requests.Session, ids: Sequence[str], currency: str, per_page: int = 100, timeout: int = 10, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, limiter: Optional[TokenBucketLimiter] = None, max_wait: Optional[float] = None,
+                       cache: Optional[ResponseCache] = None) -> Optional[List[MarketRecord]]:
+    """
+    Fetches a large watchlist as URL-safe id chunks, paging through each chunk,
+    with all requests running concurrently on a bounded pool sharing `session`.
+    Results are deduplicated and merged in market-cap order.
+    """
+    requests_to_make = plan_market_requests(ids, currency, per_page)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(requests_to_make)))) as pool:
+        results = list(pool.map(lambda params: _fetch_page(session, params, timeout, limiter, max_wait, cache), requests_to_make))
 
-def get_crypto_account_id(client: CoinbaseClient, symbol: str) -> Optional[str]:
-    """Busca el ID de la cuenta de la criptomoneda (Ej. BTC) en la Wallet de Coinbase."""
-    try:
-        accounts = client.get_accounts().data
-        for account in accounts:
-            if account['currency'] == symbol:
-                return account['id']
-        logger.warning(f"No se encontró una cuenta de Coinbase para la moneda: {symbol}.")
-        return None
-    except Exception as e:
-        logger.error(f"Error al obtener cuentas de Coinbase: {e}")
+    failed = sum(1 for r in results if r is None)
+    if failed == len(results):
         return None
+    if failed:
+        logger.warning("%d/%d CoinGecko chunk requests failed; showing partial data.", failed, len(results))
+    return cache.merge(results) if cache is not None else merge_market_pages(results)
 
-def place_limit_order_coinbase(
-    client: CoinbaseClient, 
-    symbol: str, 
-    limit_price: float, 
-    usd_amount: float
-) -> Optional[dict]:
+
+@instrumented("fetch_data")
+def fetch_data(session: requests.Session, cryptos: str, currency: str, per_page: int = 100, timeout: int = 10, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, limiter: Optional[TokenBucketLimiter] = None, max_wait: Optional[float] = None,
+               cache: Optional[ResponseCache] = None) -> Optional[List[MarketRecord]]:
     """
-    Coloca una orden BUY (de Mercado) usando la Wallet API, ya que no soporta órdenes Límite.
-    Compra la cantidad de USD especificada al precio actual de mercado.
+    Fetches data from CoinGecko with retry handling (chunked for large watchlists).
+    With a `cache`, an unchanged market returns the very same list object as before.
     """
-    if not HAS_COINBASE or client is None:
-        logger.warning("Coinbase client no está disponible.")
-        return None
+    ids = [c.strip() for c in cryptos.split(",") if c.strip()]
+    if len(ids) > per_page or len(cryptos) > MAX_IDS_PARAM_CHARS:
+        return fetch_data_chunked(session, ids, currency, per_page, timeout, max_concurrency, limiter, max_wait, cache)
+    return _fetch_page(session, _market_params(currency, cryptos, per_page, 1), timeout, limiter, max_wait, cache)
 
-    account_id = get_crypto_account_id(client, symbol)
-    if not account_id:
-        return None
 
-    try:
-        # Ejecuta una 'buy' gastando la cantidad de dinero (USD)
-        response = client.buy(
-            account_id=account_id,
-            amount=usd_amount, # Cantidad de FIAT a gastar
-            currency="USD",   # Moneda a gastar
-            commit=True      # Realizar la compra
-        )
+# --- 2.1 PRICE SOURCES (REST polling / WebSocket streaming) ---
 
-        logger.info(f"🚀 Orden de COMPRA (Mercado) enviada a Coinbase para {symbol}. Monto: ${usd_amount:.2f} USD.")
-        logger.warning(f"⚠️ Atención: Esta es una orden de MERCADO, no LÍMITE.")
-        return response.get('data')
-    except Exception as e:
-        logger.error(f"❌ Error al enviar la orden de Coinbase para {symbol}: {e}")
-        return None
+COINBASE_WS_URL = "wss://ws-feed.exchange.coinbase.com"
+DEFAULT_MAX_FPS = 2.0
+WS_BACKOFF_BASE = 1.0
+WS_BACKOFF_MAX = 60.0
+WS_IDLE_TIMEOUT = 30.0   # Sin tráfico: ping; el doble sin respuesta: reconexión
+WS_POLL_TIMEOUT = 1.0    # Cada cuánto el hilo del socket revisa suscripciones nuevas y parada
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_CONTINUATION, WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
 
-def print_table(data: List[dict], prev_prices: Dict[str, float], currency: str, coinbase_client: Optional[CoinbaseClient]) -> Dict[str, Union[Dict[str, float], List[Dict[str, str | float]]]]:
-    """Formats and prints the data to the terminal using simple text formatting."""
-    rows = []
-    buy_signals_data: List[Dict[str, str | float]] = [] 
 
-    # Pre-cálculo para determinar si se necesitan las columnas de PLR/Tiempo
-    has_buy_signal_flag = any("📉 COMPRA! (DIP)" in compute_alert(coin.get("price_change_percentage_24h_in_currency"), coin.get("price_change_percentage_7d_in_currency")) for coin in data)
+def ws_accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
 
-    # Headers para el output de texto plano
-    active_headers = ["Moneda", "Precio", "Δ(prev)", "24h", "7d", "Proyección 48h", "Alerta", "Técnico"]
-    if has_buy_signal_flag:
-        active_headers.extend(["Límite Sugerido", "Tiempo al PLR"])
 
+def _ws_mask(payload: bytes, key: bytes) -> bytes:
+    n = len(payload)
+    if not n:
+        return payload
+    stream = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(stream, "big")).to_bytes(n, "big")
 
-    for coin in data:
-        symbol = coin.get("symbol", "").upper()
-        name = coin.get("id", "")
-        price = coin.get("current_price")
-        change_24h = coin.get("price_change_percentage_24h_in_currency")
-        change_7d = coin.get("price_change_percentage_7d_in_currency")
 
-        alert_str = compute_alert(change_24h, change_7d)
-        limit_suggered_float: Optional[float] = None
-        limit_suggered_str = ""
+def ws_encode_frame(payload: bytes, opcode: int = WS_TEXT, mask: bool = False) -> bytes:
+    """Encodes one final frame (clients must mask, servers must not)."""
+    header = bytearray([0x80 | opcode])
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < 1 << 16:
+        header.append(mask_bit | 126)
+        header += n.to_bytes(2, "big")
+    else:
+        header.append(mask_bit | 127)
+        header += n.to_bytes(8, "big")
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _ws_mask(payload, key)
+    return bytes(header) + payload
 
-        # LÓGICA DE COMPRA Y ORDEN AUTOMÁTICA
-        if "COMPRA! (DIP)" in alert_str and price is not None:
-            limit_suggered_float = price * (1 - 0.02)
-            limit_suggered_str = format_price(limit_suggered_float, decimal_limit=4)
 
-            # --- ENVÍO DE ORDEN AUTOMÁTICA A COINBASE ---
-            if HAS_COINBASE and coinbase_client and DEFAULT_TRADE_AMOUNT_USD > 0 and limit_suggered_float > 0:
-                try:
-                    place_limit_order_coinbase(
-                        client=coinbase_client,
-                        symbol=symbol,
-                        limit_price=limit_suggered_float, 
-                        usd_amount=DEFAULT_TRADE_AMOUNT_USD
-                    )
-                except Exception as e:
-                    logger.error(f"Error en cálculo/envío para {symbol}: {e}")
-
-            # Datos para notificación de Telegram
-            buy_signals_data.append({
-                "symbol": symbol,
-                "name": name,
-                "price": price,
-                "change_24h": change_24h,
-                "change_7d": change_7d,
-                "limit_price": limit_suggered_str,
-            })
+def ws_read_frame(read_exact: Any) -> Tuple[bool, int, bytes]:
+    """Reads one frame through `read_exact(n)`; returns (fin, opcode, unmasked payload)."""
+    b0, b1 = read_exact(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = int.from_bytes(read_exact(2), "big")
+    elif n == 127:
+        n = int.from_bytes(read_exact(8), "big")
+    key = read_exact(4) if b1 & 0x80 else None
+    payload = read_exact(n) if n else b""
+    if key is not None:
+        payload = _ws_mask(payload, key)
+    return bool(b0 & 0x80), b0 & 0x0F, payload
 
-        price_str = format_price(price)
-        change_24h_str = format_percent(change_24h)
-        change_7d_str = format_percent(change_7d)
 
-        projection_48h_str = compute_projection(price, change_24h)
-        technical_sentiment_str = compute_technical_sentiment(change_24h, change_7d)
-        time_to_plr_str = compute_time_to_plr(price, change_24h, limit_suggered_float)
+class WebSocketConnection:
+    """
+    Minimal RFC 6455 endpoint (stdlib only): client handshake, text frames,
+    ping/pong and close. With mask=False it serves the server side of a socket
+    that has already been upgraded (the local stand-in).
+    """
 
-        delta_str = ""
-        prev = prev_prices.get(name)
-        if prev is not None and price is not None:
-            try:
-                pct = (price - prev) / prev * 100 if prev != 0 else 0.0
-                delta_str = f"{pct:+.2f}%"
-            except (ValueError, TypeError):
-                delta_str = ""
+    def __init__(self, sock: socket.socket, buffered: bytes = b"", mask: bool = True):
+        self.sock = sock
+        self.mask = mask
+        self.last_activity = time.monotonic()
+        self._buffer = bytearray(buffered)
 
-        # Construir la fila de datos para impresión
-        row_data = {
-            "Moneda": symbol,
-            "Precio": price_str,
-            "Δ(prev)": delta_str,
-            "24h": change_24h_str,
-            "7d": change_7d_str,
-            "Proyección 48h": projection_48h_str,
-            "Alerta": alert_str,
-            "Técnico": technical_sentiment_str
-        }
+    @classmethod
+    def connect(cls, url: str, timeout: float = 10.0) -> "WebSocketConnection":
+        parsed = urlparse(url)
+        secure = parsed.scheme == "wss"
+        host = parsed.hostname or "localhost"
+        sock = socket.create_connection((host, parsed.port or (443 if secure else 80)), timeout=timeout)
+        if secure:
+            import ssl
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {parsed.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                sock.close()
+                raise ConnectionError("WebSocket handshake: connection closed")
+            response += chunk
+        head, _, rest = response.partition(b"\r\n\r\n")
+        status, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(":") for line in header_lines)}
+        if status.split(" ")[1:2] != ["101"] or headers.get("sec-websocket-accept") != ws_accept_key(key):
+            sock.close()
+            raise ConnectionError(f"WebSocket handshake rejected: {status}")
+        return cls(sock, rest)
 
-        if has_buy_signal_flag:
-            row_data["Límite Sugerido"] = limit_suggered_str
-            row_data["Tiempo al PLR"] = time_to_plr_str
+    def _fill(self, n: int) -> None:
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(max(65536, n - len(self._buffer)))
+            if not chunk:
+                raise ConnectionError("WebSocket closed by peer")
+            self._buffer += chunk
 
-        rows.append(row_data)
+    def _read_exact(self, n: int) -> bytes:
+        self._fill(n)
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
 
-    # --- Impresión final (Texto Plano) ---
-    if rows:
-        # Calcular el ancho máximo para cada columna
-        col_widths = {h: len(h) for h in active_headers}
-        for row in rows:
-            for header in active_headers:
-                col_widths[header] = max(col_widths[header], len(str(row.get(header, ''))))
+    def send(self, payload: Union[str, bytes], opcode: int = WS_TEXT) -> None:
+        data = payload.encode() if isinstance(payload, str) else payload
+        self.sock.sendall(ws_encode_frame(data, opcode, mask=self.mask))
 
-        # Función auxiliar para formatear la línea
-        def format_line(data_dict: Dict[str, str], is_header: bool = False) -> str:
-            line = ""
-            for header in active_headers:
-                value = data_dict.get(header, '')
-                padding = col_widths[header]
-                # Alinear a la izquierda (Moneda, Alerta, Técnico)
-                if header in ["Moneda", "Alerta", "Técnico"]:
-                    line += f"| {str(value).ljust(padding)} "
-                # Alinear a la derecha (Precios, Porcentajes, Tiempos)
-                else:
-                    line += f"| {str(value).rjust(padding)} "
-            return line + "|"
+    def recv(self) -> Optional[str]:
+        """
+        Next text message (fragments joined); None once the peer closes. Raises
+        TimeoutError only while idle between frames, never halfway through one.
+        """
+        parts: List[bytes] = []
+        while True:
+            try:
+                self._fill(2)
+            except TimeoutError:
+                if parts:
+                    raise ConnectionError("WebSocket message truncated")
+                raise
+            try:
+                fin, opcode, payload = ws_read_frame(self._read_exact)
+            except TimeoutError as e:
+                raise ConnectionError("WebSocket frame truncated") from e
+            self.last_activity = time.monotonic()
+            if opcode == WS_PING:
+                self.send(payload, WS_PONG)
+            elif opcode == WS_CLOSE:
+                try:
+                    self.send(payload[:2], WS_CLOSE)
+                except OSError:
+                    pass
+                return None
+            elif opcode != WS_PONG:
+                parts.append(payload)
+                if fin:
+                    return b"".join(parts).decode("utf-8")
+
+    def close(self) -> None:
+        try:
+            self.send(b"", WS_CLOSE)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class PriceSource(abc.ABC):
+    """
+    Where the pipeline gets its snapshots. The loop asks every `frame_interval`
+    seconds; snapshot() returns the same list object while nothing changed, and
+    an unchanged snapshot is only redrawn every `redraw_interval` seconds.
+    """
+    frame_interval: float = DEFAULT_INTERVAL
+    redraw_interval: float = 0.0
+
+    def start(self) -> "PriceSource":
+        return self
+
+    @abc.abstractmethod
+    def snapshot(self) -> Optional[List[MarketRecord]]:
+        ...
+
+    def reconfigure(self, cryptos: str, currency: str, interval: float) -> None:
+        """Applies a new watchlist/currency/interval without dropping sessions or sockets."""
+
+    def stop(self) -> None:
+        pass
+
+
+class RestPollingSource(PriceSource):
+    """One /coins/markets fetch per interval (the original behaviour)."""
+
+    def __init__(self, session: requests.Session, cryptos: str, currency: str, interval: float, per_page: int = 100,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, limiter: Optional[TokenBucketLimiter] = None,
+                 cache: Optional[ResponseCache] = None):
+        self.session = session
+        self.cryptos = cryptos
+        self.currency = currency
+        self.frame_interval = max(1, interval)
+        self.per_page = per_page
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.cache = cache
+
+    def reconfigure(self, cryptos: str, currency: str, interval: float) -> None:
+        self.cryptos = cryptos
+        self.currency = currency
+        self.frame_interval = max(1, interval)
+
+    def snapshot(self) -> Optional[List[MarketRecord]]:
+        data = fetch_data(self.session, self.cryptos, self.currency, per_page=self.per_page, max_concurrency=self.max_concurrency,
+                          limiter=self.limiter, max_wait=self.frame_interval, cache=self.cache)
+        if self.limiter is not None:
+            logger.debug("Rate limiter: %s", self.limiter.stats())
+        return data
+
+
+def _pct_change(price: float, reference: Optional[float]) -> Optional[float]:
+    return None if not reference else (price / reference - 1) * 100
+
+
+def market_references(coin: MarketRecord) -> Tuple[Optional[float], Optional[float]]:
+    """Prices 24h and 7d ago implied by a record's price and changes."""
+    price, c24, c7 = coin.price, coin.change_24h, coin.change_7d
+    return (
+        price / (1 + c24 / 100) if price is not None and c24 is not None and c24 != -100 else None,
+        price / (1 + c7 / 100) if price is not None and c7 is not None and c7 != -100 else None,
+    )
+
+
+def repriced_record(coin: MarketRecord, price: float, references: Tuple[Optional[float], Optional[float]]) -> MarketRecord:
+    """A new record at `price`, with both changes re-derived from the references."""
+    return MarketRecord(coin.id, coin.symbol, price, coin.market_cap,
+                        _pct_change(price, references[0]) if references[0] else coin.change_24h,
+                        _pct_change(price, references[1]) if references[1] else coin.change_7d)
+
+
+class CoinbaseTickerSource(PriceSource):
+    """
+    Streams last-trade prices from the Coinbase Exchange `ticker` channel and
+    merges them into the latest REST snapshot. The REST source, refreshed every
+    `baseline_interval`, still supplies symbols, market cap and the prices 24h/7d
+    ago; each tick moves the price and re-derives both changes from them.
+    Frames are capped at `max_fps`; the socket reconnects with jittered backoff.
+    """
+
+    def __init__(self, rest: RestPollingSource, url: str = COINBASE_WS_URL, max_fps: float = DEFAULT_MAX_FPS,
+                 baseline_interval: Optional[float] = None):
+        self.rest = rest
+        self.url = url
+        self.frame_interval = 1.0 / max(0.1, max_fps)
+        self.redraw_interval = rest.frame_interval
+        self.baseline_interval = baseline_interval or rest.frame_interval
+        self.quote = rest.currency.upper()
+        self.ticks = self.reconnects = 0
+        self._lock = threading.Lock()
+        self._records: Dict[str, MarketRecord] = {}
+        self._references: Dict[str, Tuple[Optional[float], Optional[float]]] = {}  # id -> (precio hace 24h, hace 7d)
+        self._live: Dict[str, float] = {}       # id -> último precio del stream
+        self._products: Dict[str, str] = {}     # "BTC-USD" -> id de CoinGecko
+        self._rejected: set = set()             # Productos que Coinbase no lista
+        self._order: List[str] = []
+        self._snapshot: Optional[List[MarketRecord]] = None
+        self._dirty = False
+        self._last_rest: Optional[List[MarketRecord]] = None
+        self._next_baseline = 0.0
+        self._stopping = threading.Event()
+        self._conn: Optional[WebSocketConnection] = None
+        self._thread = threading.Thread(target=self._run, name="ws-ticker", daemon=True)
+
+    def start(self) -> "CoinbaseTickerSource":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._thread.join(WS_POLL_TIMEOUT * 2)
+
+    def reconfigure(self, cryptos: str, currency: str, interval: float) -> None:
+        follows_rest = self.baseline_interval == self.rest.frame_interval
+        self.rest.reconfigure(cryptos, currency, interval)
+        self.redraw_interval = self.rest.frame_interval
+        if follows_rest:
+            self.baseline_interval = self.rest.frame_interval
+        if currency.upper() != self.quote:
+            # Otros productos: los precios vivos en la moneda anterior ya no sirven
+            with self._lock:
+                self.quote = currency.upper()
+                self._live = {}
+        self._next_baseline = 0.0  # El siguiente frame trae la nueva lista por REST
+
+    def snapshot(self) -> Optional[List[MarketRecord]]:
+        if time.monotonic() >= self._next_baseline:
+            self._next_baseline = time.monotonic() + self.baseline_interval
+            data = self.rest.snapshot()
+            if data and data is not self._last_rest:
+                self._last_rest = data
+                self._rebase(data)
+        with self._lock:
+            if self._dirty:
+                records = self._records
+                self._snapshot = [records[coin_id] for coin_id in self._order]
+                self._dirty = False
+            return self._snapshot
+
+    def _rebase(self, data: List[MarketRecord]) -> None:
+        references: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        products: Dict[str, str] = {}
+        records: Dict[str, MarketRecord] = {}
+        with self._lock:
+            for coin in data:
+                references[coin.id] = market_references(coin)
+                products[f"{coin.symbol.upper()}-{self.quote}"] = coin.id
+                live = self._live.get(coin.id)
+                records[coin.id] = coin if live is None else repriced_record(coin, live, references[coin.id])
+            # Monedas que ya no vienen en el snapshot REST: fuera de todos los mapas
+            self._records = records
+            self._live = {coin_id: price for coin_id, price in self._live.items() if coin_id in records}
+            self._references = references
+            self._order = [coin.id for coin in data]
+            self._products = products
+            self._dirty = True
+
+    def _on_message(self, raw: str) -> None:
+        message = _json_loads(raw)
+        kind = message.get("type")
+        if kind == "ticker":
+            coin_id = self._products.get(message.get("product_id"))
+            try:
+                price = float(message["price"])
+            except (KeyError, TypeError, ValueError):
+                return
+            if coin_id is None:
+                return
+            with self._lock:
+                coin = self._records.get(coin_id)
+                self._live[coin_id] = price
+                if coin is not None and coin.price != price:
+                    # Copia nueva: los snapshots ya entregados nunca cambian bajo el render
+                    self._records[coin_id] = repriced_record(coin, price, self._references.get(coin_id, (None, None)))
+                    self._dirty = True
+            self.ticks += 1
+            METRICS.inc("ws_ticks_total")
+        elif kind == "error":
+            # Producto inexistente en Coinbase ("BORI-USD is not a valid product"): esa moneda queda solo
+            # con REST. Se compara el id exacto: un rechazo de BTC-USDT no debe vetar BTC-USD
+            reason = str(message.get("reason", ""))
+            named = {token.strip(".,;:'\"") for token in reason.split()}
+            self._rejected.update(named & self._products.keys())
+            logger.debug("Coinbase WS: %s %s", message.get("message"), reason)
+
+    def _run(self) -> None:
+        attempt = 0
+        while not self._stopping.is_set():
+            if not self._products:
+                self._stopping.wait(WS_POLL_TIMEOUT)
+                continue
+            conn = None
+            try:
+                conn = WebSocketConnection.connect(self.url)
+                conn.sock.settimeout(WS_POLL_TIMEOUT)
+                logger.info("WebSocket conectado: %s", self.url)
+                subscribed: set = set()
+                pinged = False
+                while not self._stopping.is_set():
+                    # Una suscripción por producto: uno inválido no tumba a los demás
+                    for product in sorted(self._products.keys() - subscribed - self._rejected):
+                        conn.send(json.dumps({"type": "subscribe", "product_ids": [product], "channels": ["ticker"]}))
+                        subscribed.add(product)
+                    try:
+                        message = conn.recv()
+                    except TimeoutError:
+                        idle = time.monotonic() - conn.last_activity
+                        if idle > 2 * WS_IDLE_TIMEOUT:
+                            raise ConnectionError(f"sin tráfico durante {idle:.0f}s")
+                        if idle > WS_IDLE_TIMEOUT and not pinged:
+                            conn.send(b"", WS_PING)
+                            pinged = True
+                        continue
+                    if message is None:
+                        raise ConnectionError("cerrado por el servidor")
+                    pinged = False
+                    attempt = 0
+                    self._on_message(message)
+            except (OSError, ValueError) as e:
+                if self._stopping.is_set():
+                    break
+                delay = min(WS_BACKOFF_MAX, WS_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                self.reconnects += 1
+                METRICS.inc("ws_reconnects_total")
+                logger.warning("WebSocket desconectado (%s); reintento en %.1fs.", e, delay)
+                self._stopping.wait(delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+# --- 2.2 MULTI-EXCHANGE AGGREGATION (quórum, peticiones hedged, mediana/VWAP) ---
+
+AGGREGATE_TIMEOUT = 5.0          # Tope por tick: lo que no llegue entra en el siguiente si sigue fresco
+QUOTE_MAX_AGE = 120.0            # Cotizaciones más viejas (según la bolsa o la recepción) se descartan
+OUTLIER_MIN_PCT = 1.0            # Nunca se descarta una cotización a menos de 1% de la mediana...
+OUTLIER_MAD_K = 5.0              # ...ni dentro de K desviaciones MAD (escaladas a σ)
+HEDGE_MIN_DELAY = 0.1
+HEDGE_LATENCY_FACTOR = 2.0       # Petición duplicada cuando la fuente tarda 2x su latencia habitual
+COINBASE_REST_CONCURRENCY = 8
+
+
+class Quote:
+    """One source's price for one coin; `volume` is the 24h base volume (None if unknown)."""
+    __slots__ = ("price", "volume", "ts")
+
+    def __init__(self, price: float, volume: Optional[float], ts: float):
+        self.price = price
+        self.volume = volume
+        self.ts = ts
+
+
+def _parse_iso_ts(value: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return time.time()
+
+
+class ExchangeQuotes(abc.ABC):
+    """
+    One exchange's public REST ticker endpoint, with its own pooled session and
+    timeout. fetch() maps upper-cased CoinGecko symbols to Quotes for the pairs
+    the exchange lists. The latency EWMA decides when a request gets hedged.
+    """
+    name = ""
+    default_url = ""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = AGGREGATE_TIMEOUT, pool_maxsize: int = 4):
+        self.base_url = (base_url or self.default_url).rstrip("/")
+        self.timeout = timeout
+        self.session = create_session(retries=0, pool_maxsize=pool_maxsize)
+        self.latency: Optional[float] = None
+
+    def _get(self, path: str, params: Optional[dict] = None) -> Any:
+        resp = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        return _json_loads(resp.content)
+
+    @abc.abstractmethod
+    def fetch(self, symbols: Sequence[str], quote: str) -> Dict[str, Quote]:
+        ...
+
+    def close(self) -> None:
+        self.session.close()
+
+    def observe(self, elapsed: float) -> None:
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+
+    def hedge_delay(self, budget: float) -> float:
+        if self.latency is None:
+            return budget / 4
+        return max(HEDGE_MIN_DELAY, HEDGE_LATENCY_FACTOR * self.latency)
+
+
+class BinanceQuotes(ExchangeQuotes):
+    """GET /api/v3/ticker/24hr?type=MINI: every pair in one response (USD maps to USDT)."""
+    name = "binance"
+    default_url = "https://api.binance.com"
+
+    def fetch(self, symbols: Sequence[str], quote: str) -> Dict[str, Quote]:
+        suffix = "USDT" if quote == "USD" else quote
+        wanted = {f"{symbol}{suffix}": symbol for symbol in symbols}
+        quotes = {}
+        for ticker in self._get("/api/v3/ticker/24hr", {"type": "MINI"}):
+            symbol = wanted.get(ticker.get("symbol"))
+            if symbol is not None:
+                quotes[symbol] = Quote(float(ticker["lastPrice"]), float(ticker["volume"]), ticker["closeTime"] / 1000)
+        return quotes
+
+
+class BitstampQuotes(ExchangeQuotes):
+    """GET /api/v2/ticker/: every pair in one response."""
+    name = "bitstamp"
+    default_url = "https://www.bitstamp.net"
+
+    def fetch(self, symbols: Sequence[str], quote: str) -> Dict[str, Quote]:
+        wanted = {f"{symbol}/{quote}": symbol for symbol in symbols}
+        quotes = {}
+        for ticker in self._get("/api/v2/ticker/"):
+            symbol = wanted.get(ticker.get("pair"))
+            if symbol is not None:
+                quotes[symbol] = Quote(float(ticker["last"]), float(ticker["volume"]), float(ticker["timestamp"]))
+        return quotes
+
+
+class CoinbaseQuotes(ExchangeQuotes):
+    """GET /products/<SYM>-<QUOTE>/ticker, one request per pair; unlisted pairs (404) are not asked again."""
+    name = "coinbase"
+    default_url = "https://api.exchange.coinbase.com"
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = AGGREGATE_TIMEOUT, pool_maxsize: int = COINBASE_REST_CONCURRENCY):
+        super().__init__(base_url, timeout, pool_maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=COINBASE_REST_CONCURRENCY, thread_name_prefix="coinbase-rest")
+        self._rejected: set = set()
+
+    def _ticker(self, product: str) -> Optional[Quote]:
+        try:
+            ticker = self._get(f"/products/{product}/ticker")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                self._rejected.add(product)
+                return None
+            raise
+        return Quote(float(ticker["price"]), float(ticker.get("volume") or 0) or None, _parse_iso_ts(ticker.get("time")))
+
+    def fetch(self, symbols: Sequence[str], quote: str) -> Dict[str, Quote]:
+        products = {f"{symbol}-{quote}": symbol for symbol in symbols if f"{symbol}-{quote}" not in self._rejected}
+        quotes = {}
+        for product, result in zip(products, self._executor.map(self._ticker, products)):
+            if result is not None:
+                quotes[products[product]] = result
+        return quotes
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+
+EXCHANGE_QUOTES = {cls.name: cls for cls in (BinanceQuotes, CoinbaseQuotes, BitstampQuotes)}
+
+
+def merge_quotes(quotes: Sequence[Quote], method: str = "median", now: Optional[float] = None,
+                 max_age: float = QUOTE_MAX_AGE, baseline: Optional[Quote] = None) -> Tuple[Optional[float], int, int]:
+    """
+    Merged price from several sources' quotes for one coin, plus the CoinGecko
+    `baseline` quote. Stale quotes are dropped; with 3+ left, those far from the
+    median by both OUTLIER_MIN_PCT and OUTLIER_MAD_K scaled MADs are rejected.
+    With fewer there is no majority, so if they disagree by more than
+    OUTLIER_MIN_PCT only the baseline is trusted (or the coin is skipped). VWAP
+    weighs quotes without a volume (the baseline) by the median volume.
+    Returns (price, quotes used, quotes rejected).
+    """
+    import statistics
+    now = time.time() if now is None else now
+    candidates = [*quotes, baseline] if baseline is not None else list(quotes)
+    fresh = [q for q in candidates if q.price > 0 and now - q.ts <= max_age]
+    if not fresh:
+        return None, 0, len(candidates)
+    median = statistics.median(q.price for q in fresh)
+    kept = fresh
+    if len(fresh) >= 3:
+        mad = statistics.median(abs(q.price - median) for q in fresh)
+        tolerance = max(median * OUTLIER_MIN_PCT / 100, OUTLIER_MAD_K * 1.4826 * mad)
+        kept = [q for q in fresh if abs(q.price - median) <= tolerance]
+    elif max(q.price for q in fresh) - min(q.price for q in fresh) > median * OUTLIER_MIN_PCT / 100:
+        # Dos fuentes que no coinciden: no se sabe cuál es la atípica y el promedio no es ninguna de las dos
+        if not any(q is baseline for q in fresh):
+            return None, 0, len(candidates)
+        kept = [baseline]
+    if method == "vwap":
+        volumes = [q.volume for q in kept if q.volume]
+        if volumes:
+            fill = statistics.median(volumes)
+            weights = [q.volume or fill for q in kept]
+            return sum(q.price * w for q, w in zip(kept, weights)) / sum(weights), len(kept), len(candidates) - len(kept)
+    return statistics.median(q.price for q in kept), len(kept), len(candidates) - len(kept)
+
+
+class AggregatedSource(PriceSource):
+    """
+    CoinGecko (symbols, market cap, 24h/7d references and one more price) plus
+    exchange tickers, all requested concurrently each tick. The tick waits only
+    until `quorum` sources have answered (or `timeout`); a source slower than
+    its usual latency gets one hedged duplicate request, and answers that land
+    after the tick are kept for the next one while still fresh. A source with a
+    request in flight is not asked again, so a stuck exchange never piles up.
+    """
+
+    def __init__(self, rest: RestPollingSource, exchanges: Sequence[ExchangeQuotes], quorum: Optional[int] = None,
+                 method: str = "median", timeout: float = AGGREGATE_TIMEOUT, max_age: float = QUOTE_MAX_AGE):
+        self.rest = rest
+        self.exchanges = {exchange.name: exchange for exchange in exchanges}
+        self.currency = rest.currency
+        self.frame_interval = rest.frame_interval
+        self.quote = rest.currency.upper()
+        sources = len(self.exchanges) + 1
+        self.quorum = min(sources, max(1, quorum or sources // 2 + 1))
+        self.method = method
+        self.timeout = min(timeout, self.frame_interval)
+        self.max_age = max_age
+        self._pool = ThreadPoolExecutor(max_workers=2 * sources, thread_name_prefix="aggregate")
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Tuple[float, Dict[str, Quote]]] = {}  # fuente -> (recibido, cotizaciones por símbolo)
+        self._inflight: Dict[str, List[Future]] = {}
+        self._baseline: Optional[List[MarketRecord]] = None
+        self._references: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._snapshot: Optional[List[MarketRecord]] = None
+
+    def stop(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for exchange in self.exchanges.values():
+            exchange.close()
+
+    def reconfigure(self, cryptos: str, currency: str, interval: float) -> None:
+        self.rest.reconfigure(cryptos, currency, interval)
+        self.frame_interval = self.rest.frame_interval
+        if currency != self.currency:
+            with self._lock:
+                self.currency = currency
+                self.quote = currency.upper()
+                self._latest.clear()
+
+    def _fetch_baseline(self) -> Dict[str, Quote]:
+        data = self.rest.snapshot()
+        if not data:
+            raise ConnectionError("CoinGecko sin datos")
+        now = time.time()
+        if data is not self._baseline:
+            references = {coin.id: market_references(coin) for coin in data}
+            # Corre en el pool: snapshot() debe ver siempre la lista y sus referencias de la misma respuesta
+            with self._lock:
+                self._baseline, self._references = data, references
+        quotes: Dict[str, Quote] = {}
+        for coin in data:
+            if coin.price is not None:
+                quotes.setdefault(coin.symbol.upper(), Quote(coin.price, None, now))
+        return quotes
+
+    def _fetch_exchange(self, exchange: ExchangeQuotes, symbols: Sequence[str]) -> Dict[str, Quote]:
+        start = time.perf_counter()
+        quotes = exchange.fetch(symbols, self.quote)
+        exchange.observe(time.perf_counter() - start)
+        return quotes
+
+    def _submit(self, name: str, symbols: Sequence[str]) -> Future:
+        if name == "coingecko":
+            future = self._pool.submit(self._fetch_baseline)
+        else:
+            future = self._pool.submit(self._fetch_exchange, self.exchanges[name], symbols)
+        self._inflight.setdefault(name, []).append(future)
+        future.add_done_callback(functools.partial(self._on_done, name))
+        return future
+
+    def _on_done(self, name: str, future: Future) -> None:
+        with self._lock:
+            inflight = self._inflight.get(name, [])
+            if future in inflight:
+                inflight.remove(future)
+            if future.cancelled() or future.exception() is not None:
+                if not future.cancelled():
+                    logger.debug("Fuente %s falló: %s", name, future.exception())
+                return
+            self._latest[name] = (time.time(), future.result())
+
+    def _gather(self, symbols: Sequence[str]) -> int:
+        """Requests every idle source and waits for the quorum; returns how many answered this tick."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        names = ["coingecko", *self.exchanges]
+        with self._lock:
+            busy = {name for name in names if self._inflight.get(name)}
+        pending: Dict[Future, str] = {}
+        for name in names:
+            if name not in busy:
+                pending[self._submit(name, symbols)] = name
+        with self._lock:
+            pending.update({future: name for name in busy for future in self._inflight.get(name, [])})
+        answered: set = set()
+        hedged: set = set(busy)  # Una fuente con petición colgada de otro tick no recibe más
+        while pending and len(answered) < self.quorum:
+            now = time.monotonic()
+            # CoinGecko nunca se duplica: gastaría cupo del limitador
+            hedge_at = {name: started + self.exchanges[name].hedge_delay(self.timeout)
+                        for name in set(pending.values()) - hedged - answered if name in self.exchanges}
+            wake = min([deadline, *hedge_at.values()])
+            if now >= deadline:
+                break
+            done, _ = concurrent.futures.wait(list(pending), timeout=max(0.0, wake - now), return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                if not future.cancelled() and future.exception() is None:
+                    answered.add(name)
+                    for sibling in [f for f, n in pending.items() if n == name]:
+                        del pending[sibling]
+            now = time.monotonic()
+            for name, at in hedge_at.items():
+                if at <= now and name not in answered and name in pending.values():
+                    hedged.add(name)
+                    pending[self._submit(name, symbols)] = name
+                    METRICS.inc("aggregate_hedged_requests_total")
+        if len(answered) < self.quorum:
+            METRICS.inc("aggregate_quorum_missed_total")
+            logger.debug("Quórum no alcanzado: %d/%d fuentes en %.2fs.", len(answered), self.quorum, time.monotonic() - started)
+        return len(answered)
+
+    @instrumented("aggregate_tick")
+    def snapshot(self) -> Optional[List[MarketRecord]]:
+        with self._lock:
+            baseline = self._baseline
+        if baseline is None:
+            # Primer tick: sin símbolos todavía no hay nada que pedir a las bolsas
+            try:
+                quotes = self._fetch_baseline()
+            except (ConnectionError, requests.RequestException) as e:
+                logger.warning("CoinGecko no respondió: %s", e)
+                return None
+            with self._lock:
+                self._latest["coingecko"] = (time.time(), quotes)
+        else:
+            self._gather([coin.symbol.upper() for coin in baseline])
+
+        now = time.time()
+        with self._lock:
+            baseline, references = self._baseline, self._references
+            sources = {name: quotes for name, (received, quotes) in self._latest.items() if now - received <= self.max_age}
+        baselines = sources.pop("coingecko", {})
+        exchanges = list(sources.values())
+        merged: List[MarketRecord] = []
+        changed = self._snapshot is None or len(self._snapshot) != len(baseline)
+        rejected = 0
+        seen: set = set()
+        for i, coin in enumerate(baseline):
+            symbol = coin.symbol.upper()
+            price = None
+            # Los símbolos no son únicos en CoinGecko: las bolsas solo cotizan el de mayor capitalización
+            if symbol not in seen:
+                seen.add(symbol)
+                price, _, dropped = merge_quotes([quotes[symbol] for quotes in exchanges if symbol in quotes], self.method, now,
+                                                 self.max_age, baselines.get(symbol))
+                rejected += dropped
+            record = coin if price is None or price == coin.price else repriced_record(coin, price, references.get(coin.id, (None, None)))
+            previous = None if changed else self._snapshot[i]
+            if previous is not None and previous.id == record.id and previous.price == record.price and previous.market_cap == record.market_cap:
+                record = previous
+            else:
+                changed = True
+            merged.append(record)
+        if rejected:
+            METRICS.inc("aggregate_rejected_quotes_total", rejected)
+        if changed:
+            self._snapshot = merged
+        return self._snapshot
+
+
+def build_exchange_sources(names: Sequence[str], urls: Optional[Dict[str, str]] = None, timeout: float = AGGREGATE_TIMEOUT) -> List[ExchangeQuotes]:
+    """ExchangeQuotes for the given names (coingecko is always the baseline and is skipped here)."""
+    urls = urls or {}
+    sources = []
+    for name in names:
+        if name == "coingecko":
+            continue
+        if name not in EXCHANGE_QUOTES:
+            raise ValueError(f"Fuente desconocida: {name} (disponibles: coingecko, {', '.join(EXCHANGE_QUOTES)})")
+        sources.append(EXCHANGE_QUOTES[name](urls.get(name), timeout=timeout))
+    return sources
+
+
+# --- 3. FORMATTING AND ALERT LOGIC FUNCTIONS ---
+
+def format_price(price: Optional[float], decimal_limit: int = 2) -> str:
+    """Formats the price, using more decimals for very low values."""
+    if price is None:
+        return "N/A"
+    try:
+        if price < 0.1:
+            return f"${price:,.8f}"
+        return f"${price:,.{decimal_limit}f}"
+    except (ValueError, TypeError):
+        return str(price)
+
+def format_percent(value: Optional[float]) -> str:
+    """Formats the percentage change with a sign."""
+    if value is None:
+        return "N/A"
+    return f"{value:+.2f}%"
+
+# Se elimina la función escape_markdown_v2 ya que se usa HTML Parse Mode
+
+# --- Tablas de reglas (fuente única para la ruta escalar y la vectorizada) ---
+# Cada regla es (etiqueta, cláusulas); una cláusula es (columna, operador, umbral)
+# con columna 0 = cambio 24h y columna 1 = cambio 7d. Gana la primera regla que cumple
+# todas sus cláusulas, igual que la cadena if/elif original.
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+ALERT_RULES: Tuple[Tuple[str, Tuple[Tuple[int, str, float], ...]], ...] = (
+    # 1. Señal de VENTA / EUFORIA (FOMO)
+    ("💸 VENTA! (FOMO)", ((0, ">", 10.0), (1, ">", 15.0))),
+    # 2. Señal de RIESGO / VENTA (BULL TRAP)
+    ("⚠️ BULL TRAP / VENTA C/P", ((0, ">", 6.0), (1, "<", 0.0))),
+    # 3. Señal de RIESGO MÁXIMO (CAPITULACIÓN)
+    ("💀 CAPITULACIÓN/PÁNICO", ((0, "<", -8.0), (1, "<", -15.0))),
+    # 4. Señal de COMPRA FUERTE (REVERSIÓN V o B) - Rebote en 24h tras caída de 7d
+    ("📈 REVERSIÓN V/B (COMPRA)", ((0, ">", 4.0), (1, "<", -5.0))),
+    # 5. Señal de RUPTURA ALCISTA (CONTINUACIÓN)
+    ("🚀 RUPTURA ALCISTA (COMPRA)", ((0, ">", 5.0), (1, ">", 3.0), (1, "<", 10.0))),
+    # 6. Señal de COMPRA (DIP) - Corrección dentro de una tendencia alcista sana
+    ("📉 COMPRA! (DIP)", ((0, "<", -4.0), (1, ">", 0.0))),
+    # 7. Señal de ACUMULACIÓN (Largo Plazo)
+    ("💎 ACUMULACIÓN FUERTE (LT)", ((0, "<", -1.0), (0, ">", -4.0), (1, "<", -10.0))),
+    # 8. Señal de CRECIMIENTO SALUDABLE (MOMENTUM)
+    ("🟢 MOMENTUM SALUDABLE", ((0, ">", 2.0), (1, ">", 8.0))),
+    # 9. Señal de ADVERTENCIA (CORRECCIÓN C/P)
+    ("⚠️ CORRECCIÓN C/P", ((0, ">=", -4.0), (0, "<", -2.0), (1, ">", 10.0))),
+    # 10. Señal de CONSOLIDACIÓN (RANGO)
+    ("😴 RANGO/CONSOLIDACIÓN", ((0, ">=", -1.5), (0, "<=", 1.5), (1, ">=", -3.0), (1, "<=", 3.0))),
+    # 11. Señal de ESTABILIDAD (Cierre, debe ser la última)
+    ("⚖️ ESTABLE", ((0, ">=", -1.0), (0, "<=", 1.0))),
+)
+
+SENTIMENT_RULES: Tuple[Tuple[str, Tuple[Tuple[int, str, float], ...]], ...] = (
+    ("FUERTE COMPRA (Golden Cross)", ((0, ">", 5.0), (1, ">", 10.0))),
+    ("COMPRA", ((0, ">", 2.0), (1, ">", 0.0))),
+    ("FUERTE VENTA (Death Cross)", ((0, "<", -5.0), (1, "<", -10.0))),
+    ("VENTA", ((0, "<", -2.0), (1, "<", 0.0))),
+    ("NEUTRAL", ((0, ">=", -2.0), (0, "<=", 2.0), (1, ">=", -5.0), (1, "<=", 5.0))),
+    ("NEUTRAL (Sobrecompra)", ((0, ">", 7.0), (1, ">", 20.0))),
+)
+
+# Código 0 = sin datos / sin señal ("")
+ALERT_LABELS: Tuple[str, ...] = ("",) + tuple(label for label, _ in ALERT_RULES)
+SENTIMENT_LABELS: Tuple[str, ...] = ("",) + tuple(label for label, _ in SENTIMENT_RULES)
+ALERT_DIP = ALERT_LABELS.index("📉 COMPRA! (DIP)")
+SENTIMENT_DEFAULT = SENTIMENT_LABELS.index("NEUTRAL")
+
+# Nombre corto de cada regla (mismo orden que las tablas) para el archivo de --config
+ALERT_RULE_KEYS = ("fomo", "bull_trap", "capitulation", "reversal", "breakout", "dip", "accumulation", "momentum",
+                   "correction", "range", "stable")
+SENTIMENT_RULE_KEYS = ("golden_cross", "buy", "death_cross", "sell", "neutral", "overbought")
+
+PLR_DISCOUNT = 0.02  # Límite sugerido: -2% del precio actual
+
+# Estado del cálculo de Tiempo al PLR
+PLR_NA, PLR_OK, PLR_ZERO_VELOCITY, PLR_INCOMPATIBLE, PLR_REVERSAL = range(5)
+PLR_STATUS_LABELS = ("N/A", "", "N/A (Velocidad 0)", "N/A (Dir. Incompatible)", "N/A (Reversión Necesaria)")
+
+
+def _is_missing(value: Optional[float]) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _first_matching_rule(rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]], values: Tuple[float, float]) -> int:
+    """Returns the 1-based code of the first rule whose clauses all hold (0 if none)."""
+    for code, (_, clauses) in enumerate(rules, start=1):
+        if all(_OPS[op](values[col], threshold) for col, op, threshold in clauses):
+            return code
+    return 0
+
+
+class RuleTable:
+    """
+    A rule table compiled into a 2-D lookup grid. The thresholds of each column
+    split its axis into open intervals plus the threshold points themselves; the
+    first matching rule cannot change inside one cell, so classifying a value
+    pair is two binary searches and one table read, however many rules there are.
+    """
+    __slots__ = ("rules", "default", "axes", "grid", "_np_axes", "_np_grid")
+
+    def __init__(self, rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]], default: int = 0):
+        self.rules = tuple(rules)
+        self.default = default
+        self.axes = tuple(tuple(sorted({float(t) for _, clauses in rules for c, _, t in clauses if c == col})) for col in (0, 1))
+        probes = [self._probes(axis) for axis in self.axes]
+        self.grid = [[_first_matching_rule(self.rules, (x, y)) or default for y in probes[1]] for x in probes[0]]
+        self._np_axes: Optional[Tuple["np.ndarray", ...]] = None  # se construyen en el primer codes()
+        self._np_grid: Optional["np.ndarray"] = None
+
+    @staticmethod
+    def _probes(axis: Sequence[float]) -> List[float]:
+        """One representative value per cell: below, at, between and above the thresholds."""
+        if not axis:
+            return [0.0]
+        probes = [axis[0] - 1.0]
+        for k, threshold in enumerate(axis):
+            probes.append(threshold)
+            probes.append((threshold + axis[k + 1]) / 2 if k + 1 < len(axis) else threshold + 1.0)
+        return probes
+
+    @staticmethod
+    def _cell(axis: Sequence[float], value: float) -> int:
+        pos = bisect.bisect_left(axis, value)
+        return 2 * pos + 1 if pos < len(axis) and axis[pos] == value else 2 * pos
+
+    def code(self, change_24h: Optional[float], change_7d: Optional[float]) -> int:
+        if _is_missing(change_24h) or _is_missing(change_7d):
+            return 0
+        return self.grid[self._cell(self.axes[0], change_24h)][self._cell(self.axes[1], change_7d)]
+
+    def codes(self, change_24h: "np.ndarray", change_7d: "np.ndarray", valid: "np.ndarray") -> "np.ndarray":
+        if self._np_grid is None:
+            self._np_axes = tuple(np.asarray(axis, dtype=np.float64) for axis in self.axes)
+            self._np_grid = np.asarray(self.grid, dtype=np.int8)
+        cells = []
+        for axis, values in zip(self._np_axes, (change_24h, change_7d)):
+            if not len(axis):
+                cells.append(np.zeros(len(values), dtype=np.intp))
+                continue
+            pos = np.searchsorted(axis, values)
+            cells.append(2 * pos + (axis[np.minimum(pos, len(axis) - 1)] == values))
+        return np.where(valid, self._np_grid[cells[0], cells[1]], 0).astype(np.int8)
+
+
+def alert_code(change_24h: Optional[float], change_7d: Optional[float], rules: Optional["SignalRules"] = None) -> int:
+    """Scalar alert code (index into ALERT_LABELS) from the lookup table of `rules`."""
+    return (rules or DEFAULT_SIGNAL_RULES).alerts.code(change_24h, change_7d)
+
+
+def sentiment_code(change_24h: Optional[float], change_7d: Optional[float], rules: Optional["SignalRules"] = None) -> int:
+    """Scalar technical-sentiment code (index into SENTIMENT_LABELS) from the lookup table of `rules`."""
+    return (rules or DEFAULT_SIGNAL_RULES).sentiments.code(change_24h, change_7d)
+
+
+def plr_hours(current_price: Optional[float], change_24h: Optional[float], suggested_limit_price: Optional[float]) -> Tuple[int, float]:
+    """Scalar (status, hours) needed to reach the PLR assuming linear 24h velocity."""
+    if _is_missing(current_price) or _is_missing(change_24h) or _is_missing(suggested_limit_price) \
+            or suggested_limit_price == 0 or current_price == 0:
+        return PLR_NA, math.nan
+
+    target_change_pct = ((suggested_limit_price - current_price) / current_price) * 100
+    velocity_per_hour = change_24h / 24.0
+
+    if abs(velocity_per_hour) < 0.001:
+        return PLR_ZERO_VELOCITY, math.nan
+
+    if (target_change_pct > 0 and velocity_per_hour < 0) or \
+       (target_change_pct < 0 and velocity_per_hour > 0):
+        return PLR_INCOMPATIBLE, math.nan
+
+    hours_needed = target_change_pct / velocity_per_hour
+    if hours_needed < 0:
+        return PLR_REVERSAL, math.nan
+    return PLR_OK, hours_needed
+
+
+def format_plr_hours(status: int, hours: float) -> str:
+    """Formats a (status, hours) pair as the human-readable 'Tiempo al PLR' column."""
+    if status != PLR_OK:
+        return PLR_STATUS_LABELS[status]
+
+    hours = float(hours)
+    if hours >= 24 * 30:
+        months = round(hours / (24 * 30))
+        return f"~{months} meses"
+    elif hours >= 24:
+        days = round(hours / 24)
+        return f"~{days} días"
+    elif hours > 1:
+        return f"~{round(hours, 1)} horas"
+    else:
+        minutes = max(1, round(hours * 60))
+        return f"~{minutes} minutos"
+
+
+def format_projection(projected_price: Optional[float]) -> str:
+    """Formats a projected price, 'N/A' when it could not be computed."""
+    if _is_missing(projected_price):
+        return "N/A"
+    return format_price(float(projected_price))
+
+
+def compute_alert(change_24h: Optional[float], change_7d: Optional[float], indicators: Optional["CoinIndicators"] = None,
+                  rules: Optional["SignalRules"] = None) -> str:
+    """Calculates the buy/sell/risk alert (texto plano) con más variedades."""
+    code = alert_code(change_24h, change_7d, rules)
+    if code == ALERT_DIP and indicators is not None and not indicators.dip_confirmed():
+        code = 0
+    return ALERT_LABELS[code]
+
+def compute_projection(current_price: Optional[float], change_24h: Optional[float]) -> str:
+    """Calculates a simple 48-hour price projection (LINEAR ASSUMPTION)."""
+    if current_price is None or change_24h is None:
+        return "N/A"
+
+    try:
+        return format_projection(current_price * (1 + (change_24h / 100.0)))
+    except (ValueError, TypeError):
+        return "N/A"
+
+def compute_technical_sentiment(change_24h: Optional[float], change_7d: Optional[float], indicators: Optional["CoinIndicators"] = None,
+                                rules: Optional["SignalRules"] = None) -> str:
+    """
+    Technical analysis summary (texto plano). Uses real EMA crosses, RSI and MACD
+    when `indicators` are warm; otherwise simulates them from 24h/7d momentum.
+    """
+    code = indicators.sentiment_code() if indicators is not None else 0
+    return SENTIMENT_LABELS[code or sentiment_code(change_24h, change_7d, rules)]
+
+def compute_time_to_plr(current_price: Optional[float], change_24h: Optional[float], suggested_limit_price: Optional[float]) -> str:
+    """Estimates the time it would take for the price to reach the Suggested Limit Price (PLR)."""
+    try:
+        return format_plr_hours(*plr_hours(current_price, change_24h, suggested_limit_price))
+    except (ZeroDivisionError, ValueError, TypeError):
+        return "N/A"
+
+# --- 3.1 VECTORIZED SIGNAL ENGINE (NumPy) ---
+
+def compute_plr_batch(prices: "np.ndarray", changes_24h: "np.ndarray", limits: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Vectorized plr_hours(): returns (status codes, hours) arrays."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target = (limits - prices) / prices * 100
+        velocity = changes_24h / 24.0
+        hours = target / velocity
+
+    ok = ~(np.isnan(prices) | np.isnan(changes_24h) | np.isnan(limits)) & (limits != 0) & (prices != 0)
+    zero_velocity = np.abs(velocity) < 0.001
+    incompatible = ((target > 0) & (velocity < 0)) | ((target < 0) & (velocity > 0))
+    status = np.select(
+        [~ok, zero_velocity, incompatible, hours < 0],
+        [PLR_NA, PLR_ZERO_VELOCITY, PLR_INCOMPATIBLE, PLR_REVERSAL],
+        default=PLR_OK,
+    ).astype(np.int8)
+    return status, np.where(status == PLR_OK, hours, np.nan)
+
+
+def compute_signals_batch(prices: Sequence[Optional[float]], changes_24h: Sequence[Optional[float]], changes_7d: Sequence[Optional[float]], plr_discount: float = PLR_DISCOUNT,
+                          indicator_sentiment: Optional[Sequence[int]] = None, dip_confirmed: Optional[Sequence[bool]] = None,
+                          rules: Optional["SignalRules"] = None) -> Dict[str, "np.ndarray"]:
+    """
+    Computes alert, sentiment, 48h projection, suggested limit and time-to-PLR
+    for whole columns in one vectorized pass. Missing values (None) become NaN.
+    Optional indicator columns override the momentum sentiment (where non-zero)
+    and veto DIP alerts that the rolling SMA does not confirm. Alert and
+    sentiment codes come from the compiled lookup tables of `rules`.
+    """
+    rules = rules or DEFAULT_SIGNAL_RULES
+    price = np.asarray(prices, dtype=np.float64)
+    c24 = np.asarray(changes_24h, dtype=np.float64)
+    c7 = np.asarray(changes_7d, dtype=np.float64)
+    valid = ~(np.isnan(c24) | np.isnan(c7))
+
+    alert = rules.alerts.codes(c24, c7, valid)
+    sentiment = rules.sentiments.codes(c24, c7, valid)
+    if dip_confirmed is not None:
+        alert = np.where((alert == ALERT_DIP) & ~np.asarray(dip_confirmed, dtype=bool), 0, alert).astype(np.int8)
+    if indicator_sentiment is not None:
+        overlay = np.asarray(indicator_sentiment, dtype=np.int8)
+        sentiment = np.where(overlay > 0, overlay, sentiment).astype(np.int8)
+    projection = price * (1 + c24 / 100.0)
+    limit = np.where((alert == ALERT_DIP) & ~np.isnan(price), price * (1 - plr_discount), np.nan)
+    plr_status, hours = compute_plr_batch(price, c24, limit)
+
+    return {
+        "alert": alert,
+        "sentiment": sentiment,
+        "projection": projection,
+        "limit": limit,
+        "plr_status": plr_status,
+        "plr_hours": hours,
+    }
+
+
+def _compute_signals_scalar(prices: Sequence[Optional[float]], changes_24h: Sequence[Optional[float]], changes_7d: Sequence[Optional[float]], plr_discount: float = PLR_DISCOUNT,
+                            indicator_sentiment: Optional[Sequence[int]] = None, dip_confirmed: Optional[Sequence[bool]] = None,
+                            rules: Optional["SignalRules"] = None) -> Dict[str, List[Any]]:
+    """Pure-Python equivalent of compute_signals_batch (used when NumPy is missing)."""
+    rules = rules or DEFAULT_SIGNAL_RULES
+    out: Dict[str, List[Any]] = {k: [] for k in ("alert", "sentiment", "projection", "limit", "plr_status", "plr_hours")}
+    for i, (price, c24, c7) in enumerate(zip(prices, changes_24h, changes_7d)):
+        code = rules.alerts.code(c24, c7)
+        if code == ALERT_DIP and dip_confirmed is not None and not dip_confirmed[i]:
+            code = 0
+        limit = price * (1 - plr_discount) if code == ALERT_DIP and not _is_missing(price) else math.nan
+        status, hours = plr_hours(price, c24, limit)
+        out["alert"].append(code)
+        out["sentiment"].append((indicator_sentiment[i] if indicator_sentiment is not None else 0) or rules.sentiments.code(c24, c7))
+        out["projection"].append(math.nan if _is_missing(price) or _is_missing(c24) else price * (1 + c24 / 100.0))
+        out["limit"].append(limit)
+        out["plr_status"].append(status)
+        out["plr_hours"].append(hours)
+    return out
+
+
+def compute_signals(prices: Sequence[Optional[float]], changes_24h: Sequence[Optional[float]], changes_7d: Sequence[Optional[float]], plr_discount: float = PLR_DISCOUNT,
+                    indicators: Optional[Sequence[Optional["CoinIndicators"]]] = None, rules: Optional["SignalRules"] = None) -> Dict[str, Sequence[Any]]:
+    """Dispatches to the vectorized engine when NumPy is available."""
+    indicator_sentiment = dip_confirmed = None
+    if indicators is not None:
+        indicator_sentiment = [state.sentiment_code() if state is not None else 0 for state in indicators]
+        dip_confirmed = [state.dip_confirmed() if state is not None else True for state in indicators]
+    if HAS_NUMPY:
+        return compute_signals_batch(prices, changes_24h, changes_7d, plr_discount, indicator_sentiment, dip_confirmed, rules)
+    return _compute_signals_scalar(prices, changes_24h, changes_7d, plr_discount, indicator_sentiment, dip_confirmed, rules)
+
+
+def benchmark_signal_engine(sizes: Sequence[int] = (10_000, 100_000), seed: int = 42) -> None:
+    """Compares the per-coin scalar functions with the vectorized engine and checks they agree."""
+    if not HAS_NUMPY:
+        print("NumPy no está instalado: el motor vectorizado no está disponible.")
+        return
+
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        prices = rng.lognormal(0.0, 3.0, n)
+        c24 = rng.normal(0.0, 6.0, n)
+        c7 = rng.normal(0.0, 12.0, n)
+        p_list, c24_list, c7_list = prices.tolist(), c24.tolist(), c7.tolist()
+
+        start = time.perf_counter()
+        scalar_rows = []
+        for price, d24, d7 in zip(p_list, c24_list, c7_list):
+            alert = compute_alert(d24, d7)
+            sentiment = compute_technical_sentiment(d24, d7)
+            projection = compute_projection(price, d24)
+            limit = price * (1 - PLR_DISCOUNT) if alert == ALERT_LABELS[ALERT_DIP] else None
+            scalar_rows.append((alert, sentiment, projection, format_price(limit) if limit else "", compute_time_to_plr(price, d24, limit)))
+        scalar_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = compute_signals_batch(prices, c24, c7)
+        batch_s = time.perf_counter() - start
+
+        # Se comparan las cadenas que acaban en la tabla: alerta, sentimiento, proyección, PLR y tiempo al PLR
+        batch_rows = zip(batch["alert"].tolist(), batch["sentiment"].tolist(), batch["projection"].tolist(), batch["limit"].tolist(),
+                         batch["plr_status"].tolist(), batch["plr_hours"].tolist())
+        mismatches = sum(row != (ALERT_LABELS[a], SENTIMENT_LABELS[s], format_projection(proj), "" if math.isnan(limit) else format_price(limit),
+                                 format_plr_hours(status, hours))
+                         for row, (a, s, proj, limit, status, hours) in zip(scalar_rows, batch_rows))
+        print(f"{n:>8,} filas | escalar: {scalar_s * 1000:9.1f} ms | vectorizado: {batch_s * 1000:7.1f} ms "
+              f"| x{scalar_s / max(batch_s, 1e-9):6.1f} | coinciden: {'sí' if not mismatches else f'NO ({mismatches} filas)'}")
+
+
+# --- 3.2 STREAMING TECHNICAL INDICATORS (O(1) por tick) ---
+# Periodos expresados en ticks (un tick = un refresco de --interval).
+
+EMA_FAST_PERIOD = 12
+EMA_SLOW_PERIOD = 26
+MACD_SIGNAL_PERIOD = 9
+RSI_PERIOD = 14
+SMA_PERIOD = 20
+CROSS_MEMORY_TICKS = 9      # Un cruce reciente sigue "vivo" durante estos ticks
+RSI_OVERBOUGHT = 70.0
+
+
+class EMA:
+    """Exponential moving average seeded with the first value."""
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, period: int):
+        self.alpha = 2.0 / (period + 1)
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class WilderRSI:
+    """Wilder's RSI: SMA seed over the first `period` deltas, then Wilder smoothing."""
+    __slots__ = ("period", "avg_gain", "avg_loss", "prev", "count")
+
+    def __init__(self, period: int = RSI_PERIOD):
+        self.period = period
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.prev: Optional[float] = None
+        self.count = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is None:
+            self.prev = x
+            return None
+        delta = x - self.prev
+        self.prev = x
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self.count += 1
+        if self.count <= self.period:
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.count < self.period:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+
+class MACD:
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram."""
+    __slots__ = ("fast", "slow", "signal", "line", "hist")
+
+    def __init__(self, fast: int = EMA_FAST_PERIOD, slow: int = EMA_SLOW_PERIOD, signal: int = MACD_SIGNAL_PERIOD):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.line = 0.0
+        self.hist = 0.0
+
+    def update(self, x: float) -> float:
+        self.line = self.fast.update(x) - self.slow.update(x)
+        self.hist = self.line - self.signal.update(self.line)
+        return self.hist
+
+
+class RollingStats:
+    """Fixed-window SMA/stddev over a preallocated ring buffer with running sums."""
+    __slots__ = ("window", "buf", "pos", "count", "total", "total_sq")
+
+    def __init__(self, window: int = SMA_PERIOD):
+        self.window = window
+        self.buf = [0.0] * window
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x: float) -> None:
+        if self.count == self.window:
+            old = self.buf[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.buf[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        self.total += x
+        self.total_sq += x * x
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        if self.count < 2:
+            return None
+        mean = self.total / self.count
+        return math.sqrt(max(0.0, self.total_sq / self.count - mean * mean))
+
+
+class CoinIndicators:
+    """Per-coin indicator state; each update costs O(1) regardless of window length."""
+    __slots__ = ("macd", "rsi", "stats", "price", "ticks", "last_cross", "last_cross_tick", "_prev_diff")
+
+    def __init__(self):
+        self.macd = MACD()
+        self.rsi = WilderRSI()
+        self.stats = RollingStats()
+        self.price: Optional[float] = None
+        self.ticks = 0
+        self.last_cross = 0         # +1 golden cross, -1 death cross
+        self.last_cross_tick = -1
+        self._prev_diff: Optional[float] = None
+
+    def update(self, price: float) -> None:
+        self.price = price
+        self.ticks += 1
+        self.macd.update(price)
+        self.rsi.update(price)
+        self.stats.update(price)
+
+        diff = self.macd.line  # EMA rápida - EMA lenta
+        if self._prev_diff is not None and self.ready:
+            if self._prev_diff <= 0 < diff:
+                self.last_cross, self.last_cross_tick = 1, self.ticks
+            elif self._prev_diff >= 0 > diff:
+                self.last_cross, self.last_cross_tick = -1, self.ticks
+        self._prev_diff = diff
+
+    @property
+    def ready(self) -> bool:
+        return self.ticks >= EMA_SLOW_PERIOD
+
+    def sentiment_code(self) -> int:
+        """Sentiment from real crosses/RSI/MACD; 0 while the indicators are warming up."""
+        if not self.ready:
+            return 0
+        trend_up = self.macd.line > 0
+        recent_cross = self.ticks - self.last_cross_tick <= CROSS_MEMORY_TICKS
+        if recent_cross and self.last_cross > 0 and trend_up:
+            return SENTIMENT_LABELS.index("FUERTE COMPRA (Golden Cross)")
+        if recent_cross and self.last_cross < 0 and not trend_up:
+            return SENTIMENT_LABELS.index("FUERTE VENTA (Death Cross)")
+        rsi = self.rsi.value
+        if rsi is not None and rsi >= RSI_OVERBOUGHT:
+            return SENTIMENT_LABELS.index("NEUTRAL (Sobrecompra)")
+        if self.macd.hist > 0 and trend_up:
+            return SENTIMENT_LABELS.index("COMPRA")
+        if self.macd.hist < 0 and not trend_up:
+            return SENTIMENT_LABELS.index("VENTA")
+        return SENTIMENT_DEFAULT
+
+    def dip_confirmed(self) -> bool:
+        """A DIP only counts when the price really trades below its rolling SMA (True while warming up)."""
+        mean = self.stats.mean
+        if not self.ready or mean is None or self.price is None:
+            return True
+        return self.price < mean
+
+
+class SampleClock:
+    """
+    Indicator cadence shared by the live loop and the backtester: one sample per
+    `interval`, where a tick counts if it lands at most half a frame early, so
+    frame jitter never skips a sample nor doubles one.
+    """
+    __slots__ = ("next",)
+
+    def __init__(self):
+        self.next = float("-inf")
+
+    def due(self, ts: float, interval: float, frame_interval: float) -> bool:
+        if ts < self.next:
+            return False
+        self.next = ts + max(1, interval) - frame_interval / 2
+        return True
+
+
+class IndicatorEngine:
+    """Streaming indicator state keyed by CoinGecko id."""
+
+    def __init__(self):
+        self.coins: Dict[str, CoinIndicators] = {}
+
+    def update(self, coin_id: str, price: float) -> CoinIndicators:
+        state = self.coins.get(coin_id)
+        if state is None:
+            state = self.coins[coin_id] = CoinIndicators()
+        state.update(price)
+        return state
+
+    def update_snapshot(self, data: List[dict]) -> List[Optional[CoinIndicators]]:
+        """Feeds one /coins/markets snapshot; returns the state aligned with `data`."""
+        states: List[Optional[CoinIndicators]] = []
+        for coin in data:
+            coin_id, price = coin.get("id"), coin.get("current_price")
+            states.append(self.update(coin_id, price) if coin_id and price is not None else self.coins.get(coin_id))
+        return states
+
+    def states(self, data: List[dict]) -> List[Optional[CoinIndicators]]:
+        """Current state aligned with `data`, without feeding a new sample."""
+        return [self.coins.get(coin.get("id")) for coin in data]
+
+    def retain(self, ids: set) -> int:
+        """Drops the state of coins no longer watched; returns how many were evicted."""
+        evicted = [coin_id for coin_id in self.coins if coin_id not in ids]
+        for coin_id in evicted:
+            del self.coins[coin_id]
+        return len(evicted)
+
+    def warm_from_store(self, store: "TickStore", start: Optional[float] = None) -> int:
+        """Replays recorded ticks (oldest first) so indicators are ready from the first frame."""
+        fed = 0
+        for chunk in store.scan(start=start):
+            for coin, price in zip(chunk["coin"].tolist(), chunk["price"].tolist()):
+                self.update(store.ids[coin], price)
+                fed += 1
+        return fed
+
+
+# --- 3.3 SIGNAL STATE MACHINE (histéresis, eventos solo en transiciones) ---
+
+HYSTERESIS_BAND = 1.0  # Puntos porcentuales que una señal activa tolera antes de salir
+
+
+def _relaxed_rules(rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]], band: float) -> Tuple[Tuple[str, Tuple[Tuple[int, str, float], ...]], ...]:
+    """Hold version of a rule table: every clause is loosened by `band` towards staying inside."""
+    return tuple(
+        (label, tuple((col, op, threshold - band if op in (">", ">=") else threshold + band) for col, op, threshold in clauses))
+        for label, clauses in rules
+    )
+
+
+def _rule_holds(rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]], code: int, values: Tuple[float, float]) -> bool:
+    return all(_OPS[op](values[col], threshold) for col, op, threshold in rules[code - 1][1])
+
+
+class SignalRules:
+    """
+    Everything that decides a signal as data: alert/sentiment rule tables (same
+    labels and order, thresholds may differ), the PLR offset and the hysteresis
+    band. Built once per configuration; the tables are compiled to lookup grids
+    and the hold rules precomputed, so a tick only reads them.
+    """
+    __slots__ = ("alert_rules", "sentiment_rules", "plr_discount", "band", "alerts", "sentiments", "hold")
+
+    def __init__(self, alert_rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]] = ALERT_RULES,
+                 sentiment_rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]] = SENTIMENT_RULES,
+                 plr_discount: float = PLR_DISCOUNT, band: float = HYSTERESIS_BAND):
+        self.alert_rules = tuple(alert_rules)
+        self.sentiment_rules = tuple(sentiment_rules)
+        self.plr_discount = plr_discount
+        self.band = band
+        self.alerts = RuleTable(self.alert_rules, default=0)
+        self.sentiments = RuleTable(self.sentiment_rules, default=SENTIMENT_DEFAULT)
+        self.hold = {"alert": _relaxed_rules(self.alert_rules, band), "sentiment": _relaxed_rules(self.sentiment_rules, band)}
+
+    def key(self) -> Tuple[Any, ...]:
+        return self.alert_rules, self.sentiment_rules, self.plr_discount, self.band
+
+
+DEFAULT_SIGNAL_RULES = SignalRules()
+
+
+class SignalTransition:
+    """One coin leaving `previous` and entering `current` (code 0 = no signal)."""
+    __slots__ = ("coin_id", "field", "previous", "current", "at", "held_for")
+
+    def __init__(self, coin_id: str, field: str, previous: int, current: int, at: float, held_for: float):
+        self.coin_id = coin_id
+        self.field = field          # "alert" o "sentiment"
+        self.previous = previous
+        self.current = current
+        self.at = at
+        self.held_for = held_for    # Segundos que duró el estado anterior
+
+    def __repr__(self) -> str:
+        labels = ALERT_LABELS if self.field == "alert" else SENTIMENT_LABELS
+        return f"<{self.coin_id} {self.field}: {labels[self.previous] or '-'} → {labels[self.current] or '-'}>"
+
+
+class SignalStateTracker:
+    """
+    Per-coin alert/sentiment state kept in compact arrays indexed through an
+    id → slot map; slots of evicted coins are reused. A coin stays in its current state while the relaxed (hold)
+    version of that rule still matches, so values hovering on a threshold do
+    not flap. apply() returns only the transitions, which is what downstream
+    actions (orders, Telegram) should react to.
+    """
+
+    def __init__(self, band: float = HYSTERESIS_BAND, rules: Optional[SignalRules] = None):
+        self.index: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.alert = array("b")
+        self.sentiment = array("b")
+        self.alert_since = array("d")
+        self.sentiment_since = array("d")
+        self._free: List[int] = []
+        self.rules = rules if rules is not None else SignalRules(band=band)
+        self._hold = self.rules.hold
+
+    def use(self, rules: SignalRules) -> None:
+        """Switches to new thresholds; every coin keeps its current state."""
+        self.rules = rules
+        self._hold = rules.hold
+
+    def _slot(self, coin_id: str) -> int:
+        slot = self.index.get(coin_id)
+        if slot is None and self._free:
+            slot = self.index[coin_id] = self._free.pop()
+            self.ids[slot] = coin_id
+        elif slot is None:
+            slot = self.index[coin_id] = len(self.ids)
+            self.ids.append(coin_id)
+            self.alert.append(0)
+            self.sentiment.append(0)
+            self.alert_since.append(0.0)
+            self.sentiment_since.append(0.0)
+        return slot
+
+    def retain(self, ids: set) -> int:
+        """Frees the slots of coins no longer watched (their state restarts at 0 if they come back)."""
+        evicted = [coin_id for coin_id in self.index if coin_id not in ids]
+        for coin_id in evicted:
+            slot = self.index.pop(coin_id)
+            self.ids[slot] = ""
+            self.alert[slot] = self.sentiment[slot] = 0
+            self.alert_since[slot] = self.sentiment_since[slot] = 0.0
+            self._free.append(slot)
+        return len(evicted)
+
+    def apply(self, ids: Sequence[Optional[str]], prices: Sequence[Optional[float]], changes_24h: Sequence[Optional[float]],
+              changes_7d: Sequence[Optional[float]], signals: Dict[str, Any], now: Optional[float] = None,
+              plr_discount: float = PLR_DISCOUNT) -> List[SignalTransition]:
+        """
+        Applies hysteresis to `signals` in place (alert, sentiment and, where the
+        held alert differs from the raw one, limit/PLR) and returns the transitions.
+        """
+        now = time.time() if now is None else now
+        transitions: List[SignalTransition] = []
+        tables = (("alert", self.alert, self.alert_since), ("sentiment", self.sentiment, self.sentiment_since))
+        for i, coin_id in enumerate(ids):
+            c24, c7 = changes_24h[i], changes_7d[i]
+            if not coin_id or _is_missing(c24) or _is_missing(c7):
+                continue  # Hueco de datos: se conserva el estado anterior
+            slot = self._slot(coin_id)
+            values = (c24, c7)
+            for field, codes, since in tables:
+                raw = int(signals[field][i])
+                previous = codes[slot]
+                current = previous if previous and previous != raw and _rule_holds(self._hold[field], previous, values) else raw
+                if current != raw:
+                    signals[field][i] = current
+                    if field == "alert" and ALERT_DIP in (raw, current):
+                        price = prices[i]
+                        limit = price * (1 - plr_discount) if current == ALERT_DIP and not _is_missing(price) else math.nan
+                        signals["limit"][i] = limit
+                        signals["plr_status"][i], signals["plr_hours"][i] = plr_hours(price, c24, limit)
+                if current != previous:
+                    transitions.append(SignalTransition(coin_id, field, previous, current, now, now - since[slot] if previous else 0.0))
+                    codes[slot] = current
+                    since[slot] = now
+        if transitions:
+            METRICS.inc("signal_transitions_total", len(transitions))
+        return transitions
+
+
+def entered_dip(transitions: Sequence[SignalTransition]) -> set:
+    """Ids that just entered the DIP state (the only ones that should trigger buys/notifications)."""
+    return {t.coin_id for t in transitions if t.field == "alert" and t.current == ALERT_DIP}
+
+
+# --- 3.4 MONTE CARLO RISK (GBM / bootstrap en un pool de procesos) ---
+
+RISK_PATHS = 2000
+RISK_HORIZON_HOURS = 48
+RISK_STEPS_PER_HOUR = 4          # Pasos de 15 min: los toques intrahora del PLR no se pierden del todo
+RISK_RETURN_WINDOW = 256         # Retornos recientes por moneda (volatilidad y remuestreo)
+RISK_MIN_RETURNS = 30            # Por debajo: volatilidad aproximada a partir de 24h/7d
+RISK_CHUNK_COINS = 8             # Monedas por tarea: acota la memoria de cada worker (~25 MB)
+RISK_REFRESH_SECONDS = 60.0
+RISK_BAND_QUANTILES = (5.0, 50.0, 95.0)
+
+
+class ReturnHistory:
+    """
+    Per-coin log returns normalised by sqrt(elapsed hours), so irregular sampling
+    (REST polling, streaming frames, recorded ticks) all estimate the same hourly
+    volatility. The ring of normalised returns doubles as the bootstrap sample.
+    """
+
+    def __init__(self, window: int = RISK_RETURN_WINDOW):
+        self.window = window
+        self.last: Dict[str, Tuple[float, float]] = {}  # id -> (ts, precio)
+        self.returns: Dict[str, RollingStats] = {}
+
+    def update(self, coin_id: str, price: Optional[float], ts: float) -> None:
+        if not coin_id or price is None or price <= 0:
+            return
+        last = self.last.get(coin_id)
+        if last is not None:
+            elapsed_hours = (ts - last[0]) / 3600.0
+            if elapsed_hours * 3600.0 < 1.0:
+                return  # Mismo instante (frame repetido): no es un retorno
+            stats = self.returns.get(coin_id)
+            if stats is None:
+                stats = self.returns[coin_id] = RollingStats(self.window)
+            stats.update(math.log(price / last[1]) / math.sqrt(elapsed_hours))
+        self.last[coin_id] = (ts, price)
+
+    def update_snapshot(self, data: List[dict], ts: float) -> None:
+        for coin in data:
+            self.update(coin.get("id"), coin.get("current_price"), ts)
+
+    def retain(self, ids: set) -> int:
+        evicted = [coin_id for coin_id in self.last if coin_id not in ids]
+        for coin_id in evicted:
+            del self.last[coin_id]
+            self.returns.pop(coin_id, None)
+        return len(evicted)
+
+    def warm_from_store(self, store: "TickStore", start: Optional[float] = None) -> int:
+        fed = 0
+        for chunk in store.scan(start=start):
+            for ts, coin, price in zip(chunk["ts"].tolist(), chunk["coin"].tolist(), chunk["price"].tolist()):
+                self.update(store.ids[coin], price, ts)
+                fed += 1
+        return fed
+
+    def sigma_hour(self, coin_id: str, change_24h: Optional[float], change_7d: Optional[float]) -> Tuple[float, Optional["np.ndarray"]]:
+        """Hourly volatility and standardised residuals (None when history is too short to bootstrap)."""
+        stats = self.returns.get(coin_id)
+        if stats is not None and stats.count >= RISK_MIN_RETURNS and stats.std:
+            ring = np.asarray(stats.buf[:stats.count], dtype=np.float64)
+            return stats.std, (ring - stats.mean) / stats.std
+        # Sin historia: una observación diaria (24h) y una semanal (7d) como estimación burda
+        moves = [math.log1p(c / 100.0) ** 2 * scale for c, scale in ((change_24h, 1.0), (change_7d, 1 / 7.0))
+                 if not _is_missing(c) and c > -100]
+        sigma_day = math.sqrt(sum(moves) / len(moves)) if moves else 0.05
+        return max(sigma_day, 1e-3) / math.sqrt(24.0), None
+
+
+class RiskEstimate:
+    """Monte Carlo summary for one coin."""
+    __slots__ = ("p_hit_24h", "p_hit_48h", "median_hours", "band", "method")
+
+    def __init__(self, p_hit_24h: float, p_hit_48h: float, median_hours: Optional[float], band: Tuple[float, float, float], method: str):
+        self.p_hit_24h = p_hit_24h
+        self.p_hit_48h = p_hit_48h
+        self.median_hours = median_hours  # None: menos de la mitad de los caminos toca el PLR en el horizonte
+        self.band = band                  # Precio a 48h en los cuantiles RISK_BAND_QUANTILES
+        self.method = method
+
+
+def simulate_risk_chunk(prices: "np.ndarray", limits: "np.ndarray", sigmas: "np.ndarray", residuals: Sequence[Optional["np.ndarray"]],
+                        paths: int = RISK_PATHS, steps_per_hour: int = RISK_STEPS_PER_HOUR,
+                        horizon_hours: int = RISK_HORIZON_HOURS, seed: Optional[int] = None) -> Dict[str, "np.ndarray"]:
+    """
+    Simulates `paths` driftless log-price paths per coin for a batch of coins:
+    GBM shocks, or bootstrap draws of the coin's own standardised returns when
+    `residuals` has them. Returns per-coin hit probabilities within 24h/48h,
+    median first-hit time (hours, NaN when not reached by half the paths) and
+    the 48h price quantiles.
+    """
+    rng = np.random.default_rng(seed)
+    steps = horizon_hours * steps_per_hour
+    dt = 1.0 / steps_per_hour
+    shocks = rng.standard_normal((len(prices), paths, steps))
+    for i, sample in enumerate(residuals):
+        if sample is not None and len(sample):
+            shocks[i] = sample[rng.integers(0, len(sample), size=(paths, steps))]
+
+    sigma = np.asarray(sigmas, dtype=np.float64)[:, None, None]
+    log_paths = np.cumsum(shocks * (sigma * math.sqrt(dt)) - 0.5 * sigma ** 2 * dt, axis=2)
+    del shocks
+    barrier = np.log(np.asarray(limits, dtype=np.float64) / np.asarray(prices, dtype=np.float64))[:, None, None]
+    hit = log_paths <= barrier
+    touched = hit.any(axis=2)
+    first = np.where(touched, hit.argmax(axis=2) + 1, np.iinfo(np.int32).max)
+    del hit
+
+    steps_24h = 24 * steps_per_hour
+    first_hours = np.where(touched, first * dt, np.inf)
+    median_hours = np.median(first_hours, axis=1)
+    terminal = np.asarray(prices, dtype=np.float64)[:, None] * np.exp(log_paths[:, :, -1])
+    return {
+        "p_hit_24h": (first <= steps_24h).mean(axis=1),
+        "p_hit_48h": touched.mean(axis=1),
+        "median_hours": np.where(np.isfinite(median_hours), median_hours, np.nan),
+        "band": np.percentile(terminal, RISK_BAND_QUANTILES, axis=1).T,
+    }
+
+
+def _risk_worker(conn: Any) -> None:
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        conn.send(simulate_risk_chunk(*job))
+
+
+class RiskPool:
+    """
+    Minimal process pool over Pipes (ProcessPoolExecutor needs sem_open, which
+    Termux lacks). map() hands each idle worker the next job; results keep order.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        import multiprocessing
+        self.size = max(1, workers or os.cpu_count() or 1)
+        self._conns = []
+        self._procs = []
+        for n in range(self.size):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_risk_worker, args=(child,), name=f"risk-{n}", daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(process)
+
+    def map(self, jobs: Sequence[tuple]) -> List[Any]:
+        import multiprocessing.connection
+        results: List[Any] = [None] * len(jobs)
+        pending = list(enumerate(jobs))[::-1]
+        idle = list(self._conns)
+        busy: Dict[Any, int] = {}
+        while pending or busy:
+            while pending and idle:
+                conn = idle.pop()
+                index, job = pending.pop()
+                conn.send(job)
+                busy[conn] = index
+            for conn in multiprocessing.connection.wait(list(busy)):
+                results[busy.pop(conn)] = conn.recv()
+                idle.append(conn)
+        return results
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process in self._procs:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+
+
+class RiskEngine:
+    """
+    Asynchronous Monte Carlo refresh: the render loop feeds prices and asks for a
+    run at most every `refresh` seconds; a background thread fans coin batches
+    out to the process pool and swaps in the new `results` when they are ready.
+    """
+
+    def __init__(self, method: str = "gbm", paths: int = RISK_PATHS, workers: Optional[int] = None,
+                 refresh: float = RISK_REFRESH_SECONDS, plr_discount: float = PLR_DISCOUNT, history: Optional[ReturnHistory] = None):
+        self.method = method
+        self.paths = paths
+        self.refresh = refresh
+        self.plr_discount = plr_discount
+        self.history = history or ReturnHistory()
+        self.results: Dict[str, RiskEstimate] = {}
+        self.pool = RiskPool(workers)
+        self._pending: Optional[tuple] = None
+        self._next_run = 0.0
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="risk", daemon=True)
+
+    def start(self) -> "RiskEngine":
+        self._thread.start()
+        return self
+
+    def submit(self, data: List[dict]) -> None:
+        """Queues a run over `data` if the previous one is older than `refresh` (latest wins)."""
+        now = time.monotonic()
+        if now < self._next_run:
+            return
+        self._next_run = now + self.refresh
+        ids, prices, sigmas, residuals = [], [], [], []
+        for coin in data:
+            price = coin.get("current_price")
+            if not coin.get("id") or price is None or price <= 0:
+                continue
+            sigma, sample = self.history.sigma_hour(coin.get("id"), coin.get("price_change_percentage_24h_in_currency"),
+                                                    coin.get("price_change_percentage_7d_in_currency"))
+            ids.append(coin.get("id"))
+            prices.append(price)
+            sigmas.append(sigma)
+            residuals.append(sample if self.method == "bootstrap" else None)
+        with self._wakeup:
+            self._pending = (ids, prices, sigmas, residuals)
+            self._wakeup.notify()
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(2.0)
+        self.pool.close()
+
+    def run(self, ids: List[str], prices: List[float], sigmas: List[float], residuals: List[Optional["np.ndarray"]]) -> Dict[str, RiskEstimate]:
+        price_arr = np.asarray(prices, dtype=np.float64)
+        limit_arr = price_arr * (1 - self.plr_discount)
+        seeds = np.random.SeedSequence().generate_state(max(1, math.ceil(len(ids) / RISK_CHUNK_COINS))).tolist()
+        jobs = [(price_arr[k:k + RISK_CHUNK_COINS], limit_arr[k:k + RISK_CHUNK_COINS], sigmas[k:k + RISK_CHUNK_COINS],
+                 residuals[k:k + RISK_CHUNK_COINS], self.paths, RISK_STEPS_PER_HOUR, RISK_HORIZON_HOURS, seeds[n])
+                for n, k in enumerate(range(0, len(ids), RISK_CHUNK_COINS))]
+        results: Dict[str, RiskEstimate] = {}
+        for (start, chunk) in zip(range(0, len(ids), RISK_CHUNK_COINS), self.pool.map(jobs)):
+            for j in range(len(chunk["p_hit_48h"])):
+                median = float(chunk["median_hours"][j])
+                results[ids[start + j]] = RiskEstimate(
+                    float(chunk["p_hit_24h"][j]), float(chunk["p_hit_48h"][j]), None if math.isnan(median) else median,
+                    tuple(float(v) for v in chunk["band"][j]), "bootstrap" if residuals[start + j] is not None else "gbm")
+        return results
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while self._pending is None and not self._stopping:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+                pending, self._pending = self._pending, None
+            started = time.perf_counter()
+            try:
+                self.results = self.run(*pending)
+            except Exception as e:
+                logger.error("Monte Carlo falló: %s", e)
+                continue
+            METRICS.histogram("monte_carlo").observe(time.perf_counter() - started)
+            logger.debug("Monte Carlo: %d monedas x %d caminos en %.2fs.", len(pending[0]), self.paths, time.perf_counter() - started)
+
+
+RISK_HEADERS = ("P(PLR) 24h/48h", "T. PLR (MC)", "Banda 48h (P5–P95)")
+
+
+def format_risk_cells(estimate: Optional[RiskEstimate]) -> Dict[str, str]:
+    if estimate is None:
+        return dict.fromkeys(RISK_HEADERS, "…")  # Primera simulación aún en curso
+    median = "> 48h" if estimate.median_hours is None else f"~{estimate.median_hours:.1f} horas"
+    low, _, high = estimate.band
+    return {
+        "P(PLR) 24h/48h": f"{estimate.p_hit_24h:.0%} / {estimate.p_hit_48h:.0%}",
+        "T. PLR (MC)": median,
+        "Banda 48h (P5–P95)": f"{format_price(low)} – {format_price(high)}",
+    }
+
+
+def benchmark_risk_engine(coins: int = 256, paths: int = RISK_PATHS, max_workers: Optional[int] = None) -> None:
+    """Times one Monte Carlo refresh with 1, 2, 4, ... workers to check the scaling with cores."""
+    if not HAS_NUMPY:
+        print("NumPy no está instalado: el modo Monte Carlo no está disponible.")
+        return
+    rng = np.random.default_rng(7)
+    ids = [f"coin-{i}" for i in range(coins)]
+    prices = rng.lognormal(0.0, 3.0, coins).tolist()
+    sigmas = (rng.uniform(0.2, 1.5, coins) / 100).tolist()
+    limit = max_workers or os.cpu_count() or 1
+    workers, baseline = 1, None
+    while workers <= limit:
+        engine = RiskEngine(paths=paths, workers=workers)
+        engine.run(ids[:RISK_CHUNK_COINS], prices[:RISK_CHUNK_COINS], sigmas[:RISK_CHUNK_COINS], [None] * RISK_CHUNK_COINS)  # calentamiento
+        start = time.perf_counter()
+        engine.run(ids, prices, sigmas, [None] * coins)
+        elapsed = time.perf_counter() - start
+        engine.pool.close()
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers | {coins} monedas x {paths} caminos x {RISK_HORIZON_HOURS * RISK_STEPS_PER_HOUR} pasos: "
+              f"{elapsed:6.2f} s | x{baseline / elapsed:4.1f}")
+        workers *= 2
+
+
+# --- 4. TABLE PRINTING, TELEGRAM NOTIFICATION Y COINBASE ORDER FUNCTION ---
+
+class CoinbaseAccountIndex:
+    """
+    Cached currency -> account id map for the Coinbase Wallet. The account list is
+    downloaded once and refreshed after `ttl` seconds, or early (at most every
+    `miss_refresh` seconds) when a symbol is not found.
+    """
+
+    def __init__(self, client: CoinbaseClient, ttl: float = ACCOUNT_INDEX_TTL, miss_refresh: float = ACCOUNT_MISS_REFRESH):
+        self.client = client
+        self.ttl = ttl
+        self.miss_refresh = miss_refresh
+        self.accounts: Dict[str, str] = {}
+        self.loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        try:
+            accounts = self.client.get_accounts().data
+        except Exception as e:
+            logger.error(f"Error al obtener cuentas de Coinbase: {e}")
+            return False
+        with self._lock:
+            self.accounts = {account['currency']: account['id'] for account in accounts}
+            self.loaded_at = time.monotonic()
+        return True
+
+    def lookup(self, symbol: str) -> Optional[str]:
+        age = time.monotonic() - self.loaded_at
+        if age > self.ttl:
+            self.refresh()
+        account_id = self.accounts.get(symbol)
+        if account_id is None and time.monotonic() - self.loaded_at > self.miss_refresh:
+            self.refresh()
+            account_id = self.accounts.get(symbol)
+        return account_id
+
+
+_account_indexes: "weakref.WeakKeyDictionary[Any, CoinbaseAccountIndex]" = weakref.WeakKeyDictionary()
+
+
+def get_account_index(client: CoinbaseClient) -> CoinbaseAccountIndex:
+    """Returns (creating on first use) the account index attached to a client."""
+    index = _account_indexes.get(client)
+    if index is None:
+        index = _account_indexes[client] = CoinbaseAccountIndex(client)
+    return index
+
+
+@instrumented("get_crypto_account_id")
+def get_crypto_account_id(client: CoinbaseClient, symbol: str) -> Optional[str]:
+    """Busca el ID de la cuenta de la criptomoneda (Ej. BTC) en la Wallet de Coinbase (vía índice en caché)."""
+    account_id = get_account_index(client).lookup(symbol)
+    if account_id is None:
+        logger.warning(f"No se encontró una cuenta de Coinbase para la moneda: {symbol}.")
+    return account_id
+
+@instrumented("place_limit_order_coinbase")
+def place_limit_order_coinbase(
+    client: CoinbaseClient, 
+    symbol: str, 
+    limit_price: float, 
+    usd_amount: float
+) -> Optional[dict]:
+    """
+    Coloca una orden BUY (de Mercado) usando la Wallet API, ya que no soporta órdenes Límite.
+    Compra la cantidad de USD especificada al precio actual de mercado.
+    """
+    if not HAS_COINBASE or client is None:
+        logger.warning("Coinbase client no está disponible.")
+        return None
+
+    account_id = get_crypto_account_id(client, symbol)
+    if not account_id:
+        return None
+
+    try:
+        # Ejecuta una 'buy' gastando la cantidad de dinero (USD)
+        response = client.buy(
+            account_id=account_id,
+            amount=usd_amount, # Cantidad de FIAT a gastar
+            currency="USD",   # Moneda a gastar
+            commit=True      # Realizar la compra
+        )
+
+        logger.info(f"🚀 Orden de COMPRA (Mercado) enviada a Coinbase para {symbol}. Monto: ${usd_amount:.2f} USD.")
+        logger.warning(f"⚠️ Atención: Esta es una orden de MERCADO, no LÍMITE.")
+        # El SDK no siempre envuelve la respuesta en 'data'
+        return response.get('data', response)
+    except Exception as e:
+        logger.error(f"❌ Error al enviar la orden de Coinbase para {symbol}: {e}")
+        return None
+
+LEFT_ALIGNED_COLUMNS = frozenset(("Moneda", "Alerta", "Técnico"))
+
+
+def _format_line(row: Optional[Dict[str, str]], headers: Sequence[str], col_widths: Dict[str, int]) -> str:
+    """One table line; `row=None` formats the header line itself."""
+    cells = []
+    for header in headers:
+        value = header if row is None else str(row.get(header, ''))
+        padding = col_widths[header]
+        # Alinear a la izquierda (Moneda, Alerta, Técnico); a la derecha precios, porcentajes y tiempos
+        cells.append(f"| {value.ljust(padding) if header in LEFT_ALIGNED_COLUMNS else value.rjust(padding)} ")
+    cells.append("|")
+    return "".join(cells)
+
+
+def format_table_lines(rows: List[Dict[str, str]], headers: List[str], col_widths: Dict[str, int]) -> List[str]:
+    """Formats header, separators and rows as plain-text lines with the given column widths."""
+    header_line = _format_line(None, headers, col_widths)
+    separator = "-" * len(header_line)
+    lines = [header_line, separator]
+    lines.extend(_format_line(row, headers, col_widths) for row in rows)
+    lines.append(separator)
+    return lines
+
+
+class TableBuffers:
+    """
+    Row dicts reused from one tick to the next. Every row gets the same keys each
+    tick, so a reused dict is rewritten in place instead of being reallocated.
+    """
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows: List[Dict[str, str]] = []
+
+    def row(self, n: int) -> Dict[str, str]:
+        if n == len(self.rows):
+            self.rows.append({})
+        return self.rows[n]
+
+    def trim(self, used: int) -> None:
+        """Releases the rows beyond this tick's count (e.g. after the watchlist shrank)."""
+        del self.rows[used:]
+
+
+# --- Vista de la tabla (--top / --sort-by / filtros) ---
+
+SORT_KEYS = ("market_cap", "change_24h", "alert", "delta")
+_NO_VALUE = float("-inf")
+
+
+def _dip_indices(alerts: Sequence[int]) -> List[int]:
+    if HAS_NUMPY and isinstance(alerts, np.ndarray):
+        return np.flatnonzero(alerts == ALERT_DIP).tolist()
+    return [i for i, code in enumerate(alerts) if code == ALERT_DIP]
+
+
+def _matching_codes(labels: Sequence[str], patterns: Sequence[str]) -> frozenset:
+    """Codes whose label contains any of the patterns (case-insensitive), e.g. 'dip' or 'fomo'."""
+    wanted = [p.lower() for p in patterns]
+    return frozenset(code for code, label in enumerate(labels) if code and any(p in label.lower() for p in wanted))
+
+
+class SortedIndex:
+    """
+    (key, id) pairs kept in ascending order across ticks. Only coins whose key
+    changed are moved (bisect + list delete/insert, O(log N) search); a bulk
+    change falls back to one re-sort of the almost-sorted list.
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, Any] = {}
+        self.entries: List[Tuple[Any, str]] = []
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        if len(changes) * 8 > len(self.entries):
+            self.keys.update(changes)
+            self.entries = sorted((key, coin_id) for coin_id, key in self.keys.items())
+            return
+        entries = self.entries
+        for coin_id, key in changes.items():
+            old = self.keys.get(coin_id)
+            if old is not None:
+                del entries[bisect.bisect_left(entries, (old, coin_id))]
+            self.keys[coin_id] = key
+            bisect.insort(entries, (key, coin_id))
+
+    def descending(self) -> Iterator[str]:
+        for _, coin_id in reversed(self.entries):
+            yield coin_id
+
+    def discard(self, coin_id: str) -> None:
+        key = self.keys.pop(coin_id, None)
+        if key is not None:
+            del self.entries[bisect.bisect_left(self.entries, (key, coin_id))]
+
+
+class TableView:
+    """
+    Which rows get formatted and in what order. Stable sort keys (market cap,
+    24h change, alert) live in a SortedIndex updated only for coins whose record
+    or alert changed; `delta` changes every tick and uses a K-sized heap instead.
+    Filters are checked lazily while walking, so a tick formats at most `top` rows.
+    """
+
+    def __init__(self, top: Optional[int] = None, sort_by: str = "market_cap", alerts: Optional[Sequence[str]] = None,
+                 sentiments: Optional[Sequence[str]] = None, only_signals: bool = False):
+        self.top = top if top and top > 0 else None
+        self.sort_by = sort_by
+        self.alert_codes = _matching_codes(ALERT_LABELS, alerts) if alerts else None
+        if only_signals:
+            self.alert_codes = self.alert_codes if self.alert_codes is not None else frozenset(range(1, len(ALERT_LABELS)))
+        self.sentiment_codes = _matching_codes(SENTIMENT_LABELS, sentiments) if sentiments else None
+        self.index = SortedIndex()
+        self._seen: Dict[str, Tuple[Any, int]] = {}  # id -> (registro, alerta) con el que se calculó su clave
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "TableView":
+        return cls(getattr(args, "top", None), getattr(args, "sort_by", "market_cap"), getattr(args, "alert", None),
+                   getattr(args, "sentiment", None), getattr(args, "only_signals", False))
+
+    def retain(self, ids: set) -> int:
+        evicted = [coin_id for coin_id in self._seen if coin_id not in ids]
+        for coin_id in evicted:
+            del self._seen[coin_id]
+            self.index.discard(coin_id)
+        return len(evicted)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.top or self.sort_by != "market_cap" or self.alert_codes is not None or self.sentiment_codes is not None)
+
+    def _key(self, coin: Any, alert: int) -> Tuple[float, ...]:
+        if self.sort_by == "change_24h":
+            value = coin.get("price_change_percentage_24h_in_currency")
+            return (_NO_VALUE if value is None else value,)
+        if self.sort_by == "alert":
+            # Primero las monedas con alerta, por prioridad de regla; luego por magnitud del movimiento
+            value = coin.get("price_change_percentage_24h_in_currency")
+            return (1.0 if alert else 0.0, -alert, abs(value) if value is not None else _NO_VALUE)
+        value = coin.get("market_cap")
+        return (_NO_VALUE if value is None else value,)
+
+    def _accepts(self, i: int, signals: Dict[str, Sequence[Any]]) -> bool:
+        if self.alert_codes is not None and int(signals["alert"][i]) not in self.alert_codes:
+            return False
+        return self.sentiment_codes is None or int(signals["sentiment"][i]) in self.sentiment_codes
+
+    def select(self, data: List[dict], signals: Dict[str, Sequence[Any]], prev_prices: Dict[str, float]) -> List[int]:
+        """Positions in `data` of the visible rows, in display order."""
+        limit = self.top or len(data)
+        if self.sort_by == "delta":
+            def delta(i: int) -> float:
+                price, prev = data[i].get("current_price"), prev_prices.get(data[i].get("id"))
+                return abs(price / prev - 1) if price is not None and prev else _NO_VALUE
+            return heapq.nlargest(limit, (i for i in range(len(data)) if self._accepts(i, signals)), key=delta)
+
+        position: Dict[str, int] = {}
+        changes: Dict[str, Any] = {}
+        alerts = signals["alert"]
+        alerts = alerts.tolist() if HAS_NUMPY and isinstance(alerts, np.ndarray) else alerts
+        seen = self._seen
+        for i, coin in enumerate(data):
+            coin_id = coin.id if isinstance(coin, MarketRecord) else coin.get("id")
+            position[coin_id] = i
+            alert = alerts[i]
+            previous = seen.get(coin_id)
+            if previous is None or previous[0] is not coin or previous[1] != alert:
+                seen[coin_id] = (coin, alert)
+                changes[coin_id] = self._key(coin, alert)
+        if changes:
+            self.index.update(changes)
+
+        visible: List[int] = []
+        for coin_id in self.index.descending():
+            i = position.get(coin_id)
+            if i is not None and self._accepts(i, signals):
+                visible.append(i)
+                if len(visible) >= limit:
+                    break
+        return visible
+
+
+@instrumented("build_table")
+def build_table(data: List[dict], prev_prices: Dict[str, float], currency: str,
+                indicators: Optional[List[Optional[CoinIndicators]]] = None, col_widths: Optional[Dict[str, int]] = None,
+                signals: Optional[Dict[str, Sequence[Any]]] = None, view: Optional[TableView] = None,
+                risk: Optional[Dict[str, RiskEstimate]] = None, buffers: Optional[TableBuffers] = None,
+                rules: Optional[SignalRules] = None) -> Dict[str, Any]:
+    """
+    Computes the table rows and formats them into lines without printing.
+    When `col_widths` is given it is updated in place and only ever grows,
+    which keeps the columns stable between frames. With an active `view` only
+    its rows are formatted, while DIP buy signals still cover every coin.
+    `risk` (latest Monte Carlo results by id) adds the simulated PLR columns.
+    With `buffers` the row dicts are reused across ticks instead of reallocated.
+    Without precomputed `signals` they are computed here with `rules`.
+    """
+    rows = []
+    buy_signals_data: List[Dict[str, str | float]] = [] 
+
+    # Señales de todas las monedas en una sola pasada (vectorizada si hay NumPy)
+    if signals is None:
+        rules = rules or DEFAULT_SIGNAL_RULES
+        signals = compute_signals(
+            [coin.get("current_price") for coin in data],
+            [coin.get("price_change_percentage_24h_in_currency") for coin in data],
+            [coin.get("price_change_percentage_7d_in_currency") for coin in data],
+            rules.plr_discount, indicators=indicators, rules=rules,
+        )
+
+    # Filas visibles: todas en el orden de la API, o solo las que elige la vista
+    visible = view.select(data, signals, prev_prices) if view is not None and view.active else None
+    if visible is None:
+        indices: Sequence[int] = range(len(data))
+        visible_set = None
+    else:
+        visible_set = set(visible)
+        indices = sorted(visible_set.union(_dip_indices(signals["alert"])))
+        rows_by_index: Dict[int, Dict[str, str]] = {}
+
+    # Pre-cálculo para determinar si se necesitan las columnas de PLR/Tiempo
+    has_buy_signal_flag = any(int(signals["alert"][i]) == ALERT_DIP for i in (visible if visible is not None else indices))
+
+    # Headers para el output de texto plano
+    active_headers = ["Moneda", "Precio", "Δ(prev)", "24h", "7d", "Proyección 48h", "Alerta", "Técnico"]
+    if has_buy_signal_flag:
+        active_headers.extend(["Límite Sugerido", "Tiempo al PLR"])
+    if risk is not None:
+        active_headers.extend(RISK_HEADERS)
+
+    used = 0  # Filas de `buffers` ya ocupadas en este tick
+    for i in indices:
+        coin = data[i]
+        symbol = coin.get("symbol", "").upper()
+        name = coin.get("id", "")
+        price = coin.get("current_price")
+        change_24h = coin.get("price_change_percentage_24h_in_currency")
+        change_7d = coin.get("price_change_percentage_7d_in_currency")
+
+        alert = int(signals["alert"][i])
+        alert_str = ALERT_LABELS[alert]
+        limit_suggered_float: Optional[float] = None
+        limit_suggered_str = ""
+
+        # SEÑAL DE COMPRA: las órdenes las envía la etapa 'trade' (OrderExecutor), nunca la tabla
+        if alert == ALERT_DIP and price is not None:
+            limit_suggered_float = float(signals["limit"][i])
+            limit_suggered_str = format_price(limit_suggered_float, decimal_limit=4)
+
+            # Datos para notificación de Telegram y para la etapa 'trade'
+            buy_signals_data.append({
+                "symbol": symbol,
+                "name": name,
+                "price": price,
+                "change_24h": change_24h,
+                "change_7d": change_7d,
+                "limit_price": limit_suggered_str,
+                "limit_price_value": limit_suggered_float,
+                "alert": alert_str,
+            })
+
+        if visible_set is not None and i not in visible_set:
+            continue
+
+        price_str = format_price(price)
+        change_24h_str = format_percent(change_24h)
+        change_7d_str = format_percent(change_7d)
+
+        projection_48h_str = format_projection(signals["projection"][i])
+        technical_sentiment_str = SENTIMENT_LABELS[int(signals["sentiment"][i])]
+        time_to_plr_str = format_plr_hours(int(signals["plr_status"][i]), signals["plr_hours"][i])
+
+        delta_str = ""
+        prev = prev_prices.get(name)
+        if prev is not None and price is not None:
+            try:
+                pct = (price - prev) / prev * 100 if prev != 0 else 0.0
+                delta_str = f"{pct:+.2f}%"
+            except (ValueError, TypeError):
+                delta_str = ""
+
+        # Construir la fila de datos para impresión
+        row_data = buffers.row(used) if buffers is not None else {}
+        used += 1
+        row_data["Moneda"] = symbol
+        row_data["Precio"] = price_str
+        row_data["Δ(prev)"] = delta_str
+        row_data["24h"] = change_24h_str
+        row_data["7d"] = change_7d_str
+        row_data["Proyección 48h"] = projection_48h_str
+        row_data["Alerta"] = alert_str
+        row_data["Técnico"] = technical_sentiment_str
+
+        if has_buy_signal_flag:
+            row_data["Límite Sugerido"] = limit_suggered_str
+            row_data["Tiempo al PLR"] = time_to_plr_str
+        if risk is not None:
+            row_data.update(format_risk_cells(risk.get(name)))
+
+        if visible is None:
+            rows.append(row_data)
+        else:
+            rows_by_index[i] = row_data
+
+    if visible is not None:
+        rows = [rows_by_index[i] for i in visible]
+    if buffers is not None:
+        buffers.trim(used)
+
+    # --- Formato final (Texto Plano) ---
+    lines: List[str] = []
+    if rows:
+        # Calcular el ancho máximo para cada columna (nunca encoge si se reutiliza col_widths)
+        widths = col_widths if col_widths is not None else {}
+        for header in active_headers:
+            widths[header] = max(widths.get(header, 0), len(header))
+        for row in rows:
+            for header in active_headers:
+                widths[header] = max(widths[header], len(str(row.get(header, ''))))
+        lines = format_table_lines(rows, active_headers, widths)
+
+    return {
+        "prev_prices": {coin.get("id"): coin.get("current_price") for coin in data if coin.get("id") and coin.get("current_price") is not None},
+        "buy_signals": buy_signals_data,
+        "lines": lines,
+    }
+
+
+def _cell_width(ch: str) -> int:
+    if unicodedata.combining(ch) or ch in "\u200d\ufe0e\ufe0f":
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in "WF" else 1
+
+
+def clip_to_width(line: str, width: int) -> str:
+    """Cuts `line` to at most `width` terminal cells (wide emoji count as two)."""
+    if 2 * len(line) <= width:
+        return line
+    used = 0
+    for i, ch in enumerate(line):
+        used += _cell_width(ch)
+        if used > width:
+            return line[:i]
+    return line
+
+
+class DiffRenderer:
+    """
+    Renders whole frames with a single write per frame. Later frames only
+    rewrite the lines that changed, addressed by screen row, so every line is
+    clipped to the terminal width (no wrapping) and the frame to its height
+    (no scrolling). The screen is cleared and redrawn in full on the first
+    frame, when the line count or terminal size changes, and after anything
+    was logged to the terminal in between (a log line shifts the screen).
+    """
+
+    CLEAR = "\x1b[H\x1b[2J"
+
+    def __init__(self, stream=None, log_handler: Optional[logging.Handler] = None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.previous: List[str] = []
+        self.col_widths: Dict[str, int] = {}
+        self._size: Optional[Tuple[int, int]] = None
+        self._clipped: List[str] = []
+        self._invalid = True
+        if log_handler is not None:
+            log_handler.addFilter(self)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Logging filter hook: any record written to the terminal forces a full redraw."""
+        self._invalid = True
+        return True
+
+    def _terminal_size(self) -> Optional[Tuple[int, int]]:
+        try:
+            if not self.stream.isatty():
+                return None
+        except (AttributeError, ValueError):
+            return None
+        size = shutil.get_terminal_size()
+        return size.columns, size.lines
+
+    def draw(self, lines: List[str]) -> int:
+        """Writes the frame and returns the number of lines that were rewritten."""
+        size = self._terminal_size()
+        width = height = None
+        if size is not None:
+            # Última columna y última fila libres: ni salto automático ni scroll
+            width, height = max(1, size[0] - 1), max(2, size[1] - 1)
+            if len(lines) > height:
+                hidden = len(lines) - height + 1
+                lines = lines[:height - 1] + [f"… {hidden} líneas más (amplía la terminal o usa --top N)"]
+
+        def clip(line: str) -> str:
+            return line if width is None else clip_to_width(line, width)
+
+        if self._invalid or size != self._size or len(lines) != len(self.previous):
+            self._invalid = False
+            self._size = size
+            self._clipped = [clip(line) for line in lines]
+            out = self.CLEAR + "\n".join(self._clipped) + "\n"
+            changed = len(lines)
+        else:
+            parts = []
+            for i, (line, old) in enumerate(zip(lines, self.previous)):
+                if line != old:
+                    clipped = clip(line)
+                    if clipped != self._clipped[i]:
+                        self._clipped[i] = clipped
+                        parts.append(f"\x1b[{i + 1};1H{clipped}\x1b[K")
+            parts.append(f"\x1b[{len(lines) + 1};1H")
+            out = "".join(parts)
+            changed = len(parts) - 1
+        self.stream.write(out)
+        self.stream.flush()
+        self.previous = lines
+        return changed
+
+
+TELEGRAM_MAX_MESSAGE_CHARS = 4096
+TELEGRAM_MESSAGES_PER_MINUTE = 20   # Límite de Telegram para grupos (1 msg/s en chats privados)
+TELEGRAM_SIGNAL_COOLDOWN = 60 * 60  # No repetir la misma señal (moneda, estado) dentro de esta ventana
+TELEGRAM_MAX_PENDING = 500
+TELEGRAM_MAX_ATTEMPTS = 3
+TELEGRAM_MAX_REQUEUES = 3           # Rondas fallidas (de TELEGRAM_MAX_ATTEMPTS intentos) antes de descartar una señal
+
+
+@instrumented("send_telegram_message")
+def _post_telegram(http: Any, bot_token: str, chat_id: str, message: str) -> Tuple[bool, Optional[float]]:
+    """POSTs one HTML message; returns (sent, retry_after seconds when Telegram throttles)."""
+    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    try:
+        # CAMBIO CRÍTICO: Usamos parse_mode="HTML"
+        resp = http.post(url, data={"chat_id": chat_id, "text": message, "parse_mode": "HTML"}, timeout=10)
+        if resp.status_code == 429:
+            try:
+                retry_after = float(resp.json().get("parameters", {}).get("retry_after", 1))
+            except (ValueError, AttributeError, TypeError):
+                retry_after = parse_retry_after(resp.headers.get("Retry-After")) or 1.0
+            logger.warning("Telegram rate limit (429): retry after %.0fs.", retry_after)
+            return False, retry_after
+        resp.raise_for_status()
+        return True, None
+    except requests.RequestException as e:
+        logger.warning("Error sending Telegram message: %s", e)
+        return False, None
+
+
+def send_telegram_message(bot_token: str, chat_id: str, message: str, session: Optional[requests.Session] = None) -> bool:
+    """Sends a message to a specific Telegram chat. USES HTML parse mode."""
+    if not bot_token or not chat_id:
+        logger.debug("Telegram skipped: Token or Chat ID not configured.")
+        return False
+    return _post_telegram(session or requests, bot_token, chat_id, message)[0]
+
+
+# --- 1. ENCABEZADO Y DEFINICIÓN DEL ANÁLISIS ---
+BUY_MESSAGE_HEADER = [
+    "<b>🔥 ALERTA ÉPICA 🔥</b>",
+    "El mercado está ofreciendo un <i>pullback saludable</i> dentro de una tendencia alcista.",
+    "Estrategia activada: <b>COMPRA LÍMITE</b> (-2% del precio actual) para maximizar ganancias.",
+    "",
+    "--- **ANÁLISIS DETALLADO** ---"
+]
+
+# --- 2. PIE DE MENSAJE, ESTRATEGIA Y REFERIDO ---
+BUY_MESSAGE_FOOTER = [
+    "",
+    "---",
+    # --- NUEVO BLOQUE DE REFERIDO ---
+    "🤝 **RECOMENDACIÓN DE EXCHANGE**",
+    "Si aún no tienes cuenta, regístrate en **Coinbase** con mi enlace y ambos ganaremos <b>10 USD en BTC</b>.",
+    "🔗 <b>LINK DE REGISTRO:</b> https://coinbase.com/join/QHMF3XN?src=android-share",
+    "",
+    # -------------------------------
+    "Estrategia de trading con órdenes límite compartida por <b>Chegüi / Non Fungible Metaverse</b>.",
+    "<i>¡No compres con Miedo! Compra con estrategia.</i> 🌐",
+]
+
+
+def buy_signal_block(signal: Dict[str, str | float]) -> List[str]:
+    """Message lines describing one DIP buy signal."""
+    symbol = str(signal['symbol']).upper()
+    name = str(signal['name']).upper()
+
+    price_str = format_price(signal['price'])
+    pct_24h_str = format_percent(signal['change_24h'])
+    pct_7d_str = format_percent(signal['change_7d'])
+    limit_price_str = str(signal['limit_price'])
+
+    # Definición descriptiva basada en la señal DIP
+    definition = (
+        "📈 <i>Corrección de Momentum:</i> La caída de -4% o más en 24h es una toma de ganancias "
+        "que no ha roto el soporte semanal. El volumen sugiere <b>Reacumulación</b>."
+    )
+
+    return [
+        "",
+        f"💰 **ACTIVO: {symbol}** ({name}) 🎯",
+        f"   - 📊 <b>Precio Actual:</b> <u>{price_str}</u> USD",
+        f"   - 📉 <b>Var. 24h/7d:</b> {pct_24h_str} / {pct_7d_str}",
+        f"   - 🚀 <b>PLR Sugerido (Orden Límite):</b> <b>{limit_price_str}</b>",
+        f"   - 🧐 <b>Definición del Análisis:</b> {definition}",
+        f"   - ✍️ <b>Sugerencia Precisa:</b> Ejecutar <b>Orden Límite</b> en Coinbase Advanced/Binance a <u>{limit_price_str}</u> USD.",
+    ]
+
+
+def build_buy_signal_message(buy_signals: List[Dict[str, str | float]]) -> str:
+    """Builds the HTML Telegram message for the DIP buy signals (VERSIÓN AVANZADA NFM con Referido)."""
+    msg_parts = list(BUY_MESSAGE_HEADER)
+    for signal in buy_signals:
+        msg_parts.extend(buy_signal_block(signal))
+    msg_parts.extend(BUY_MESSAGE_FOOTER)
+    return "\n".join(msg_parts)
+
+
+def pack_buy_signal_messages(buy_signals: List[Dict[str, str | float]], max_chars: int = TELEGRAM_MAX_MESSAGE_CHARS) -> List[Tuple[str, List[int]]]:
+    """Coalesces many signals into as few messages as possible, each under max_chars; pairs each with its signal indices."""
+    header = "\n".join(BUY_MESSAGE_HEADER)
+    footer = "\n".join(BUY_MESSAGE_FOOTER)
+    budget = max_chars - len(header) - len(footer) - 2  # dos saltos de línea de unión
+    messages: List[Tuple[str, List[int]]] = []
+    blocks: List[str] = []
+    members: List[int] = []
+    used = 0
+    for i, signal in enumerate(buy_signals):
+        block = "\n".join(buy_signal_block(signal))
+        if blocks and used + len(block) + 1 > budget:
+            messages.append(("\n".join([header, *blocks, footer]), members))
+            blocks, members, used = [], [], 0
+        blocks.append(block)
+        members.append(i)
+        used += len(block) + 1
+    if blocks:
+        messages.append(("\n".join([header, *blocks, footer]), members))
+    return messages
+
+
+def build_buy_signal_messages(buy_signals: List[Dict[str, str | float]], max_chars: int = TELEGRAM_MAX_MESSAGE_CHARS) -> List[str]:
+    """Coalesces many signals into as few messages as possible, each under max_chars."""
+    return [message for message, _ in pack_buy_signal_messages(buy_signals, max_chars)]
+
+
+class TelegramNotifier:
+    """
+    Background Telegram sender for buy signals. It reuses one pooled session,
+    paces messages with a per-chat token bucket that honours `retry_after`,
+    suppresses a (coin, state) signal already sent within `cooldown`, and
+    coalesces everything pending into as few <=4096-char messages as possible.
+    Only delivered signals start their cooldown; the signals of a message that
+    failed go back to the queue. submit() never blocks the price loop.
+    """
+
+    def __init__(self, bot_token: str, chat_id: str, cooldown: float = TELEGRAM_SIGNAL_COOLDOWN,
+                 messages_per_minute: float = TELEGRAM_MESSAGES_PER_MINUTE, session: Optional[requests.Session] = None):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.cooldown = cooldown
+        self.session = session or create_session(retries=0)
+        self.limiter = TokenBucketLimiter(messages_per_minute, burst=1)
+        self.pending: "OrderedDict[Tuple[str, str], Dict[str, str | float]]" = OrderedDict()
+        self.last_sent: Dict[Tuple[str, str], float] = {}
+        self.failures: Dict[Tuple[str, str], int] = {}
+        self.sent = self.suppressed = self.dropped = 0
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+
+    @staticmethod
+    def signal_key(signal: Dict[str, str | float]) -> Tuple[str, str]:
+        return str(signal.get("name") or signal.get("symbol")), str(signal.get("alert") or ALERT_LABELS[ALERT_DIP])
+
+    def start(self) -> "TelegramNotifier":
+        self._thread.start()
+        return self
+
+    def submit(self, buy_signals: List[Dict[str, str | float]]) -> None:
+        now = time.monotonic()
+        with self._wakeup:
+            for signal in buy_signals:
+                key = self.signal_key(signal)
+                if key in self.pending or now - self.last_sent.get(key, float("-inf")) < self.cooldown:
+                    self.suppressed += 1
+                    continue
+                self.pending[key] = signal
+                if len(self.pending) > TELEGRAM_MAX_PENDING:
+                    self.pending.popitem(last=False)
+                    self.dropped += 1
+            self._wakeup.notify()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self.pending and not self._stopping:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+                batch = list(self.pending.items())
+                self.pending.clear()
+
+            failed: List[Tuple[Tuple[str, str], Dict[str, str | float]]] = []
+            for message, members in pack_buy_signal_messages([signal for _, signal in batch]):
+                if self._deliver(message):
+                    self.sent += 1
+                    logger.info("Telegram buy notification sent. 🔔")
+                    now = time.monotonic()
+                    for i in members:
+                        self.last_sent[batch[i][0]] = now
+                        self.failures.pop(batch[i][0], None)
+                else:
+                    failed.extend(batch[i] for i in members)
+            if failed:
+                self._requeue(failed)
+            now = time.monotonic()
+            if len(self.last_sent) > TELEGRAM_MAX_PENDING:
+                # Pasado el cooldown la entrada ya no filtra nada: se descarta
+                self.last_sent = {key: at for key, at in self.last_sent.items() if now - at < self.cooldown}
+
+    def _requeue(self, failed: List[Tuple[Tuple[str, str], Dict[str, str | float]]]) -> None:
+        # Un fallo transitorio no silencia la moneda: vuelve a la cola (salvo si ya hay una señal más nueva)
+        with self._wakeup:
+            for key, signal in reversed(failed):
+                attempts = self.failures[key] = self.failures.get(key, 0) + 1
+                if attempts >= TELEGRAM_MAX_REQUEUES or self._stopping:
+                    self.failures.pop(key, None)
+                    self.dropped += 1
+                    continue
+                if key not in self.pending:
+                    self.pending[key] = signal
+                    self.pending.move_to_end(key, last=False)
+
+    def _deliver(self, message: str) -> bool:
+        for _ in range(TELEGRAM_MAX_ATTEMPTS):
+            if self._stopping:
+                return False
+            self.limiter.acquire()
+            ok, retry_after = _post_telegram(self.session, self.bot_token, self.chat_id, message)
+            self.limiter.feedback(429 if retry_after is not None else 200, retry_after)
+            if ok:
+                return True
+        return False
+
+
+def create_coinbase_client_instance(api_key: str, api_secret: str) -> Optional[CoinbaseClient]:
+    """Inicializa el cliente de Coinbase SDK (Wallet API)."""
+    global HAS_COINBASE
+
+    if not HAS_COINBASE:
+        logger.warning("Coinbase SDK no está instalado. Automatización deshabilitada.")
+        return None
+
+    if not api_key or not api_secret:
+        logger.warning("Coinbase API Key/Secret no configurados. La automatización de trading está deshabilitada.")
+        return None
+
+    try:
+        from coinbase.wallet.client import Client as CoinbaseClient
+    except ImportError:
+        logger.warning("Coinbase SDK no está instalado. Automatización deshabilitada.")
+        HAS_COINBASE = False
+        return None
+
+    try:
+        client = CoinbaseClient(api_key, api_secret) 
+        client.get_current_user() 
+        get_account_index(client).refresh()
+        logger.info("✅ Cliente de Coinbase Wallet API inicializado y conectado.")
+        return client
+    except Exception as e:
+        logger.error(f"❌ Error al conectar a Coinbase (Verifica tus claves/permisos): {e}")
+        HAS_COINBASE = False 
+        return None
+
+
+def start_coinbase_auth(api_key: str, api_secret: str) -> "Future[Optional[CoinbaseClient]]":
+    """
+    Connects to Coinbase on a daemon thread so the first fetch and render never
+    wait for get_current_user(); consumers resolve the future when they need it.
+    """
+    future: "Future[Optional[CoinbaseClient]]" = Future()
+    if not (HAS_COINBASE and api_key and api_secret):
+        future.set_result(create_coinbase_client_instance(api_key, api_secret))
+        return future
+
+    def connect() -> None:
+        try:
+            future.set_result(create_coinbase_client_instance(api_key, api_secret))
+        except BaseException as e:
+            future.set_exception(e)
+        STARTUP_MARKS.setdefault("coinbase auth (background)", time.perf_counter())
+
+    threading.Thread(target=connect, name="coinbase-auth", daemon=True).start()
+    return future
+
+
+# --- 4.1 PIPELINE DE EJECUCIÓN (fetch → render → notify / trade) ---
+
+RENDER_QUEUE_SIZE = 1   # Solo importa el frame más reciente (la única etapa que descarta)
+TRADE_QUEUE_SIZE = 16
+STORE_QUEUE_SIZE = 64
+
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    Consumer thread fed by a bounded queue. With `drop_oldest` the producer
+    never blocks: a full queue drops (and counts) its oldest item, so a slow
+    terminal never delays the next tick. Otherwise nothing is ever dropped and
+    a full queue makes the producer wait, which is the right trade for orders.
+    """
+
+    def __init__(self, name: str, handler, maxsize: int, drop_oldest: bool = False):
+        self.name = name
+        self.handler = handler
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self) -> "PipelineStage":
+        self._thread.start()
+        return self
+
+    def submit(self, item: Any) -> None:
+        if not self.drop_oldest:
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    logger.debug("Stage '%s' saturated: dropped oldest item (%d total).", self.name, self.dropped)
+                except queue.Empty:
+                    pass
+
+    def stop(self, timeout: float = 2.0) -> None:
+        try:
+            self.queue.put(_STOP, timeout=timeout)  # Sin descartar: lo ya encolado termina de procesarse
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                logger.error(f"Error en la etapa '{self.name}': {e}", exc_info=True)
+
+
+def banner_lines(args: argparse.Namespace, timestamp: datetime) -> List[str]:
+    """Decorated title block of each frame."""
+    current_time_utc = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+
+    # --- TÍTULO DECORADO (Texto Plano) ---
+    return [
+        "=========================================================================================",
+        "✨ NON FUNGIBLE METAVERSE ✨",
+        "--- 🧠 Analizador Avanzado de Precios Crypto (CLI) 🚀 ---",
+        f"Última Actualización: {current_time_utc} UTC | Cryptos: {args.cryptos} | Fiat: {args.currency}",
+        "=========================================================================================",
+    ]
+
+
+def footer_lines(args: argparse.Namespace) -> List[str]:
+    # --- MENSAJE DE CIERRE ---
+    return [
+        "=========================================================================================",
+        f"Updating in {args.interval} seconds... (Ctrl+C to stop 🛑)",
+    ]
+
+
+def _order_succeeded(response: Optional[dict]) -> bool:
+    """Whether a Coinbase buy response is an accepted order (None or a failed/canceled status is not)."""
+    if response is None:
+        return False
+    if response.get("success") is False:
+        return False
+    return str(response.get("status", "")).lower() not in ("failed", "canceled", "cancelled", "rejected")
+
+
+class OrderExecutor:
+    """
+    Trade consumer: takes all DIP signals of a tick, skips coins with an order in
+    flight or placed within `cooldown` seconds, and submits the rest concurrently
+    with bounded parallelism.
+    """
+
+    def __init__(self, client: Union[CoinbaseClient, "Future[Optional[CoinbaseClient]]", None], usd_amount: float = DEFAULT_TRADE_AMOUNT_USD,
+                 cooldown: float = ORDER_COOLDOWN_SECONDS, max_parallel: int = ORDER_MAX_PARALLEL):
+        self.client = client
+        self.usd_amount = usd_amount
+        self.cooldown = cooldown
+        self.max_parallel = max_parallel
+        self.recent: Dict[str, float] = {}   # símbolo -> instante (monotonic) de la última orden
+        self.in_flight: set = set()
+        self.skipped = 0
+        self.failed = 0
+        self.disabled = False  # Autenticación fallida: no se reintenta en cada tick
+        self._lock = threading.Lock()
+
+    def _claim(self, symbol: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if symbol in self.in_flight or now - self.recent.get(symbol, float("-inf")) < self.cooldown:
+                self.skipped += 1
+                return False
+            self.in_flight.add(symbol)
+            return True
+
+    def _place(self, symbol: str, limit_price: float) -> Optional[dict]:
+        try:
+            response = place_limit_order_coinbase(
+                client=self.client,
+                symbol=symbol,
+                limit_price=limit_price,
+                usd_amount=self.usd_amount
+            )
+        except Exception as e:
+            logger.error(f"Error en cálculo/envío para {symbol}: {e}")
+            response = None
+        # Sin respuesta (cuenta no encontrada, error del SDK) o rechazada: la moneda no entra en cooldown
+        placed = _order_succeeded(response)
+        with self._lock:
+            self.in_flight.discard(symbol)
+            if not placed:
+                self.failed += 1
+            else:
+                now = time.monotonic()
+                self.recent = {s: at for s, at in self.recent.items() if now - at < self.cooldown}
+                self.recent[symbol] = now
+        return response
+
+    def _resolve_client(self) -> Optional[CoinbaseClient]:
+        # La autenticación corre en segundo plano: la etapa 'trade' la espera, el render no
+        if self.disabled:
+            return None
+        if isinstance(self.client, Future):
+            try:
+                self.client = self.client.result(timeout=COINBASE_AUTH_TIMEOUT)
+            except TimeoutError:
+                logger.warning("Coinbase aún no ha respondido; señales omitidas en este tick.")
+                return None
+            except Exception as e:
+                logger.error(f"Autenticación de Coinbase fallida: {e}")
+                self.client = None
+            if self.client is None:
+                # Fallo definitivo (claves o red): se recuerda una vez en lugar de reintentarlo cada tick
+                self.disabled = True
+                logger.warning("Coinbase no disponible: trading automático desactivado.")
+        return self.client
+
+    def execute(self, buy_signals: List[Dict[str, str | float]]) -> List[Optional[dict]]:
+        if not (HAS_COINBASE and self.usd_amount > 0 and self._resolve_client()):
+            return []
+        orders: Dict[str, float] = {}
+        for signal in buy_signals:
+            symbol = str(signal["symbol"])
+            limit_price = signal.get("limit_price_value")
+            if symbol in orders or not limit_price or limit_price <= 0:
+                continue
+            if self._claim(symbol):
+                orders[symbol] = float(limit_price)
+        if not orders:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(orders))) as pool:
+            return list(pool.map(lambda item: self._place(*item), orders.items()))
+
+
+class PriceBook:
+    """
+    Previous price per coin in a float array indexed through a stable id → slot
+    map (NaN = empty). retain() frees the slots of ids no longer watched for the
+    next new id, so the book is sized by the watchlist, not by every id ever seen.
+    Reads like the dict it replaces (get/update/items).
+    """
+    __slots__ = ("index", "prices", "_free")
+
+    def __init__(self, capacity: int = 0):
+        self.index: Dict[str, int] = {}
+        self.prices = array("d", [math.nan]) * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self.index
+
+    def get(self, coin_id: str, default: Optional[float] = None) -> Optional[float]:
+        slot = self.index.get(coin_id)
+        return default if slot is None else self.prices[slot]
+
+    def update(self, prices: Dict[str, float]) -> None:
+        for coin_id, price in prices.items():
+            slot = self.index.get(coin_id)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self.prices)
+                    self.prices.append(math.nan)
+                self.index[coin_id] = slot
+            self.prices[slot] = price
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        prices = self.prices
+        return ((coin_id, prices[slot]) for coin_id, slot in self.index.items())
+
+    def retain(self, ids: set) -> int:
+        evicted = [coin_id for coin_id in self.index if coin_id not in ids]
+        for coin_id in evicted:
+            slot = self.index.pop(coin_id)
+            self.prices[slot] = math.nan
+            self._free.append(slot)
+        return len(evicted)
+
+
+def watchlist_ids(cryptos: str) -> set:
+    return {c.strip().lower() for c in cryptos.split(",") if c.strip()}
+
+
+def run_pipeline(args: argparse.Namespace, session: requests.Session, limiter: Optional[TokenBucketLimiter],
+                 coinbase_client: Union[CoinbaseClient, "Future[Optional[CoinbaseClient]]", None], telegram_token: str, telegram_chat: str,
+                 max_ticks: Optional[int] = None, tick_store: Optional[TickStore] = None,
+                 indicator_engine: Optional[IndicatorEngine] = None, cache: Optional[ResponseCache] = None,
+                 source: Optional[PriceSource] = None, risk_engine: Optional[RiskEngine] = None,
+                 server: Optional[SnapshotServer] = None, config: Optional["LiveConfig"] = None) -> None:
+    """
+    Runs the analyzer as a pipeline: the fetcher ticks on a fixed-rate schedule
+    (compensating for drift) and computes signals, transitions and buy orders on
+    every tick; drawing, Telegram notifications and Coinbase orders run as
+    independent consumers behind bounded queues, and the render stage only
+    draws, so a dropped frame never loses a signal. When the cache hands back
+    the previous payload object, the table is not recomputed.
+    `source` defaults to REST polling; a streaming source ticks at its frame rate.
+    `risk_engine` samples returns at the indicator cadence and refreshes its
+    Monte Carlo estimates in the background. With a `server` the analyzer runs
+    headless: each computed tick is published to the query API instead of drawn.
+    Per-coin state is evicted whenever an id leaves `args.cryptos`, and row dicts
+    are reused between ticks, so memory stays flat however long it runs.
+    A `config` file may change the watchlist, currency, interval and signal
+    thresholds while running; each tick reads whatever it last applied.
+    """
+    if source is None:
+        source = RestPollingSource(session, args.cryptos, args.currency, args.interval, per_page=args.per_page,
+                                   max_concurrency=args.max_concurrency, limiter=limiter, cache=cache)
+    prev_prices = PriceBook(len(watchlist_ids(args.cryptos)))
+    last_table: Dict[str, Any] = {"data": None, "lines": [], "risk": None, "cryptos": None, "currency": args.currency, "rules": None}
+    # Los indicadores se muestrean a --interval aunque el stream entregue frames más a menudo
+    indicator_clock = SampleClock()
+
+    notifier = TelegramNotifier(telegram_token, telegram_chat).start() if telegram_token and telegram_chat else None
+    trader = PipelineStage("trade", OrderExecutor(coinbase_client).execute, TRADE_QUEUE_SIZE).start()
+
+    diff_renderer = DiffRenderer(log_handler=handler) if args.render == "diff" else None
+    tracker = SignalStateTracker()
+    view = TableView.from_args(args)
+    buffers = TableBuffers()
+    holders = [holder for holder in (prev_prices, indicator_engine, tracker, view, risk_engine.history if risk_engine else None)
+               if holder is not None]
+
+    def evict_unwatched() -> None:
+        # Solo cuando cambia la watchlist: las monedas retiradas sueltan todo su estado
+        last_table["cryptos"] = args.cryptos
+        ids = watchlist_ids(args.cryptos)
+        if args.currency != last_table["currency"]:
+            # Precios e historia en otra moneda no se comparan con los nuevos
+            last_table["currency"] = args.currency
+            ids = set()
+        evicted = sum(holder.retain(ids) for holder in holders)
+        if evicted:
+            METRICS.inc("evicted_coin_states_total", evicted)
+            logger.debug("Watchlist changed: evicted %d per-coin state entries.", evicted)
+
+    def analyze(data: List[MarketRecord], timestamp: datetime) -> List[str]:
+        """Signals, transitions, orders and alerts for one snapshot; returns the table lines to draw."""
+        rules = config.rules if config is not None else DEFAULT_SIGNAL_RULES
+        if (data is last_table["data"] and rules is last_table["rules"]
+                and (risk_engine is None or risk_engine.results is last_table["risk"])):
+            # Mercado sin cambios: mismas filas, sin señales nuevas que enviar
+            return last_table["lines"]
+        if args.cryptos != last_table["cryptos"] or args.currency != last_table["currency"]:
+            evict_unwatched()
+        if rules is not tracker.rules:
+            tracker.use(rules)
+            if risk_engine is not None:
+                risk_engine.plr_discount = rules.plr_discount
+        states = None
+        sample = indicator_clock.due(timestamp.timestamp(), args.interval, source.frame_interval)
+        if indicator_engine is not None:
+            states = indicator_engine.update_snapshot(data) if sample else indicator_engine.states(data)
+        risk = None
+        if risk_engine is not None:
+            if sample:
+                risk_engine.history.update_snapshot(data, timestamp.timestamp())
+            risk_engine.submit(data)
+            risk = risk_engine.results
+        prices = [coin.get("current_price") for coin in data]
+        changes_24h = [coin.get("price_change_percentage_24h_in_currency") for coin in data]
+        changes_7d = [coin.get("price_change_percentage_7d_in_currency") for coin in data]
+        signals = compute_signals(prices, changes_24h, changes_7d, rules.plr_discount, indicators=states, rules=rules)
+        transitions = tracker.apply([coin.get("id") for coin in data], prices, changes_24h, changes_7d, signals, plr_discount=rules.plr_discount)
+        for transition in transitions:
+            logger.debug("Transición: %r", transition)
+        result = build_table(data, prev_prices, args.currency, indicators=states, signals=signals, view=view, risk=risk, buffers=buffers,
+                             col_widths=diff_renderer.col_widths if diff_renderer is not None else None)
+        if server is not None:
+            server.publish(data, signals, prev_prices, result["lines"], timestamp.timestamp(), risk)
+        # Solo las monedas que acaban de entrar en DIP disparan órdenes y avisos
+        entered = entered_dip(transitions)
+        buy_signals = [signal for signal in result["buy_signals"] if signal["name"] in entered]
+        if buy_signals:
+            trader.submit(buy_signals)
+            if notifier is not None:
+                notifier.submit(buy_signals)
+        prev_prices.update({k: v for k, v in result["prev_prices"].items() if v is not None})
+        last_table["data"], last_table["lines"], last_table["risk"], last_table["rules"] = data, result["lines"], risk, rules
+        return result["lines"]
+
+    def render(frame: Tuple[Optional[List[str]], datetime]) -> None:
+        # Solo dibuja: un frame descartado por un terminal lento no pierde órdenes, avisos ni muestras
+        table, timestamp = frame
+        lines = banner_lines(args, timestamp)
+        lines.extend(table or ())
+        lines.extend(footer_lines(args))
+        if diff_renderer is not None:
+            diff_renderer.draw(lines)
+        else:
+            if not args.no_clear:
+                clear_terminal()
+            print("\n".join(lines))
+        STARTUP_MARKS.setdefault("first frame", time.perf_counter())
+
+    # Sin terminal en modo daemon: cada tick se publica en la API de consulta
+    renderer = PipelineStage("render", render, RENDER_QUEUE_SIZE, drop_oldest=True).start() if server is None else None
+    stages = [stage for stage in (renderer, notifier, trader) if stage is not None]
+
+    recorder = None
+    if tick_store is not None:
+        recorder = PipelineStage("store", lambda frame: tick_store.append(frame[0], frame[1].timestamp()), STORE_QUEUE_SIZE).start()
+        stages.append(recorder)
+
+    source.start()
+    if config is not None:
+        config.changed.clear()  # La carga inicial ya está en args/rules: el primer fetch la usa
+    next_tick = time.monotonic()
+    ticks = 0
+    last_data = None
+    last_render = float("-inf")
+    try:
+        while max_ticks is None or ticks < max_ticks:
+            data = source.snapshot()
+            STARTUP_MARKS.setdefault("first fetch", time.perf_counter())
+            timestamp = datetime.now(UTC)
+            # Señales y transiciones en el hilo de fetch: todo tick cuenta aunque el render vaya atrasado
+            table = analyze(data, timestamp) if data else None
+            # Un snapshot sin cambios solo se redibuja cada redraw_interval (siempre, con REST)
+            redraw = data is not last_data or time.monotonic() - last_render >= source.redraw_interval
+            if redraw and not data:
+                logger.warning("No data retrieved from CoinGecko. Retrying... 🔄")
+            if renderer is None:
+                STARTUP_MARKS.setdefault("first frame", time.perf_counter())
+            elif redraw:
+                renderer.submit((table, timestamp))
+                last_render = time.monotonic()
+            if recorder is not None and data and data is not last_data:
+                recorder.submit((data, timestamp))
+            last_data = data or last_data
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+
+            # Planificación a tasa fija: si un tick se retrasa, se saltan los slots perdidos
+            interval = source.frame_interval  # Puede cambiar al recargar --config
+            next_tick += interval
+            now = time.monotonic()
+            if now > next_tick:
+                missed = math.ceil((now - next_tick) / interval)
+                logger.debug("Fetch overran its slot; skipping %d tick(s).", missed)
+                next_tick += missed * interval
+            delay = max(0.0, next_tick - time.monotonic())
+            if config is not None and config.changed.wait(delay):
+                # Config recargada: se pide ya la watchlist nueva en vez de esperar al slot
+                config.changed.clear()
+                next_tick = time.monotonic()
+            elif config is None:
+                time.sleep(delay)
+    finally:
+        source.stop()
+        for stage in stages:
+            stage.stop()
+        if diff_renderer is not None:
+            handler.removeFilter(diff_renderer)
+        if risk_engine is not None:
+            risk_engine.stop()
+        if tick_store is not None:
+            tick_store.close()
+
+
+# --- 4.2 TICK STORE (columnar, append-only, memmap) ---
+
+TICK_FIELDS = [
+    ("ts", "<f8"),          # epoch seconds (UTC)
+    ("coin", "<i4"),        # índice estable en ids.txt
+    ("price", "<f8"),
+    ("change_24h", "<f4"),
+    ("change_7d", "<f4"),
+]
+
+
+@functools.lru_cache(maxsize=None)
+def tick_dtype() -> "np.dtype":
+    """Row layout of the tick segments (built on first use so importing does not load NumPy)."""
+    return np.dtype(TICK_FIELDS)
+
+
+DEFAULT_SEGMENT_ROWS = 1 << 22  # ~117 MB por segmento (archivo disperso hasta que se escribe)
+
+
+class TickStore:
+    """
+    Append-only local time series of market snapshots. Rows live in fixed-size
+    NumPy memmap segment files (ticks-NNNNN.bin) that roll over when full; ids are
+    mapped to stable int32 indices in ids.txt. Rows with ts == 0 are unused slots.
+    Time-window reads are zero-copy views over the mapped segments.
+    """
+
+    def __init__(self, directory: str, segment_rows: int = DEFAULT_SEGMENT_ROWS):
+        if not HAS_NUMPY:
+            raise RuntimeError("TickStore requiere NumPy (pip install numpy).")
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self._ids_path = os.path.join(directory, "ids.txt")
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, encoding="utf-8") as f:
+                for line in f:
+                    self._register(line.rstrip("\n"))
+        self._lock = threading.Lock()
+        self._segments: List[str] = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith("ticks-") and name.endswith(".bin")
+        )
+        self._active: Optional["np.memmap"] = None
+        self._fill = 0
+        if self._segments:
+            self._active = np.memmap(self._segments[-1], dtype=tick_dtype(), mode="r+")
+            self._fill = self._filled_rows(self._active)
+
+    def _register(self, coin_id: str) -> int:
+        idx = len(self.ids)
+        self.ids.append(coin_id)
+        self.index[coin_id] = idx
+        return idx
+
+    def _coin_index(self, coin_id: str) -> int:
+        idx = self.index.get(coin_id)
+        if idx is None:
+            idx = self._register(coin_id)
+            with open(self._ids_path, "a", encoding="utf-8") as f:
+                f.write(coin_id + "\n")
+        return idx
+
+    @staticmethod
+    def _filled_rows(segment: "np.ndarray") -> int:
+        """Binary search for the first unused (ts == 0) slot."""
+        lo, hi = 0, len(segment)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if segment[mid]["ts"] > 0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _roll_segment(self) -> None:
+        if self._active is not None:
+            self._active.flush()
+        path = os.path.join(self.directory, f"ticks-{len(self._segments):05d}.bin")
+        self._active = np.memmap(path, dtype=tick_dtype(), mode="w+", shape=(self.segment_rows,))
+        self._segments.append(path)
+        self._fill = 0
+
+    def append(self, data: List[dict], timestamp: float) -> int:
+        """Appends one snapshot (the /coins/markets list) and returns the rows written."""
+        rows = [coin for coin in data if coin.get("id") and coin.get("current_price") is not None]
+        if not rows:
+            return 0
+        block = np.empty(len(rows), dtype=tick_dtype())
+        block["ts"] = timestamp
+        block["coin"] = [self._coin_index(coin.get("id")) for coin in rows]
+        block["price"] = [coin.get("current_price") for coin in rows]
+        block["change_24h"] = np.array([coin.get("price_change_percentage_24h_in_currency") for coin in rows], dtype=np.float64)
+        block["change_7d"] = np.array([coin.get("price_change_percentage_7d_in_currency") for coin in rows], dtype=np.float64)
+
+        with self._lock:
+            written = 0
+            while written < len(block):
+                if self._active is None or self._fill >= len(self._active):
+                    self._roll_segment()
+                n = min(len(block) - written, len(self._active) - self._fill)
+                self._active[self._fill:self._fill + n] = block[written:written + n]
+                self._fill += n
+                written += n
+        return written
+
+    def scan(self, coin_id: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None) -> Iterator["np.ndarray"]:
+        """
+        Yields per-segment arrays for the [start, end) time window, oldest first.
+        Without coin_id the arrays are views of the memmap (no copy); selecting a
+        coin applies a mask to that view.
+        """
+        coin = self.index.get(coin_id) if coin_id is not None else None
+        if coin_id is not None and coin is None:
+            return
+        with self._lock:
+            segments = list(self._segments)
+            active, fill = self._active, self._fill
+        for n, path in enumerate(segments):
+            if n == len(segments) - 1:
+                seg = active[:fill]
+            else:
+                seg = np.memmap(path, dtype=tick_dtype(), mode="r")
+                seg = seg[:self._filled_rows(seg)]
+            if not len(seg):
+                continue
+            if (start is not None and seg[-1]["ts"] < start) or (end is not None and seg[0]["ts"] >= end):
+                continue
+            ts = seg["ts"]
+            lo = int(np.searchsorted(ts, start, side="left")) if start is not None else 0
+            hi = int(np.searchsorted(ts, end, side="left")) if end is not None else len(seg)
+            window = seg[lo:hi]
+            if coin is not None:
+                window = window[window["coin"] == coin]
+            if len(window):
+                yield window
+
+    def history(self, coin_id: str, start: Optional[float] = None, end: Optional[float] = None) -> "np.ndarray":
+        """Returns the ticks of one coin in the time window as a single array."""
+        chunks = list(self.scan(coin_id, start, end))
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=tick_dtype())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+
+
+# --- 4.3 REPLAY / BACKTEST (sin red ni sleeps) ---
+
+BACKTEST_HORIZON_HOURS = 48.0
+# Dirección esperada de cada alerta: +1 alcista, -1 bajista, 0 sin dirección (no se evalúa)
+ALERT_DIRECTION = {
+    "💸 VENTA! (FOMO)": -1,
+    "⚠️ BULL TRAP / VENTA C/P": -1,
+    "💀 CAPITULACIÓN/PÁNICO": -1,
+    "📈 REVERSIÓN V/B (COMPRA)": 1,
+    "🚀 RUPTURA ALCISTA (COMPRA)": 1,
+    "📉 COMPRA! (DIP)": 1,
+    "💎 ACUMULACIÓN FUERTE (LT)": 1,
+    "🟢 MOMENTUM SALUDABLE": 1,
+    "⚠️ CORRECCIÓN C/P": -1,
+    "😴 RANGO/CONSOLIDACIÓN": 0,
+    "⚖️ ESTABLE": 0,
+}
+
+
+def _parse_snapshot_ts(data: List[dict], fallback: float) -> float:
+    for coin in data:
+        stamp = coin.get("last_updated")
+        if stamp:
+            try:
+                return datetime.fromisoformat(stamp.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                break
+    return fallback
+
+
+def _store_snapshot(store: "TickStore", block: "np.ndarray") -> Tuple[float, List[str], "np.ndarray", "np.ndarray", "np.ndarray"]:
+    return (float(block["ts"][0]), [store.ids[c] for c in block["coin"].tolist()],
+            block["price"], block["change_24h"].astype(np.float64), block["change_7d"].astype(np.float64))
+
+
+def iter_replay_snapshots(path: str, interval: float = DEFAULT_INTERVAL) -> Iterator[Tuple[float, List[str], List[Optional[float]], List[Optional[float]], List[Optional[float]]]]:
+    """
+    Streams (ts, ids, prices, changes_24h, changes_7d) snapshots from a recording:
+    a TickStore directory, a CSV tick file (ts,id,price,change_24h,change_7d sorted
+    by ts) or JSON lines holding /coins/markets lists or {"ts": ..., "data": [...]}.
+    """
+    if os.path.isdir(path):
+        store = TickStore(path)
+        pending = None  # Último tick del trozo anterior: puede seguir en el siguiente segmento
+        for chunk in store.scan():
+            bounds = np.flatnonzero(np.diff(chunk["ts"])) + 1
+            blocks = np.split(chunk, bounds)
+            if pending is not None and pending["ts"][0] == blocks[0]["ts"][0]:
+                blocks[0] = np.concatenate((pending, blocks[0]))
+            elif pending is not None:
+                yield _store_snapshot(store, pending)
+            pending = blocks.pop()
+            for block in blocks:
+                yield _store_snapshot(store, block)
+        if pending is not None:
+            yield _store_snapshot(store, pending)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            reader = csv.DictReader(f)
+            current_ts: Optional[float] = None
+            rows: List[dict] = []
+            for row in reader:
+                ts = float(row["ts"])
+                if current_ts is not None and ts != current_ts:
+                    yield current_ts, *_snapshot_columns(rows)
+                    rows = []
+                current_ts = ts
+                rows.append({"id": row["id"], "current_price": _float_or_none(row.get("price")),
+                             "price_change_percentage_24h_in_currency": _float_or_none(row.get("change_24h")),
+                             "price_change_percentage_7d_in_currency": _float_or_none(row.get("change_7d"))})
+            if rows:
+                yield current_ts, *_snapshot_columns(rows)
+            return
+
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict):
+                data = record.get("data") or []
+                ts = float(record.get("ts") or _parse_snapshot_ts(data, n * interval))
+            else:
+                data = record
+                ts = _parse_snapshot_ts(data, n * interval)
+            yield ts, *_snapshot_columns(data)
+
+
+def _float_or_none(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+def _snapshot_columns(data: List[dict]) -> Tuple[List[str], List[Optional[float]], List[Optional[float]], List[Optional[float]]]:
+    return ([coin.get("id") for coin in data],
+            [coin.get("current_price") for coin in data],
+            [coin.get("price_change_percentage_24h_in_currency") for coin in data],
+            [coin.get("price_change_percentage_7d_in_currency") for coin in data])
+
+
+class Backtester:
+    """
+    Streams snapshots through the live signal path (IndicatorEngine sampled at
+    `interval`, compute_signals with the SMA DIP veto, SignalStateTracker
+    hysteresis) and keeps O(coins) array state:
+    - alert hit rate: on entry into an alert, checks the price direction `horizon` later;
+    - DIP strategy: on entry into DIP (the only event that trades live) a PLR limit
+      order valid for `horizon`, and once filled a position closed at market
+      `horizon` after the fill.
+    """
+
+    def __init__(self, horizon_hours: float = BACKTEST_HORIZON_HOURS, usd_amount: float = DEFAULT_TRADE_AMOUNT_USD,
+                 interval: float = DEFAULT_INTERVAL, rules: Optional[SignalRules] = None):
+        self.horizon = horizon_hours * 3600.0
+        self.usd_amount = usd_amount
+        self.interval = max(1, interval)
+        self.rules = rules or DEFAULT_SIGNAL_RULES
+        self.indicators = IndicatorEngine()
+        self.tracker = SignalStateTracker(rules=self.rules)
+        self.clock = SampleClock()
+        self.index: Dict[str, int] = {}
+        self._capacity = 0
+        self._alloc(256)
+        n_alerts = len(ALERT_LABELS)
+        self.entries = np.zeros(n_alerts, dtype=np.int64)
+        self.evaluated = np.zeros(n_alerts, dtype=np.int64)
+        self.hits = np.zeros(n_alerts, dtype=np.int64)
+        self.orders = 0
+        self.fills = 0
+        self.returns: List[float] = []
+        self.rows = 0
+        self.snapshots = 0
+        self._direction = np.array([ALERT_DIRECTION.get(label, 0) for label in ALERT_LABELS], dtype=np.int8)
+
+    def _alloc(self, capacity: int) -> None:
+        def grow(name: str, fill: float, dtype: Any) -> None:
+            new = np.full(capacity, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:len(old)] = old
+            setattr(self, name, new)
 
-        # Imprimir Encabezado
-        header_dict = {h: h for h in active_headers}
-        header_line = format_line(header_dict, is_header=True)
-        print(header_line)
-        print("-" * len(header_line))
+        grow("eval_at", np.inf, np.float64)       # evaluación pendiente de alerta
+        grow("eval_price", np.nan, np.float64)
+        grow("eval_alert", 0, np.int8)
+        grow("order_limit", np.nan, np.float64)   # orden PLR pendiente
+        grow("order_expiry", np.inf, np.float64)
+        grow("entry_price", np.nan, np.float64)   # posición abierta
+        grow("exit_at", np.inf, np.float64)
+        self._capacity = capacity
 
-        # Imprimir Datos
-        for row in rows:
-            print(format_line(row))
+    def _coin_indices(self, ids: Sequence[str]) -> "np.ndarray":
+        index = self.index
+        idx = np.fromiter((index.setdefault(coin_id, len(index)) for coin_id in ids), dtype=np.int64, count=len(ids))
+        if len(index) > self._capacity:
+            self._alloc(max(len(index), self._capacity * 2))
+        return idx
+
+    def feed(self, ts: float, ids: Sequence[str], prices: Sequence[Optional[float]],
+             changes_24h: Sequence[Optional[float]], changes_7d: Sequence[Optional[float]]) -> None:
+        coins = self._coin_indices(ids)
+        price = np.asarray(prices, dtype=np.float64)
+        price_list = price.tolist()
+        # Igual que run_pipeline: indicadores muestreados a --interval, veto SMA del DIP e histéresis.
+        # Los ticks grabados llegan cada `interval`, que hace también de frame del SampleClock
+        if self.clock.due(ts, self.interval, self.interval):
+            states = [self.indicators.update(coin_id, p) if coin_id and not math.isnan(p) else self.indicators.coins.get(coin_id)
+                      for coin_id, p in zip(ids, price_list)]
+        else:
+            states = [self.indicators.coins.get(coin_id) for coin_id in ids]
+        rules = self.rules
+        signals = compute_signals(price_list, changes_24h, changes_7d, rules.plr_discount, indicators=states, rules=rules)
+        transitions = self.tracker.apply(ids, price_list, changes_24h, changes_7d, signals, now=ts, plr_discount=rules.plr_discount)
+        limit = np.asarray(signals["limit"], dtype=np.float64)
+        entered = np.zeros(len(coins), dtype=bool)
+        entered_codes = np.zeros(len(coins), dtype=np.int8)
+        if transitions:
+            position = {coin_id: i for i, coin_id in enumerate(ids)}
+            for transition in transitions:
+                if transition.field == "alert" and transition.current > 0:
+                    i = position[transition.coin_id]
+                    entered[i], entered_codes[i] = True, transition.current
+        have_price = ~np.isnan(price)
+        self.rows += len(coins)
+        self.snapshots += 1
+
+        # 1. Evaluaciones de alertas vencidas
+        due = have_price & (self.eval_at[coins] <= ts)
+        if due.any():
+            c, codes = coins[due], self.eval_alert[coins[due]]
+            move = np.sign(price[due] - self.eval_price[c])
+            direction = self._direction[codes]
+            np.add.at(self.evaluated, codes, 1)
+            np.add.at(self.hits, codes, (move == direction).astype(np.int64))
+            self.eval_at[c] = np.inf
+
+        # 2. Entradas nuevas en una alerta (las transiciones del tracker, como en vivo)
+        np.add.at(self.entries, entered_codes[entered], 1)
+        schedule = entered & have_price & np.isinf(self.eval_at[coins])
+        c = coins[schedule]
+        self.eval_at[c] = ts + self.horizon
+        self.eval_price[c] = price[schedule]
+        self.eval_alert[c] = entered_codes[schedule]
+
+        # 3. Estrategia PLR: cierres, ejecuciones, expiraciones y nuevas órdenes
+        closing = have_price & (self.exit_at[coins] <= ts)
+        if closing.any():
+            c = coins[closing]
+            self.returns.extend(((price[closing] - self.entry_price[c]) / self.entry_price[c]).tolist())
+            self.entry_price[c] = np.nan
+            self.exit_at[c] = np.inf
+        filled = have_price & (price <= self.order_limit[coins])
+        if filled.any():
+            c = coins[filled]
+            self.fills += int(filled.sum())
+            self.entry_price[c] = self.order_limit[c]
+            self.exit_at[c] = ts + self.horizon
+            self.order_limit[c] = np.nan
+            self.order_expiry[c] = np.inf
+        expired = self.order_expiry[coins] <= ts
+        self.order_limit[coins[expired]] = np.nan
+        self.order_expiry[coins[expired]] = np.inf
+        new_orders = entered & (entered_codes == ALERT_DIP) & np.isnan(self.order_limit[coins]) & np.isnan(self.entry_price[coins]) & have_price
+        if new_orders.any():
+            c = coins[new_orders]
+            self.orders += int(new_orders.sum())
+            self.order_limit[c] = limit[new_orders]
+            self.order_expiry[c] = ts + self.horizon
+
+    def report(self, elapsed: float) -> List[str]:
+        lines = [
+            f"Snapshots: {self.snapshots:,} | Filas: {self.rows:,} | Monedas: {len(self.index):,} | "
+            f"Tiempo: {elapsed:.2f}s | Eventos/s: {self.rows / max(elapsed, 1e-9):,.0f}",
+            "",
+            f"{'Alerta':<28} {'Entradas':>9} {'Evaluadas':>10} {'Acierto':>8}",
+        ]
+        for code in range(1, len(ALERT_LABELS)):
+            if not self.entries[code]:
+                continue
+            label = ALERT_LABELS[code]
+            rate = f"{self.hits[code] / self.evaluated[code] * 100:.1f}%" if self.evaluated[code] and ALERT_DIRECTION.get(label) else "-"
+            lines.append(f"{label:<28} {self.entries[code]:>9,} {self.evaluated[code]:>10,} {rate:>8}")
+        returns = np.asarray(self.returns, dtype=np.float64)
+        pnl = float(returns.sum() * self.usd_amount)
+        lines += [
+            "",
+            f"Estrategia PLR (-{self.rules.plr_discount * 100:.0f}%, horizonte {self.horizon / 3600:.0f}h, ${self.usd_amount:.2f}/orden):",
+            f"  Órdenes: {self.orders:,} | Ejecutadas: {self.fills:,} | Cerradas: {len(returns):,}",
+            f"  Retorno medio: {returns.mean() * 100 if len(returns) else 0.0:+.2f}% | "
+            f"Ganadoras: {(returns > 0).mean() * 100 if len(returns) else 0.0:.1f}% | PnL simulado: ${pnl:+,.2f} USD",
+        ]
+        return lines
+
+
+def run_replay(path: str, horizon_hours: float = BACKTEST_HORIZON_HOURS, interval: float = DEFAULT_INTERVAL,
+               rules: Optional[SignalRules] = None) -> Backtester:
+    """Replays a recording through the signal pipeline as fast as the CPU allows and prints the report."""
+    backtester = Backtester(horizon_hours, interval=interval, rules=rules)
+    start = time.perf_counter()
+    for snapshot in iter_replay_snapshots(path, interval):
+        backtester.feed(*snapshot)
+    print("\n".join(backtester.report(time.perf_counter() - start)))
+    return backtester
+
+
+# --- 4.4 BENCHMARK HARNESS & LOCAL COINGECKO STAND-IN ---
+
+class StandInMarketHandler:
+    """Serves synthetic /coins/markets pages (same fields and paging as CoinGecko)."""
+
+    latency = 0.0       # segundos añadidos a cada respuesta
+    rate_429 = 0.0      # probabilidad de responder 429
+    rng = random.Random(0)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_429 and self.rng.random() < self.rate_429:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        ids = [i for i in query.get("ids", [""])[0].split(",") if i]
+        per_page = int(query.get("per_page", ["100"])[0])
+        page = int(query.get("page", ["1"])[0])
+        coins = sorted((synthetic_coin(coin_id, self.rng) for coin_id in ids), key=lambda c: -c["market_cap"])
+        body = json.dumps(coins[(page - 1) * per_page:page * per_page]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-        print("-" * len(header_line))
 
+def synthetic_base_price(coin_id: str) -> float:
+    return 10 ** ((zlib.crc32(coin_id.encode()) % 1000) / 125.0 - 3)
 
+
+def synthetic_coin(coin_id: str, rng: random.Random) -> dict:
+    """A /coins/markets-shaped record with a stable base price per id and random noise."""
+    base = synthetic_base_price(coin_id)
+    price = base * (1 + rng.gauss(0, 0.002))
+    change_24h = rng.gauss(0, 5)
     return {
-        "prev_prices": {name: price for name, price in zip([coin.get("id") for coin in data], [coin.get("current_price") for coin in data]) if name and price is not None},
-        "buy_signals": buy_signals_data
+        "id": coin_id, "symbol": coin_id[:4], "name": coin_id.title(), "image": f"https://example.invalid/{coin_id}.png",
+        "current_price": price, "market_cap": base * 1e9, "market_cap_rank": None, "fully_diluted_valuation": base * 1.2e9,
+        "total_volume": base * 1e8, "high_24h": price * 1.03, "low_24h": price * 0.97,
+        "price_change_24h": price * change_24h / 100, "price_change_percentage_24h": change_24h,
+        "market_cap_change_24h": base * 1e7, "market_cap_change_percentage_24h": change_24h,
+        "circulating_supply": 1e9, "total_supply": 1.2e9, "max_supply": None, "ath": price * 2,
+        "ath_change_percentage": -50.0, "ath_date": "2021-11-10T14:24:11.849Z", "atl": price / 20,
+        "atl_change_percentage": 1900.0, "atl_date": "2015-10-20T00:00:00.000Z", "roi": None,
+        "last_updated": datetime.now(UTC).isoformat().replace("+00:00", "Z"),
+        "price_change_percentage_24h_in_currency": change_24h,
+        "price_change_percentage_7d_in_currency": rng.gauss(0, 12),
     }
 
 
-def send_telegram_message(bot_token: str, chat_id: str, message: str) -> bool:
-    """Sends a message to a specific Telegram chat. USES HTML parse mode."""
-    if not bot_token or not chat_id:
-        logger.debug("Telegram skipped: Token or Chat ID not configured.")
-        return False
+def _serve_stand_in(port_sender: Any, latency: float, rate_429: float, seed: int) -> None:
+    StandInMarketHandler.latency = latency
+    StandInMarketHandler.rate_429 = rate_429
+    StandInMarketHandler.rng = random.Random(seed)
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _with_bases(StandInMarketHandler, "http.server:BaseHTTPRequestHandler"))
+    port_sender.send(server.server_address[1])
+    server.serve_forever()
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    try:
-        # CAMBIO CRÍTICO: Usamos parse_mode="HTML"
-        resp = requests.post(url, data={"chat_id": chat_id, "text": message, "parse_mode": "HTML"}, timeout=10)
-        resp.raise_for_status()
-        return True
-    except requests.RequestException as e:
-        logger.warning("Error sending Telegram message: %s", e)
-        return False
 
-def create_coinbase_client_instance(api_key: str, api_secret: str) -> Optional[CoinbaseClient]:
-    """Inicializa el cliente de Coinbase SDK (Wallet API)."""
-    global HAS_COINBASE
+def start_stand_in_server(latency: float = 0.0, rate_429: float = 0.0, seed: int = 0) -> Tuple[multiprocessing.Process, str]:
+    """
+    Starts the stand-in in a child process (so it does not compete for this
+    process' GIL) and returns it with its /coins/markets URL. A Pipe is used
+    instead of a Queue because Termux lacks sem_open.
+    """
+    import multiprocessing
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve_stand_in, args=(sender, latency, rate_429, seed), daemon=True)
+    process.start()
+    if not receiver.poll(10):
+        process.terminate()
+        raise RuntimeError("El servidor local de CoinGecko no arrancó a tiempo.")
+    port = receiver.recv()
+    return process, f"http://127.0.0.1:{port}/api/v3/coins/markets"
 
-    if not HAS_COINBASE:
-        logger.warning("Coinbase SDK no está instalado. Automatización deshabilitada.")
-        return None
 
-    if not api_key or not api_secret:
-        logger.warning("Coinbase API Key/Secret no configurados. La automatización de trading está deshabilitada.")
+class StandInTickerHandler:
+    """
+    Local Coinbase Exchange `ticker` feed: upgrades the socket, answers
+    per-product subscriptions (unknown products get Coinbase's error message)
+    and streams random-walk trades around each coin's stand-in base price.
+    """
+
+    bases: Dict[str, float] = {}  # "BITC-USD" -> precio base (el mismo que sirve el stand-in REST)
+    rate = 20.0                   # mensajes/s por conexión
+    drop_after = 0                # Cortar la conexión tras N mensajes (0 = nunca), para probar la reconexión
+    seed = 0
+
+    def handle(self) -> None:
+        sock = self.request
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        head, _, rest = request.partition(b"\r\n\r\n")
+        headers = {name.strip().lower(): value.strip() for name, _, value in
+                   (line.partition(":") for line in head.decode("latin-1").split("\r\n")[1:])}
+        sock.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {ws_accept_key(headers.get('sec-websocket-key', ''))}\r\n\r\n").encode())
+        conn = WebSocketConnection(sock, rest, mask=False)
+        sock.settimeout(0.001)
+        rng = random.Random(self.seed)
+        prices: Dict[str, float] = {}
+        sent = 0
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                    if message is None:
+                        return
+                    self._subscribe(conn, json.loads(message), prices)
+                    continue
+                except TimeoutError:
+                    pass
+                if prices:
+                    product = rng.choice(list(prices))
+                    prices[product] *= 1 + rng.gauss(0, 0.002)
+                    conn.send(json.dumps({"type": "ticker", "sequence": sent, "product_id": product, "price": f"{prices[product]:.10g}",
+                                          "time": datetime.now(UTC).isoformat().replace("+00:00", "Z")}))
+                    sent += 1
+                    if self.drop_after and sent >= self.drop_after:
+                        return
+                time.sleep(1.0 / self.rate)
+        except OSError:
+            return
+
+    def _subscribe(self, conn: WebSocketConnection, request: dict, prices: Dict[str, float]) -> None:
+        if request.get("type") != "subscribe":
+            return
+        for product in request.get("product_ids", []):
+            if product in self.bases:
+                prices.setdefault(product, self.bases[product])
+            else:
+                conn.send(json.dumps({"type": "error", "message": "Failed to subscribe", "reason": f"{product} is not a valid product"}))
+        conn.send(json.dumps({"type": "subscriptions", "channels": [{"name": "ticker", "product_ids": sorted(prices)}]}))
+
+
+def _serve_ws_stand_in(port_sender: Any, bases: Dict[str, float], rate: float, drop_after: int, seed: int) -> None:
+    StandInTickerHandler.bases = bases
+    StandInTickerHandler.rate = rate
+    StandInTickerHandler.drop_after = drop_after
+    StandInTickerHandler.seed = seed
+    import socketserver
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _with_bases(StandInTickerHandler, "socketserver:StreamRequestHandler"))
+    port_sender.send(server.server_address[1])
+    server.serve_forever()
+
+
+def start_ws_stand_in(coin_ids: Sequence[str], currency: str = "usd", rate: float = 20.0, drop_after: int = 0,
+                      seed: int = 0) -> Tuple[multiprocessing.Process, str]:
+    """
+    Starts the WebSocket ticker stand-in for the given CoinGecko ids (products
+    named like the REST stand-in's symbols) in a child process; returns it and its ws:// URL.
+    """
+    quote = currency.upper()
+    bases = {f"{coin_id[:4].upper()}-{quote}": synthetic_base_price(coin_id) for coin_id in coin_ids}
+    import multiprocessing
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve_ws_stand_in, args=(sender, bases, rate, drop_after, seed), daemon=True)
+    process.start()
+    if not receiver.poll(10):
+        process.terminate()
+        raise RuntimeError("El servidor WebSocket local no arrancó a tiempo.")
+    return process, f"ws://127.0.0.1:{receiver.recv()}/"
+
+
+class StandInExchangeHandler:
+    """
+    Local exchange tickers in the Binance, Bitstamp and Coinbase response shapes,
+    priced around each symbol's stand-in base price. Latency spikes, outlier
+    prices and stale timestamps can be injected to exercise the aggregator.
+    """
+
+    bases: Dict[str, float] = {}  # "BITC" -> precio base (el mismo que sirve el stand-in REST)
+    quote = "USD"
+    latency = 0.0
+    spike_rate = 0.0              # probabilidad de tardar 10x (para ver las peticiones hedged)
+    outlier_rate = 0.0            # probabilidad de cotizar un 25% por encima
+    stale_rate = 0.0              # probabilidad de una marca de tiempo de hace 1h
+    rng = random.Random(0)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _quote(self, base: float) -> Tuple[float, float, float]:
+        price = base * (1 + self.rng.gauss(0, 0.002))
+        if self.outlier_rate and self.rng.random() < self.outlier_rate:
+            price *= 1.25
+        ts = time.time() - (3600 if self.stale_rate and self.rng.random() < self.stale_rate else 0)
+        return price, 1e6 / base * self.rng.uniform(0.5, 1.5), ts
+
+    def do_GET(self) -> None:
+        if self.latency:
+            time.sleep(self.latency * (10 if self.spike_rate and self.rng.random() < self.spike_rate else 1))
+        path = urlparse(self.path).path
+        status, payload = 200, None
+        if path == "/api/v3/ticker/24hr":
+            suffix = "USDT" if self.quote == "USD" else self.quote
+            payload = [{"symbol": f"{symbol}{suffix}", "lastPrice": f"{price:.10g}", "volume": f"{volume:.4f}", "closeTime": int(ts * 1000)}
+                       for symbol, (price, volume, ts) in ((s, self._quote(b)) for s, b in self.bases.items())]
+        elif path == "/api/v2/ticker/":
+            payload = [{"pair": f"{symbol}/{self.quote}", "last": f"{price:.10g}", "volume": f"{volume:.4f}", "timestamp": str(int(ts))}
+                       for symbol, (price, volume, ts) in ((s, self._quote(b)) for s, b in self.bases.items())]
+        elif path.startswith("/products/") and path.endswith("/ticker"):
+            symbol, _, quote = path.split("/")[2].partition("-")
+            if symbol in self.bases and quote == self.quote:
+                price, volume, ts = self._quote(self.bases[symbol])
+                payload = {"price": f"{price:.10g}", "volume": f"{volume:.4f}",
+                           "time": datetime.fromtimestamp(ts, UTC).isoformat().replace("+00:00", "Z")}
+            else:
+                status, payload = 404, {"message": "NotFound"}
+        else:
+            status, payload = 404, {"message": "NotFound"}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve_exchange_stand_in(port_sender: Any, bases: Dict[str, float], quote: str, latency: float, spike_rate: float,
+                             outlier_rate: float, stale_rate: float, seed: int) -> None:
+    StandInExchangeHandler.bases = bases
+    StandInExchangeHandler.quote = quote
+    StandInExchangeHandler.latency = latency
+    StandInExchangeHandler.spike_rate = spike_rate
+    StandInExchangeHandler.outlier_rate = outlier_rate
+    StandInExchangeHandler.stale_rate = stale_rate
+    StandInExchangeHandler.rng = random.Random(seed)
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _with_bases(StandInExchangeHandler, "http.server:BaseHTTPRequestHandler"))
+    port_sender.send(server.server_address[1])
+    server.serve_forever()
+
+
+def start_exchange_stand_in(coin_ids: Sequence[str], currency: str = "usd", latency: float = 0.0, spike_rate: float = 0.0,
+                            outlier_rate: float = 0.0, stale_rate: float = 0.0, seed: int = 0) -> Tuple[multiprocessing.Process, str]:
+    """Starts one exchange ticker stand-in in a child process; returns it and its base URL."""
+    import multiprocessing
+    bases = {coin_id[:4].upper(): synthetic_base_price(coin_id) for coin_id in coin_ids}
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve_exchange_stand_in, daemon=True,
+                                      args=(sender, bases, currency.upper(), latency, spike_rate, outlier_rate, stale_rate, seed))
+    process.start()
+    if not receiver.poll(10):
+        process.terminate()
+        raise RuntimeError("El servidor local de la bolsa no arrancó a tiempo.")
+    return process, f"http://127.0.0.1:{receiver.recv()}"
+
+
+def _percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if not HAS_RESOURCE:
         return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmark(iterations: int = 50, coins: int = 500, latency_ms: float = 0.0, rate_429: float = 0.0,
+                  per_page: int = 250, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, rules: Optional[SignalRules] = None,
+                  calls_per_minute: float = BENCH_CALLS_PER_MINUTE) -> Dict[str, Any]:
+    """
+    Drives the live path (RestPollingSource with its limiter and response cache
+    → signals → build_table → DiffRenderer) against the local stand-in for N
+    iterations and reports p50/p95/p99 per stage, coins/s and peak RSS.
+    "fetch" includes decoding, as fetch_data() does both.
+    """
+    rules = rules or DEFAULT_SIGNAL_RULES
+    global API_URL
+    process, url = start_stand_in_server(latency_ms / 1000.0, rate_429)
+    original_url, API_URL = API_URL, url
+    session = create_session(retries=0, pool_maxsize=max(10, max_concurrency))
+    ids = [f"bench-coin-{i}" for i in range(coins)]
+    limiter = TokenBucketLimiter(calls_per_minute)
+    source = RestPollingSource(session, ",".join(ids), "usd", 1, per_page=per_page, max_concurrency=max_concurrency,
+                               limiter=limiter, cache=ResponseCache())
+    renderer = DiffRenderer(io.StringIO())
+    timings: Dict[str, List[float]] = {"fetch": [], "signal": [], "render": [], "total": []}
+    prev_prices = PriceBook(coins)
+    buffers = TableBuffers()
+    failed = rendered_coins = 0
 
     try:
-        client = CoinbaseClient(api_key, api_secret) 
-        client.get_current_user() 
-        logger.info("✅ Cliente de Coinbase Wallet API inicializado y conectado.")
-        return client
-    except Exception as e:
-        logger.error(f"❌ Error al conectar a Coinbase (Verifica tus claves/permisos): {e}")
-        HAS_COINBASE = False 
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            data = source.snapshot()
+            t1 = time.perf_counter()
+            if not data:
+                failed += 1
+                continue
+            signals = compute_signals(
+                [coin.get("current_price") for coin in data],
+                [coin.get("price_change_percentage_24h_in_currency") for coin in data],
+                [coin.get("price_change_percentage_7d_in_currency") for coin in data],
+                rules.plr_discount, rules=rules,
+            )
+            t2 = time.perf_counter()
+            result = build_table(data, prev_prices, "usd", col_widths=renderer.col_widths, signals=signals, buffers=buffers, rules=rules)
+            renderer.draw(result["lines"])
+            prev_prices.update({k: v for k, v in result["prev_prices"].items() if v is not None})
+            t3 = time.perf_counter()
+            rendered_coins += len(data)
+            for stage, elapsed in zip(timings, (t1 - t0, t2 - t1, t3 - t2, t3 - t0)):
+                timings[stage].append(elapsed)
+    finally:
+        API_URL = original_url
+        process.terminate()
+
+    report: Dict[str, Any] = {"iterations": iterations, "coins": coins, "requests_per_tick": len(plan_market_requests(ids, "usd", per_page)),
+                              "throttled": limiter.throttled, "failed": failed}
+    for stage, values in timings.items():
+        ordered = sorted(values)
+        report[stage] = {f"p{p}": _percentile(ordered, p) * 1000 for p in (50, 95, 99)}
+    report["coins_per_second"] = rendered_coins / max(sum(timings["total"]), 1e-9)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def print_benchmark_report(report: Dict[str, Any]) -> None:
+    print(f"Iteraciones: {report['iterations']} | Monedas: {report['coins']:,} | "
+          f"Peticiones/tick: {report['requests_per_tick']} | 429: {report['throttled']} | Ticks sin datos: {report['failed']}")
+    print(f"{'Etapa':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage in ("fetch", "signal", "render", "total"):
+        row = report[stage]
+        print(f"{stage:<8} {row['p50']:>9.2f} {row['p95']:>9.2f} {row['p99']:>9.2f}")
+    rss = report["peak_rss_mb"]
+    print(f"Throughput: {report['coins_per_second']:,.0f} monedas/s | Pico RSS: {f'{rss:.1f} MB' if rss is not None else 'N/A'}")
+
+
+# --- 4.5 MULTI-PROFILE FAN-OUT (un fetch compartido, workers vía shared memory) ---
+
+SNAPSHOT_COLUMNS = ("price", "change_24h", "change_7d", "market_cap")
+SNAPSHOT_SLOTS = 2  # Doble buffer: los workers leen un slot mientras el fetcher escribe el otro
+SNAPSHOT_HEADER_BYTES = SNAPSHOT_SLOTS * 8  # Un contador de secuencia (seqlock) int64 por slot
+SNAPSHOT_READ_RETRIES = 100
+PROFILE_JOIN_TIMEOUT = 5.0
+
+
+class Profile:
+    """One watchlist/currency/threshold/notify-target combination served from the shared fetch."""
+    __slots__ = ("name", "ids", "currency", "plr_discount", "max_change_24h", "telegram_token", "telegram_chat", "cooldown")
+
+    def __init__(self, name: str, ids: Sequence[str], currency: str = "usd", plr_discount: float = PLR_DISCOUNT,
+                 max_change_24h: Optional[float] = None, telegram_token: str = "", telegram_chat: str = "",
+                 cooldown: float = TELEGRAM_SIGNAL_COOLDOWN):
+        self.name = name
+        self.ids = list(dict.fromkeys(ids))
+        self.currency = currency.lower()
+        self.plr_discount = plr_discount
+        self.max_change_24h = max_change_24h
+        self.telegram_token = telegram_token
+        self.telegram_chat = telegram_chat
+        self.cooldown = cooldown
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any], index: int = 0, plr_discount: float = PLR_DISCOUNT) -> "Profile":
+        cryptos = entry.get("cryptos", "")
+        ids = cryptos.split(",") if isinstance(cryptos, str) else cryptos
+        max_change = entry.get("max_change_24h")
+        return cls(name=str(entry.get("name") or f"profile-{index}"),
+                   ids=[str(coin_id).strip().lower() for coin_id in ids if str(coin_id).strip()],
+                   currency=str(entry.get("currency", "usd")),
+                   plr_discount=float(entry.get("plr_discount", plr_discount)),
+                   max_change_24h=None if max_change is None else float(max_change),
+                   telegram_token=str(entry.get("telegram_token", "")),
+                   telegram_chat=str(entry.get("telegram_chat", "")),
+                   cooldown=float(entry.get("cooldown", TELEGRAM_SIGNAL_COOLDOWN)))
+
+
+def load_profiles(path: str, plr_discount: float = PLR_DISCOUNT) -> List[Profile]:
+    """
+    Reads profiles from a JSON file: either a list or {"profiles": [...]}, each
+    entry with name, cryptos (list or comma string), currency, plr_discount
+    (default `plr_discount`), max_change_24h (optional extra 24h drop required
+    to notify), telegram_token, telegram_chat and cooldown.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        raw = json.load(fh)
+    entries = raw.get("profiles", []) if isinstance(raw, dict) else raw
+    profiles = [Profile.from_dict(entry, i, plr_discount) for i, entry in enumerate(entries)]
+    return [profile for profile in profiles if profile.ids]
+
+
+def union_watchlists(profiles: Sequence[Profile]) -> Dict[str, List[str]]:
+    """Unique ids per currency, in first-seen order: the only thing that gets fetched."""
+    unions: Dict[str, Dict[str, None]] = {}
+    for profile in profiles:
+        unions.setdefault(profile.currency, {}).update(dict.fromkeys(profile.ids))
+    return {currency: list(ids) for currency, ids in unions.items()}
+
+
+class SharedSnapshot:
+    """
+    One currency's union watchlist as a (slot, coin, column) float64 block in
+    shared memory. The fetcher fills the idle slot and then tells the workers
+    which slot to read, so no market data crosses a pipe. Each slot has a
+    seqlock counter in front of the data (odd while being written): a worker
+    lagging more than one tick may find its slot being rewritten, and
+    read_snapshot_slot() then retries instead of reading a torn block.
+    """
+
+    def __init__(self, currency: str, ids: Sequence[str]):
+        self.currency = currency
+        self.ids = list(ids)
+        self.index = {coin_id: i for i, coin_id in enumerate(self.ids)}
+        self.shape = (SNAPSHOT_SLOTS, len(self.ids), len(SNAPSHOT_COLUMNS))
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(create=True, size=SNAPSHOT_HEADER_BYTES + math.prod(self.shape) * 8)
+        self.seqs = np.ndarray((SNAPSHOT_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf, offset=SNAPSHOT_HEADER_BYTES)
+        self.seqs.fill(0)
+        self.array.fill(np.nan)
+        self.symbols: Dict[str, str] = {}
+        self.seq = 0
+
+    def write(self, data: List[dict]) -> Tuple[int, Dict[str, str]]:
+        """Copies a snapshot into the idle slot; returns the slot and newly seen symbols."""
+        slot = (self.seq + 1) % SNAPSHOT_SLOTS
+        block = self.array[slot]
+        self.seqs[slot] += 1  # Impar: slot en escritura
+        block.fill(np.nan)
+        new_symbols: Dict[str, str] = {}
+        for coin in data:
+            i = self.index.get(coin.get("id"))
+            if i is None:
+                continue
+            block[i] = [_nan_if_none(coin.get(field)) for field in ("current_price", "price_change_percentage_24h_in_currency",
+                                                                   "price_change_percentage_7d_in_currency", "market_cap")]
+            symbol = coin.get("symbol", "").upper()
+            if self.symbols.get(coin.get("id")) != symbol:
+                self.symbols[coin.get("id")] = new_symbols[coin.get("id")] = symbol
+        self.seqs[slot] += 1  # Par: slot estable
+        self.seq += 1
+        return slot, new_symbols
+
+    def close(self) -> None:
+        del self.array, self.seqs
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def read_snapshot_slot(seqs: "np.ndarray", array: "np.ndarray", slot: int, rows: "np.ndarray") -> Optional["np.ndarray"]:
+    """Seqlock read: a private copy of `rows` of `slot`, or None if the writer kept it busy."""
+    for _ in range(SNAPSHOT_READ_RETRIES):
+        before = int(seqs[slot])
+        if not before % 2:
+            block = array[slot][rows]  # Indexado avanzado: copia propia
+            if int(seqs[slot]) == before:
+                return block
+        time.sleep(0)
+    return None
+
+
+def _profile_worker(profile: Profile, shm_name: str, shape: Tuple[int, int, int], positions: List[int], conn: Any,
+                    rules: Optional[SignalRules] = None) -> None:
+    """Per-profile process: reads its rows from shared memory and notifies its own target."""
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    seqs = np.ndarray((SNAPSHOT_SLOTS,), dtype=np.int64, buffer=shm.buf)
+    array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=SNAPSHOT_HEADER_BYTES)
+    rows = np.asarray(positions, dtype=np.intp)
+    ids = profile.ids
+    symbols: Dict[str, str] = {}
+    tracker = SignalStateTracker(rules=rules)
+    notifier = None
+    if profile.telegram_token and profile.telegram_chat:
+        notifier = TelegramNotifier(profile.telegram_token, profile.telegram_chat, cooldown=profile.cooldown).start()
+    try:
+        while True:
+            message = conn.recv()
+            # Si el worker se retrasa, solo importa el snapshot más reciente
+            while message is not None and conn.poll():
+                symbols.update(message[1])
+                message = conn.recv()
+            if message is None:
+                break
+            slot, new_symbols = message
+            symbols.update(new_symbols)
+
+            block = read_snapshot_slot(seqs, array, slot, rows)
+            if block is None:
+                logger.debug("[%s] slot %d en escritura; se espera al siguiente snapshot.", profile.name, slot)
+                continue
+            price, c24, c7 = block[:, 0], block[:, 1], block[:, 2]
+            signals = compute_signals_batch(price, c24, c7, profile.plr_discount, rules=rules)
+            entered = entered_dip(tracker.apply(ids, price, c24, c7, signals, plr_discount=profile.plr_discount))
+            selected = np.fromiter((coin_id in entered for coin_id in ids), dtype=bool, count=len(ids)) & ~np.isnan(signals["limit"])
+            if profile.max_change_24h is not None:
+                selected &= c24 <= profile.max_change_24h
+
+            buy_signals = [{
+                "symbol": symbols.get(ids[i], ids[i].upper()),
+                "name": ids[i],
+                "price": float(price[i]),
+                "change_24h": float(c24[i]),
+                "change_7d": float(c7[i]),
+                "limit_price": format_price(float(signals["limit"][i]), decimal_limit=4),
+                "limit_price_value": float(signals["limit"][i]),
+                "alert": ALERT_LABELS[ALERT_DIP],
+            } for i in np.flatnonzero(selected)]
+            logger.debug("[%s] %d monedas, %d entradas en DIP.", profile.name, len(ids), len(buy_signals))
+            if not buy_signals:
+                continue
+            if notifier is not None:
+                notifier.submit(buy_signals)
+            else:
+                logger.info("[%s] DIP (%s): %s", profile.name, profile.currency.upper(),
+                            ", ".join(f"{s['symbol']} @ {s['limit_price']}" for s in buy_signals))
+    finally:
+        if notifier is not None:
+            notifier.stop()
+        del array, seqs
+        shm.close()
+
+
+def run_profiles(args: argparse.Namespace, session: requests.Session, limiter: Optional[TokenBucketLimiter], profiles: Sequence[Profile],
+                 max_ticks: Optional[int] = None, cache: Optional[ResponseCache] = None, rules: Optional[SignalRules] = None) -> None:
+    """
+    Serves many profiles from one fetch per currency: the union of their ids
+    is fetched once per tick, written to shared memory and evaluated by one
+    worker process per profile (with the --config `rules`, if any). Fetch cost
+    scales with unique (id, currency) pairs, not with the number of profiles.
+    """
+    import multiprocessing
+    unions = union_watchlists(profiles)
+    snapshots = {currency: SharedSnapshot(currency, ids) for currency, ids in unions.items()}
+    workers: List[Tuple[Profile, multiprocessing.Process, Any]] = []
+    try:
+        for profile in profiles:
+            snapshot = snapshots[profile.currency]
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            positions = [snapshot.index[coin_id] for coin_id in profile.ids]
+            process = multiprocessing.Process(target=_profile_worker, name=f"profile-{profile.name}", daemon=True,
+                                              args=(profile, snapshot.shm.name, snapshot.shape, positions, receiver, rules))
+            process.start()
+            receiver.close()
+            workers.append((profile, process, sender))
+        logger.info("%d perfiles → %d monedas únicas en %d divisa(s).", len(profiles),
+                    sum(len(ids) for ids in unions.values()), len(unions))
+
+        interval = max(1, args.interval)
+        next_tick = time.monotonic()
+        last_data: Dict[str, Any] = {}
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            for currency, snapshot in snapshots.items():
+                data = fetch_data(session, ",".join(snapshot.ids), currency, per_page=args.per_page, max_concurrency=args.max_concurrency,
+                                  limiter=limiter, max_wait=interval, cache=cache)
+                if not data:
+                    logger.warning("No data retrieved from CoinGecko for %s. Retrying... 🔄", currency.upper())
+                    continue
+                if data is last_data.get(currency):
+                    continue  # Respuesta cacheada sin cambios: nada nuevo que evaluar
+                last_data[currency] = data
+                slot, new_symbols = snapshot.write(data)
+                for profile, process, sender in workers:
+                    if profile.currency == currency and process.is_alive():
+                        sender.send((slot, new_symbols))
+            ticks += 1
+
+            next_tick += interval
+            now = time.monotonic()
+            if now > next_tick:
+                next_tick += math.ceil((now - next_tick) / interval) * interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    finally:
+        for _, process, sender in workers:
+            try:
+                sender.send(None)
+            except OSError:
+                pass
+        for _, process, sender in workers:
+            process.join(PROFILE_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+            sender.close()
+        for snapshot in snapshots.values():
+            snapshot.close()
+
+
+# --- 4.6 QUERY API (modo daemon: el último snapshot servido por HTTP/JSON) ---
+
+SERVE_DEFAULT_ADDRESS = "127.0.0.1:8765"
+SERVE_CACHE_ENTRIES = 256  # Respuestas filtradas memorizadas por snapshot (LRU)
+
+
+def _finite(value: Any) -> Optional[float]:
+    return None if _is_missing(value) else float(value)
+
+
+def _column(values: Sequence[Any]) -> List[Any]:
+    return values.tolist() if HAS_NUMPY and isinstance(values, np.ndarray) else list(values)
+
+
+def snapshot_records(data: List[dict], signals: Dict[str, Sequence[Any]], prev_prices: Dict[str, float],
+                     risk: Optional[Dict[str, RiskEstimate]] = None) -> List[Dict[str, Any]]:
+    """One JSON-ready dict per coin: the table columns as raw values plus their labels."""
+    alerts, sentiments = _column(signals["alert"]), _column(signals["sentiment"])
+    limits, statuses, hours = _column(signals["limit"]), _column(signals["plr_status"]), _column(signals["plr_hours"])
+    records = []
+    for i, coin in enumerate(data):
+        coin_id, price = coin.get("id"), coin.get("current_price")
+        prev = prev_prices.get(coin_id)
+        record = {
+            "id": coin_id,
+            "symbol": (coin.get("symbol") or "").upper(),
+            "price": _finite(price),
+            "delta_pct": (price - prev) / prev * 100 if price is not None and prev else None,
+            "change_24h": _finite(coin.get("price_change_percentage_24h_in_currency")),
+            "change_7d": _finite(coin.get("price_change_percentage_7d_in_currency")),
+            "alert": ALERT_LABELS[alerts[i]],
+            "alert_code": alerts[i],
+            "sentiment": SENTIMENT_LABELS[sentiments[i]],
+            "plr": _finite(limits[i]),
+            "plr_hours": _finite(hours[i]) if statuses[i] == PLR_OK else None,
+            "time_to_plr": format_plr_hours(statuses[i], hours[i]),
+        }
+        if risk is not None and coin_id in risk:
+            estimate = risk[coin_id]
+            record["mc"] = {"p_hit_24h": estimate.p_hit_24h, "p_hit_48h": estimate.p_hit_48h,
+                            "median_hours": estimate.median_hours, "band_48h": list(estimate.band), "method": estimate.method}
+        records.append(record)
+    return records
+
+
+class ServedSnapshot:
+    """
+    Immutable per-tick view for the query API. Each coin is serialized once at
+    publish time; the full response and the table text are prebuilt, and
+    filtered responses are spliced from the per-coin fragments and memoized
+    until the next tick replaces the snapshot.
+    """
+
+    def __init__(self, seq: int, ts: float, records: List[Dict[str, Any]], table_lines: List[str]):
+        self.seq = seq
+        self.ts = ts
+        self.etag = f'"{seq}"'
+        self.fragments = [_json_dumps(record) for record in records]
+        self.index = {record["id"]: i for i, record in enumerate(records)}
+        self.alerts = [record["alert_code"] for record in records]
+        self.full = self._envelope(range(len(records)))
+        self.table = ("\n".join(table_lines) + "\n").encode()
+        self._responses: "OrderedDict[Tuple[Any, ...], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _envelope(self, positions: Sequence[int]) -> bytes:
+        coins = b",".join(self.fragments[i] for i in positions)
+        return b'{"seq":%d,"ts":%.3f,"count":%d,"coins":[%s]}' % (self.seq, self.ts, len(positions), coins)
+
+    def query(self, ids: Optional[Tuple[str, ...]] = None, alert_codes: Optional[frozenset] = None) -> bytes:
+        if ids is None and alert_codes is None:
+            return self.full
+        key = (ids, alert_codes)
+        with self._lock:
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+                return body
+        positions = [self.index[i] for i in ids if i in self.index] if ids is not None else range(len(self.fragments))
+        if alert_codes is not None:
+            positions = [i for i in positions if self.alerts[i] in alert_codes]
+        body = self._envelope(positions)
+        with self._lock:
+            self._responses[key] = body
+            if len(self._responses) > SERVE_CACHE_ENTRIES:
+                self._responses.popitem(last=False)
+        return body
+
+
+class SnapshotRequestHandler:
+    """
+    GET /snapshot[?id=a,b][&alert=dip,fomo], /coins/<id>, /table (text) and
+    /healthz. Responses carry the tick as ETag, so pollers get 304 until it changes.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive: los consumidores locales reutilizan la conexión
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = "application/json", etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        snapshot: Optional[ServedSnapshot] = self.server.snapshots.current
+        if url.path == "/healthz":
+            age = round(time.time() - snapshot.ts, 1) if snapshot is not None else None
+            self._reply(200 if snapshot is not None else 503,
+                        _json_dumps({"seq": snapshot.seq if snapshot is not None else None, "age_seconds": age}))
+            return
+        if snapshot is None:
+            self._reply(503, b'{"error":"no snapshot yet"}')
+            return
+
+        METRICS.inc("serve_requests_total")
+        status, body, content_type = self._route(url, snapshot)
+        if status != 200:
+            self._reply(status, body, content_type)
+        elif self.headers.get("If-None-Match") == snapshot.etag:
+            # Solo un recurso que existe puede estar "sin cambios"
+            self._reply(304, b"", content_type, etag=snapshot.etag)
+        else:
+            self._reply(200, body, content_type, etag=snapshot.etag)
+
+    @staticmethod
+    def _route(url: Any, snapshot: ServedSnapshot) -> Tuple[int, bytes, str]:
+        """(status, body, content type) of the resource at `url` in this snapshot."""
+        if url.path == "/snapshot":
+            query = parse_qs(url.query)
+            ids = tuple(i for value in query.get("id", ()) for i in value.split(",") if i) or None
+            alerts = [a for value in query.get("alert", ()) for a in value.split(",") if a]
+            return 200, snapshot.query(ids, _matching_codes(ALERT_LABELS, alerts) if alerts else None), "application/json"
+        if url.path.startswith("/coins/"):
+            position = snapshot.index.get(url.path[len("/coins/"):])
+            if position is None:
+                return 404, b'{"error":"unknown id"}', "application/json"
+            return 200, snapshot.fragments[position], "application/json"
+        if url.path == "/table":
+            return 200, snapshot.table, "text/plain; charset=utf-8"
+        return 404, b'{"error":"not found"}', "application/json"
+
+    do_HEAD = do_GET
+
+
+class _UnixHTTPServer:  # sobre socketserver:ThreadingMixIn + socketserver:UnixStreamServer
+    daemon_threads = True
+
+    def get_request(self) -> Tuple[socket.socket, Tuple[str, int]]:
+        request, _ = super().get_request()
+        return request, ("local", 0)  # BaseHTTPRequestHandler espera una tupla (host, puerto)
+
+
+class SnapshotServer:
+    """
+    Keeps the latest ServedSnapshot and serves it from a daemon thread on a
+    local TCP address ("host:port" or "port") or a Unix socket (any path).
+    publish() swaps the snapshot reference, so readers never block the tick.
+    """
+
+    def __init__(self, address: str = SERVE_DEFAULT_ADDRESS):
+        self.current: Optional[ServedSnapshot] = None
+        self._seq = 0
+        self.unix_path = address if os.sep in address or address.endswith(".sock") else None
+        handler = _with_bases(SnapshotRequestHandler, "http.server:BaseHTTPRequestHandler")
+        if self.unix_path is not None:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)  # Socket huérfano de una ejecución anterior
+            server = _with_bases(_UnixHTTPServer, "socketserver:ThreadingMixIn", "socketserver:UnixStreamServer")
+            self.httpd = server(self.unix_path, handler)
+        else:
+            from http.server import ThreadingHTTPServer
+            host, _, port = address.rpartition(":")
+            self.httpd = ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+        self.httpd.snapshots = self
+
+    @property
+    def url(self) -> str:
+        if self.unix_path is not None:
+            return f"unix:{self.unix_path}"
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "SnapshotServer":
+        threading.Thread(target=self.httpd.serve_forever, name="serve-http", daemon=True).start()
+        logger.info("🛰️ Snapshot API at %s/snapshot", self.url)
+        return self
+
+    @instrumented("serve_publish")
+    def publish(self, data: List[dict], signals: Dict[str, Sequence[Any]], prev_prices: Dict[str, float], table_lines: List[str],
+                ts: float, risk: Optional[Dict[str, RiskEstimate]] = None) -> ServedSnapshot:
+        self._seq += 1
+        self.current = ServedSnapshot(self._seq, ts, snapshot_records(data, signals, prev_prices, risk), table_lines)
+        return self.current
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+
+# --- 4.7 BOUNDED MEMORY (RSS guard, telemetría tracemalloc, soak) ---
+
+MEMORY_CHECK_SECONDS = 30.0
+MEMORY_TOP_SITES = 5             # Líneas con más crecimiento en cada informe de tracemalloc
+MEMORY_GUARD_EXIT_CODE = 3
+SOAK_SAMPLES_PER_DAY = 24
+SOAK_RSS_TOLERANCE_MB = 8.0      # Crecimiento de RSS admitido tras el primer día simulado (o 5% si es mayor)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident set size in MB (/proc on Linux/Android, peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss_mb()
+
+
+class MemoryMonitor:
+    """
+    Daemon thread sampling RSS. Above `max_rss_mb` it first runs the registered
+    trim callbacks (caches) and a gc pass; if RSS is still above on the next
+    check it interrupts the main thread, which exits with MEMORY_GUARD_EXIT_CODE
+    so a supervisor loop can restart it. With `telemetry_every` it also traces
+    allocations and periodically logs traced memory and the top growth sites.
+    """
+
+    def __init__(self, max_rss_mb: Optional[float] = None, telemetry_every: Optional[float] = None, every: float = MEMORY_CHECK_SECONDS):
+        self.max_rss_mb = max_rss_mb
+        self.telemetry_every = telemetry_every
+        self.every = min(every, telemetry_every) if telemetry_every else every
+        self.tripped = False
+        self._over = False
+        self._trims: List[Any] = []
+        self._snapshot: Optional["tracemalloc.Snapshot"] = None
+        self._next_telemetry = 0.0
+        self._stopping = threading.Event()
+
+    def add_trim(self, callback: Any) -> None:
+        self._trims.append(callback)
+
+    def start(self) -> "MemoryMonitor":
+        import tracemalloc
+        if self.telemetry_every and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        threading.Thread(target=self._run, name="memory", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.every):
+            self.check()
+            if self.telemetry_every and time.monotonic() >= self._next_telemetry:
+                self._next_telemetry = time.monotonic() + self.telemetry_every
+                self.telemetry()
+
+    def check(self) -> Optional[float]:
+        rss = current_rss_mb()
+        if rss is None or not self.max_rss_mb:
+            return rss
+        if rss <= self.max_rss_mb:
+            self._over = False
+        elif not self._over:
+            self._over = True
+            logger.warning("RSS %.1f MB por encima de --max-rss %.0f MB: vaciando cachés.", rss, self.max_rss_mb)
+            for trim in self._trims:
+                trim()
+            gc.collect()
+        elif not self.tripped:
+            self.tripped = True
+            logger.critical("RSS %.1f MB sigue por encima de --max-rss %.0f MB: deteniendo el analizador.", rss, self.max_rss_mb)
+            os.kill(os.getpid(), signal.SIGINT)
+        return rss
+
+    def telemetry(self) -> None:
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        rss = current_rss_mb()
+        logger.info("Memoria: RSS %s MB | trazada %.1f MB (pico %.1f MB)", f"{rss:.1f}" if rss is not None else "?",
+                    current / (1024 * 1024), peak / (1024 * 1024))
+        if self._snapshot is not None:
+            for stat in snapshot.compare_to(self._snapshot, "lineno")[:MEMORY_TOP_SITES]:
+                if stat.size_diff > 0:
+                    logger.info("  %+.1f KiB en %s", stat.size_diff / 1024, stat.traceback)
+        self._snapshot = snapshot
+
+
+class SoakSource(RestPollingSource):
+    """
+    REST polling against the stand-in with no wait between ticks, so days of
+    `interval`-spaced ticks run in minutes. Samples RSS SOAK_SAMPLES_PER_DAY times
+    per simulated day and rotates a quarter of the watchlist every day, so ids
+    keep entering and leaving and eviction is exercised as well.
+    """
+
+    def __init__(self, session: requests.Session, args: argparse.Namespace, universe: Sequence[str], watch: int, days: float):
+        super().__init__(session, ",".join(universe[:watch]), args.currency, args.interval, per_page=250)
+        self.frame_interval = 0.001
+        self.args = args
+        self.universe = list(universe)
+        self.watch = watch
+        self.ticks_per_day = max(1, int(86400 / max(1, args.interval)))
+        self.total_ticks = max(1, int(self.ticks_per_day * days))
+        self.tick = 0
+        self.samples: List[Tuple[float, float, Optional[float]]] = []  # (día simulado, RSS MB, MB trazados)
+
+    def snapshot(self) -> Optional[List[MarketRecord]]:
+        day, offset = divmod(self.tick, self.ticks_per_day)
+        if offset % max(1, self.ticks_per_day // SOAK_SAMPLES_PER_DAY) == 0:
+            import tracemalloc
+            traced = tracemalloc.get_traced_memory()[0] / (1024 * 1024) if tracemalloc.is_tracing() else None
+            self.samples.append((self.tick / self.ticks_per_day, current_rss_mb() or 0.0, traced))
+        if offset == 0 and day:
+            shift = day * max(1, self.watch // 4)
+            self.cryptos = ",".join(self.universe[(shift + i) % len(self.universe)] for i in range(self.watch))
+            self.args.cryptos = self.cryptos
+        self.tick += 1
+        return super().snapshot()
+
+
+def run_soak(args: argparse.Namespace, days: float, watch: int = 500) -> bool:
+    """
+    Simulated multi-day run of the full pipeline against the local stand-in
+    (output discarded); prints RSS per simulated day and returns whether RSS
+    stayed flat after the first day (warm-up: indicator windows, caches).
+    """
+    import tracemalloc
+    global API_URL
+    stand_in, original_url = None, API_URL
+    if not args.stand_in:
+        stand_in, API_URL = start_stand_in_server(seed=11)
+    soak_args = argparse.Namespace(**vars(args))
+    soak_args.no_clear, soak_args.render = True, "full"
+    session = create_session(retries=args.retries)
+    source = SoakSource(session, soak_args, [f"soak-coin-{i}" for i in range(watch * 2)], watch, days)
+    print(f"Soak: {days:g} días simulados = {source.total_ticks:,} ticks de {max(1, args.interval)}s, {watch} monedas...")
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            run_pipeline(soak_args, session, None, None, "", "", max_ticks=source.total_ticks,
+                         indicator_engine=IndicatorEngine(), source=source)
+    finally:
+        if stand_in is not None:
+            API_URL = original_url
+            stand_in.terminate()
+    source.samples.append((source.tick / source.ticks_per_day, current_rss_mb() or 0.0,
+                           tracemalloc.get_traced_memory()[0] / (1024 * 1024) if tracemalloc.is_tracing() else None))
+
+    print(f"{'Día':>5} | {'RSS (MB)':>9} | {'Trazada (MB)':>12}")
+    for day in range(math.ceil(days) + 1):
+        sample = [s for s in source.samples if s[0] <= day][-1]
+        print(f"{sample[0]:>5.1f} | {sample[1]:>9.1f} | {sample[2] if sample[2] is not None else float('nan'):>12.2f}")
+    warm = [s for s in source.samples if s[0] >= min(1.0, days / 2)]
+    baseline, final = warm[0][1], warm[-1][1]
+    growth = final - baseline
+    flat = growth <= max(SOAK_RSS_TOLERANCE_MB, baseline * 0.05)
+    print(f"RSS tras el calentamiento: {baseline:.1f} MB -> {final:.1f} MB ({growth:+.1f} MB) en {time.perf_counter() - start:.0f}s: "
+          f"{'PLANO ✅' if flat else 'CRECE ❌'}")
+    return flat
+
+
+# --- 4.8 HOT-RELOAD CONFIG (TOML/JSON, inotify o polling de mtime) ---
+
+CONFIG_POLL_SECONDS = 2.0        # Sin inotify: stat() del archivo cada 2s
+CONFIG_DEBOUNCE_SECONDS = 0.2    # Los editores escriben en varias pasadas: se espera a que terminen
+CONFIG_WAKEUP_SECONDS = 1.0
+CONFIG_COLUMNS = {"24h": 0, "7d": 1}
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def load_config_file(path: str) -> Dict[str, Any]:
+    """Parses a --config file: TOML when it ends in .toml, JSON otherwise."""
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    if path.endswith(".toml"):
+        if not HAS_TOMLLIB:
+            raise ValueError("los archivos TOML requieren Python 3.11+ (tomllib); usa JSON")
+        import tomllib
+        values = tomllib.loads(raw.decode("utf-8"))
+    else:
+        values = json.loads(raw)
+    if not isinstance(values, dict):
+        raise ValueError("la configuración debe ser un objeto/tabla")
+    return values
+
+
+def _config_clause(clause: Any) -> Tuple[int, str, float]:
+    if not isinstance(clause, (list, tuple)) or len(clause) != 3:
+        raise ValueError(f"cláusula inválida {clause!r}: se espera [columna, operador, umbral]")
+    column, op, threshold = clause
+    if column not in CONFIG_COLUMNS or op not in _OPS:
+        raise ValueError(f"cláusula inválida {clause!r}: columna en {list(CONFIG_COLUMNS)}, operador en {list(_OPS)}")
+    threshold = float(threshold)
+    if not math.isfinite(threshold):
+        raise ValueError(f"umbral no finito en {clause!r}")
+    return CONFIG_COLUMNS[column], op, threshold
+
+
+def _override_rules(rules: Sequence[Tuple[str, Tuple[Tuple[int, str, float], ...]]], keys: Sequence[str],
+                    overrides: Any, section: str) -> Tuple[Tuple[str, Tuple[Tuple[int, str, float], ...]], ...]:
+    if not isinstance(overrides, dict):
+        raise ValueError(f"[{section}] debe ser una tabla regla -> cláusulas")
+    unknown = sorted(set(overrides) - set(keys))
+    if unknown:
+        raise ValueError(f"reglas desconocidas en [{section}]: {', '.join(unknown)} (disponibles: {', '.join(keys)})")
+    return tuple((label, tuple(_config_clause(c) for c in overrides[key]) if key in overrides else clauses)
+                 for key, (label, clauses) in zip(keys, rules))
+
+
+def signal_rules_from_config(values: Dict[str, Any]) -> SignalRules:
+    """
+    Builds the signal rules from a config mapping. Rules are overridden by short
+    name (ALERT_RULE_KEYS / SENTIMENT_RULE_KEYS) with clauses such as
+    [["24h", "<", -4.0], ["7d", ">", 0.0]]; anything not given keeps its default.
+    """
+    plr_discount = float(values.get("plr_discount", PLR_DISCOUNT))
+    band = float(values.get("hysteresis_band", HYSTERESIS_BAND))
+    if not 0 <= plr_discount < 1 or not 0 <= band < 100:
+        raise ValueError(f"plr_discount debe estar en [0, 1) y hysteresis_band en [0, 100): {plr_discount}, {band}")
+    return SignalRules(_override_rules(ALERT_RULES, ALERT_RULE_KEYS, values.get("alerts", {}), "alerts"),
+                       _override_rules(SENTIMENT_RULES, SENTIMENT_RULE_KEYS, values.get("sentiments", {}), "sentiments"),
+                       plr_discount, band)
+
+
+def _inotify_watch(directory: str) -> Optional[int]:
+    """An inotify fd watching `directory` for finished writes and renames, or None where unavailable."""
+    import ctypes
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
         return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _inotify_names(fd: int) -> set:
+    """Drains pending events and returns the file names they refer to."""
+    names: set = set()
+    while True:
+        try:
+            buf = os.read(fd, 4096)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(buf):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += _INOTIFY_EVENT.size
+            names.add(buf[offset:offset + length].rstrip(b"\0").decode(errors="replace"))
+            offset += length
+
+
+class LiveConfig:
+    """
+    A --config file applied to the running analyzer. Keys: cryptos (list or
+    comma string), currency, interval, plr_discount, hysteresis_band and the
+    [alerts] / [sentiments] rule overrides; a key left out falls back to the
+    command line or built-in default. reload() applies only what changed: the
+    source gets the new watchlist/currency/interval in place (sessions, the
+    WebSocket and Coinbase auth stay up), `rules` is swapped for freshly
+    compiled tables, and per-coin state of ids that left the watchlist is
+    evicted by the pipeline. An invalid file is logged and the previous
+    configuration kept. The file is watched with inotify on its directory
+    (editors that save via rename included), or by polling its mtime.
+    """
+
+    def __init__(self, path: str, args: argparse.Namespace, source: Optional[PriceSource] = None, poll: float = CONFIG_POLL_SECONDS):
+        self.path = os.path.abspath(path)
+        self.args = args
+        self.source = source
+        self.poll = poll
+        self.rules = DEFAULT_SIGNAL_RULES
+        self.reloads = 0
+        self.changed = threading.Event()  # Despierta al bucle de fetch para aplicar el cambio sin esperar al tick
+        self._defaults = (args.cryptos, args.currency, args.interval)
+        self._digest: Optional[bytes] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="config-watch", daemon=True)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, strict: bool = False) -> bool:
+        """Re-reads the file and applies what changed; returns True if anything did."""
+        with self._lock:
+            self._stamp = self._stat()
+            try:
+                with open(self.path, "rb") as fh:
+                    digest = hashlib.sha256(fh.read()).digest()
+                if digest == self._digest:
+                    return False
+                values = load_config_file(self.path)
+                rules = signal_rules_from_config(values)
+                cryptos = values.get("cryptos", self._defaults[0])
+                if isinstance(cryptos, (list, tuple)):
+                    cryptos = ",".join(str(c).strip() for c in cryptos)
+                cryptos = ",".join(c.strip() for c in str(cryptos).split(",") if c.strip())
+                currency = str(values.get("currency", self._defaults[1])).strip().lower()
+                interval = values.get("interval", self._defaults[2])
+                if isinstance(interval, bool) or not isinstance(interval, (int, float)) or not float(interval).is_integer():
+                    raise ValueError(f"interval debe ser un número entero de segundos, no {interval!r}")
+                interval = int(interval)
+                if not cryptos or not currency or interval < 1:
+                    raise ValueError("cryptos y currency no pueden estar vacíos e interval debe ser >= 1")
+            except (OSError, ValueError, TypeError) as e:
+                if strict:
+                    raise ValueError(f"{self.path}: {e}") from e
+                METRICS.inc("config_reload_errors_total")
+                logger.error("Config %s inválida, se mantiene la anterior: %s", self.path, e)
+                return False
+            self._digest = digest
+            self._apply(cryptos, currency, interval, rules)
+            return True
+
+    def _apply(self, cryptos: str, currency: str, interval: int, rules: SignalRules) -> None:
+        args = self.args
+        before, after = watchlist_ids(args.cryptos), watchlist_ids(cryptos)
+        changes = []
+        if after != before:
+            changes.append(f"+{len(after - before)}/-{len(before - after)} monedas")
+            logger.debug("Watchlist: añadidas %s, retiradas %s", sorted(after - before), sorted(before - after))
+        if currency != args.currency:
+            changes.append(f"moneda {args.currency}→{currency}")
+        if interval != args.interval:
+            changes.append(f"intervalo {args.interval}s→{interval}s")
+        if rules.key() != self.rules.key():
+            changes.append("umbrales")
+            self.rules = rules  # Tablas ya compiladas: el render solo cambia de referencia
+        if (cryptos, currency, interval) != (args.cryptos, args.currency, args.interval):
+            # Primero la fuente: el siguiente fetch ya pide la watchlist nueva
+            if self.source is not None:
+                self.source.reconfigure(cryptos, currency, interval)
+            args.cryptos, args.currency, args.interval = cryptos, currency, interval
+        if changes:
+            # Con o sin fuente: el cambio de umbrales también se tiene que ver y aplicar
+            if self.reloads:
+                METRICS.inc("config_reloads_total")
+            logger.info("Config %s (%s).", "recargada" if self.reloads else "cargada", ", ".join(changes))
+            self.changed.set()
+        self.reloads += 1
+
+    def start(self) -> "LiveConfig":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._thread.join(CONFIG_WAKEUP_SECONDS * 2)
+
+    def _run(self) -> None:
+        fd = _inotify_watch(os.path.dirname(self.path))
+        if fd is None:
+            logger.debug("inotify no disponible: polling de %s cada %gs.", self.path, self.poll)
+        name = os.path.basename(self.path)
+        import select
+        try:
+            while not self._stopping.is_set():
+                if fd is not None:
+                    ready, _, _ = select.select([fd], [], [], CONFIG_WAKEUP_SECONDS)
+                    if not ready or name not in _inotify_names(fd):
+                        continue
+                    self._stopping.wait(CONFIG_DEBOUNCE_SECONDS)
+                    _inotify_names(fd)
+                else:
+                    self._stopping.wait(self.poll)
+                    if self._stat() == self._stamp:
+                        continue
+                self.reload()
+        finally:
+            if fd is not None:
+                os.close(fd)
 
 
 # --- 5. MAIN EXECUTION FUNCTION ---
 
+def positive_float(value: str) -> float:
+    """argparse type for rates and sizes that must be > 0."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"no es un número: {value}") from None
+    if not number > 0 or not math.isfinite(number):
+        raise argparse.ArgumentTypeError(f"debe ser > 0: {value}")
+    return number
+
+
 def parse_args() -> argparse.Namespace:
     """Defines and parses command-line arguments."""
     parser = argparse.ArgumentParser(description="Advanced Crypto Price Analyzer (CLI)")
@@ -484,119 +5427,256 @@ def parse_args() -> argparse.Namespace:
                         help=f"Update interval in seconds (default: {DEFAULT_INTERVAL})")
     parser.add_argument("--retries", type=int, default=3, help="HTTP retries")
     parser.add_argument("--per-page", type=int, default=100, help="Number of results per page")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f"Max concurrent CoinGecko requests for large watchlists (default: {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--rate-limit", type=positive_float, default=DEFAULT_CALLS_PER_MINUTE,
+                        help=f"Max CoinGecko calls per minute (default: {DEFAULT_CALLS_PER_MINUTE})")
+    parser.add_argument("--store", type=str, default=None, metavar="DIR",
+                        help="Append every fetched snapshot to a local tick store in DIR (requires numpy)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus /metrics and /metrics.json on this local port")
+    parser.add_argument("--metrics-dump", type=str, default=None, metavar="FILE",
+                        help="Write a JSON metrics snapshot to FILE every 60 seconds")
+    parser.add_argument("--top", type=int, default=None, metavar="N", help="Show only the first N rows of the view")
+    parser.add_argument("--sort-by", choices=SORT_KEYS, default="market_cap",
+                        help="Row order: market_cap (API order), change_24h, alert (priority) or delta (largest move since last tick)")
+    parser.add_argument("--alert", action="append", default=None, metavar="LABEL",
+                        help="Only rows whose alert contains LABEL, e.g. DIP or FOMO (repeatable)")
+    parser.add_argument("--sentiment", action="append", default=None, metavar="LABEL",
+                        help="Only rows whose technical sentiment contains LABEL, e.g. COMPRA (repeatable)")
+    parser.add_argument("--only-signals", action="store_true", help="Only rows with an active alert")
     parser.add_argument("--verbose", action="store_true", help="Show DEBUG logs")
     parser.add_argument("--no-clear", action="store_true", help="Do not clear terminal on each update")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the CoinGecko response cache (Cache-Control/ETag revalidation)")
+    parser.add_argument("--render", choices=["full", "diff"], default="full",
+                        help="full: clear and reprint every tick; diff: ANSI single-write frames that only rewrite changed lines")
+    parser.add_argument("--replay", type=str, default=None, metavar="FILE",
+                        help="Backtest a recording (tick store dir, CSV ticks or JSONL snapshots) offline and exit")
+    parser.add_argument("--horizon", type=float, default=BACKTEST_HORIZON_HOURS,
+                        help=f"Backtest horizon in hours for hit rates and PLR orders (default: {BACKTEST_HORIZON_HOURS:.0f})")
+    parser.add_argument("--api-url", type=str, default=API_URL,
+                        help="CoinGecko /coins/markets URL (e.g. a local stand-in)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark fetch/parse/signal/render against a local CoinGecko stand-in and exit")
+    parser.add_argument("--bench-iterations", type=int, default=50, help="Benchmark iterations (default: 50)")
+    parser.add_argument("--bench-coins", type=int, default=500, help="Synthetic watchlist size (default: 500)")
+    parser.add_argument("--bench-latency", type=float, default=0.0, help="Stand-in latency per request in ms (default: 0)")
+    parser.add_argument("--bench-429-rate", type=float, default=0.0, help="Stand-in probability of answering 429 (default: 0)")
+    parser.add_argument("--profiles", type=str, default=None, metavar="FILE",
+                        help="Serve many watchlist/currency/notify profiles (JSON) from one shared fetch per currency (requires numpy)")
+    parser.add_argument("--source", choices=["rest", "coinbase-ws"], default="rest",
+                        help="rest: poll /coins/markets every --interval; coinbase-ws: stream Coinbase ticker prices over REST baselines")
+    parser.add_argument("--ws-url", type=str, default=COINBASE_WS_URL, help=f"WebSocket feed URL (default: {COINBASE_WS_URL})")
+    parser.add_argument("--max-fps", type=float, default=DEFAULT_MAX_FPS,
+                        help=f"Max frames per second with a streaming source (default: {DEFAULT_MAX_FPS:g})")
+    parser.add_argument("--aggregate", type=str, default=None, metavar="SOURCES",
+                        help=f"Merge prices from several REST sources each tick, e.g. coingecko,{','.join(EXCHANGE_QUOTES)} (CoinGecko is always the baseline)")
+    parser.add_argument("--aggregate-method", choices=["median", "vwap"], default="median",
+                        help="How to merge the surviving quotes (default: median)")
+    parser.add_argument("--quorum", type=int, default=None, help="Sources to wait for each tick (default: majority)")
+    parser.add_argument("--source-timeout", type=float, default=AGGREGATE_TIMEOUT,
+                        help=f"Max seconds a tick waits for its quorum (default: {AGGREGATE_TIMEOUT:g})")
+    parser.add_argument("--exchange-url", action="append", default=None, metavar="NAME=URL",
+                        help="Override an exchange's REST base URL, e.g. binance=http://127.0.0.1:9000 (repeatable)")
+    parser.add_argument("--stand-in", action="store_true",
+                        help="Run against local CoinGecko REST, Coinbase WebSocket and exchange ticker stand-ins (no network)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Run until the first frame, then print the import/startup/first-frame time breakdown and exit")
+    parser.add_argument("--bench-signals", action="store_true",
+                        help="Benchmark the scalar vs vectorized signal engine (10k/100k rows) and exit")
+    parser.add_argument("--monte-carlo", nargs="?", const="gbm", choices=["gbm", "bootstrap"], default=None,
+                        help="Add Monte Carlo PLR-hit odds, time-to-PLR and 48h price bands (gbm or bootstrap; requires numpy)")
+    parser.add_argument("--mc-paths", type=int, default=RISK_PATHS, help=f"Monte Carlo paths per coin (default: {RISK_PATHS})")
+    parser.add_argument("--mc-workers", type=int, default=None, help="Monte Carlo worker processes (default: CPU count)")
+    parser.add_argument("--mc-every", type=float, default=RISK_REFRESH_SECONDS,
+                        help=f"Seconds between Monte Carlo refreshes (default: {RISK_REFRESH_SECONDS:.0f})")
+    parser.add_argument("--serve", nargs="?", const=SERVE_DEFAULT_ADDRESS, default=None, metavar="ADDR",
+                        help=f"Headless daemon: serve the latest snapshot as JSON on host:port or a Unix socket path (default: {SERVE_DEFAULT_ADDRESS})")
+    parser.add_argument("--max-rss", type=float, default=None, metavar="MB",
+                        help="Memory guard: above MB of RSS drop caches, and stop (exit code 3) if it stays above")
+    parser.add_argument("--mem-telemetry", type=float, default=None, metavar="SECONDS",
+                        help="Log RSS, tracemalloc totals and the top allocation growth sites every SECONDS")
+    parser.add_argument("--soak", type=float, default=None, metavar="DAYS",
+                        help="Simulate DAYS of --interval ticks (--bench-coins coins) against the stand-in and check RSS stays flat")
+    parser.add_argument("--config", type=str, default=None, metavar="FILE",
+                        help="TOML/JSON file with cryptos, currency, interval, plr_discount and alert thresholds; edits apply live "
+                             "(--replay, --profiles and --benchmark use the thresholds as loaded)")
+    parser.add_argument("--bench-risk", action="store_true",
+                        help="Time one Monte Carlo refresh with 1, 2, 4, ... worker processes and exit")
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    STARTUP_MARKS.setdefault("parse args", time.perf_counter())
     if args.verbose:
         logger.setLevel(logging.DEBUG)
 
+    global API_URL
+    API_URL = args.api_url
+
+    live_config = None
+    if args.config:
+        # Se aplica antes de crear sesión y fuente; los cambios posteriores se aplican en caliente
+        live_config = LiveConfig(args.config, args)
+        try:
+            live_config.reload(strict=True)
+        except ValueError as e:
+            logger.error("%s", e)
+            sys.exit(1)
+        logger.info("Config cargada de %s.", live_config.path)
+
+    stand_ins: List[multiprocessing.Process] = []
+    if args.stand_in:
+        rest_process, API_URL = start_stand_in_server()
+        coin_ids = [c.strip() for c in args.cryptos.split(",") if c.strip()]
+        ws_process, args.ws_url = start_ws_stand_in(coin_ids, args.currency)
+        stand_ins = [rest_process, ws_process]
+        # Una bolsa rápida, una con cotizaciones aberrantes y otra lenta con picos
+        exchange_profiles = [dict(latency=0.02), dict(latency=0.05, outlier_rate=0.05), dict(latency=0.3, spike_rate=0.2, stale_rate=0.05)]
+        exchange_names = [name for name in (args.aggregate or "").split(",") if name.strip() in EXCHANGE_QUOTES]
+        for n, name in enumerate(exchange_names):
+            process, url = start_exchange_stand_in(coin_ids, args.currency, seed=n, **exchange_profiles[n % len(exchange_profiles)])
+            stand_ins.append(process)
+            args.exchange_url = [*(args.exchange_url or []), f"{name.strip()}={url}"]
+
+    if args.bench_signals:
+        benchmark_signal_engine()
+        return
+
+    # Los modos de una pasada (benchmark, replay, perfiles) usan los umbrales del --config sin recarga en caliente
+    rules = live_config.rules if live_config is not None else DEFAULT_SIGNAL_RULES
+
+    memory_monitor = None
+    if args.max_rss or args.mem_telemetry:
+        memory_monitor = MemoryMonitor(args.max_rss, args.mem_telemetry).start()
+
+    if args.soak:
+        sys.exit(0 if run_soak(args, args.soak, args.bench_coins) else 1)
+
+    if args.bench_risk:
+        benchmark_risk_engine(args.bench_coins, args.mc_paths, args.mc_workers)
+        return
+
+    if args.benchmark:
+        print_benchmark_report(run_benchmark(args.bench_iterations, args.bench_coins, args.bench_latency,
+                                             args.bench_429_rate, max_concurrency=args.max_concurrency, rules=rules))
+        return
+
+    if args.replay:
+        if not HAS_NUMPY:
+            logger.error("El modo --replay requiere NumPy (pip install numpy).")
+            sys.exit(1)
+        run_replay(args.replay, args.horizon, args.interval, rules)
+        return
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+    if args.metrics_dump:
+        start_metrics_dump(args.metrics_dump)
+
+    if args.profiles:
+        if not HAS_NUMPY:
+            logger.error("El modo --profiles requiere NumPy (pip install numpy).")
+            sys.exit(1)
+        profiles = load_profiles(args.profiles, rules.plr_discount)
+        if not profiles:
+            logger.error("No hay perfiles con monedas en %s.", args.profiles)
+            sys.exit(1)
+        session = create_session(retries=args.retries, pool_maxsize=max(10, args.max_concurrency))
+        try:
+            run_profiles(args, session, TokenBucketLimiter(args.rate_limit), profiles,
+                         cache=None if args.no_cache else ResponseCache(), rules=rules)
+        except KeyboardInterrupt:
+            print("\nAnalyzer stopped. Happy trading in the 🌐 Coinbase advanced!")
+        return
+
     telegram_token = TELEGRAM_BOT_TOKEN="8055717881:AAFQO3wJDDGE7sFNjCDLdGnwN-ZLNsJTxsk"
     telegram_chat = TELEGRAM_CHAT_ID="-1003369064969"
 
-    coinbase_client = create_coinbase_client_instance(COINBASE_API_KEY, COINBASE_API_SECRET)
+    if args.stand_in:
+        # Datos sintéticos: ni avisos reales ni órdenes reales
+        telegram_token = telegram_chat = ""
 
-    session = create_session(retries=args.retries)
-    prev_prices: Dict[str, float] = {}
+    # El pool de Monte Carlo se crea antes que cualquier hilo (fork + hilos no se llevan bien)
+    risk_engine = None
+    if args.monte_carlo:
+        if HAS_NUMPY:
+            risk_engine = RiskEngine(args.monte_carlo, paths=args.mc_paths, workers=args.mc_workers, refresh=args.mc_every)
+        else:
+            logger.warning("NumPy no está instalado: --monte-carlo deshabilitado.")
 
-    try:
-        while True:
-            data = fetch_data(session, args.cryptos, args.currency, per_page=args.per_page)
-            if not args.no_clear:
-                clear_terminal()
+    # La verificación con Coinbase no bloquea el primer frame
+    coinbase_client = start_coinbase_auth(*(("", "") if args.stand_in else (COINBASE_API_KEY, COINBASE_API_SECRET)))
 
-            # Reemplazamos .utcnow() por .now(datetime.UTC) para la hora
-            current_time_utc = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')
-
-            # --- TÍTULO DECORADO (Texto Plano) ---
-            print("=========================================================================================")
-            print("✨ NON FUNGIBLE METAVERSE ✨")
-            print("--- 🧠 Analizador Avanzado de Precios Crypto (CLI) 🚀 ---")
-            print(f"Última Actualización: {current_time_utc} UTC | Cryptos: {args.cryptos} | Fiat: {args.currency}")
-            print("=========================================================================================")
-                  
-            if data:
-                result = print_table(data, prev_prices, args.currency, coinbase_client) 
-                new_prev = result["prev_prices"]
-                buy_signals = result["buy_signals"]
-
-                # Enviar notificación de Telegram (VERSIÓN AVANZADA NFM con Referido)
-                if buy_signals and telegram_token and telegram_chat:
-
-                    key_buy_signal = "✅ COMPRA! DIP (ORDEN LÍMITE RECOMENDADA)"
-                    
-                    # --- 1. ENCABEZADO Y DEFINICIÓN DEL ANÁLISIS ---
-                    msg_parts = [
-                        "<b>🔥 ALERTA ÉPICA 🔥</b>",
-                        "El mercado está ofreciendo un <i>pullback saludable</i> dentro de una tendencia alcista.",
-                        "Estrategia activada: <b>COMPRA LÍMITE</b> (-2% del precio actual) para maximizar ganancias.",
-                        "",
-                        "--- **ANÁLISIS DETALLADO** ---"
-                    ]
-
-                    for signal in buy_signals:
-                        symbol = str(signal['symbol']).upper()
-                        name = str(signal['name']).upper()
-
-                        price_str = format_price(signal['price'])
-                        pct_24h_str = format_percent(signal['change_24h'])
-                        pct_7d_str = format_percent(signal['change_7d'])
-                        limit_price_str = str(signal['limit_price'])
-                        
-                        # Definición descriptiva basada en la señal DIP
-                        definition = (
-                            "📈 <i>Corrección de Momentum:</i> La caída de -4% o más en 24h es una toma de ganancias "
-                            "que no ha roto el soporte semanal. El volumen sugiere <b>Reacumulación</b>."
-                        )
-
-                        msg_parts.append("")
-                        msg_parts.append(f"💰 **ACTIVO: {symbol}** ({name}) 🎯")
-                        msg_parts.append(f"   - 📊 <b>Precio Actual:</b> <u>{price_str}</u> USD")
-                        msg_parts.append(f"   - 📉 <b>Var. 24h/7d:</b> {pct_24h_str} / {pct_7d_str}")
-                        msg_parts.append(f"   - 🚀 <b>PLR Sugerido (Orden Límite):</b> <b>{limit_price_str}</b>")
-                        msg_parts.append(f"   - 🧐 <b>Definición del Análisis:</b> {definition}")
-                        msg_parts.append(f"   - ✍️ <b>Sugerencia Precisa:</b> Ejecutar <b>Orden Límite</b> en Coinbase Advanced/Binance a <u>{limit_price_str}</u> USD.")
-
-                    # --- 2. PIE DE MENSAJE, ESTRATEGIA Y REFERIDO ---
-                    msg_parts.append("") 
-                    msg_parts.append("---")
-                    
-                    # --- NUEVO BLOQUE DE REFERIDO ---
-                    msg_parts.append("🤝 **RECOMENDACIÓN DE EXCHANGE**")
-                    msg_parts.append("Si aún no tienes cuenta, regístrate en **Coinbase** con mi enlace y ambos ganaremos <b>10 USD en BTC</b>.")
-                    msg_parts.append("🔗 <b>LINK DE REGISTRO:</b> https://coinbase.com/join/QHMF3XN?src=android-share")
-                    msg_parts.append("")
-                    # -------------------------------
-                    
-                    msg_parts.append("Estrategia de trading con órdenes límite compartida por <b>Chegüi / Non Fungible Metaverse</b>.")
-                    msg_parts.append("<i>¡No compres con Miedo! Compra con estrategia.</i> 🌐")
-
-                    msg = "\n".join(msg_parts)
-
-                    if send_telegram_message(telegram_token, telegram_chat, msg):
-                        logger.info("Telegram buy notification sent. 🔔")
-
-                prev_prices.update({k: v for k, v in new_prev.items() if v is not None})
-            else:
-                logger.warning("No data retrieved from CoinGecko. Retrying... 🔄")
+    # Los 429 los gestiona el limitador, no el Retry de urllib3
+    session = create_session(retries=args.retries, pool_maxsize=max(10, args.max_concurrency))
+    limiter = TokenBucketLimiter(args.rate_limit)
+
+    tick_store = None
+    if args.store:
+        if HAS_NUMPY:
+            tick_store = TickStore(args.store)
+        else:
+            logger.warning("NumPy no está instalado: --store deshabilitado.")
+
+    indicator_engine = IndicatorEngine()
+    if tick_store is not None:
+        # Basta con unas pocas ventanas lentas para que EMA/RSI/MACD converjan
+        fed = indicator_engine.warm_from_store(tick_store, start=time.time() - max(1, args.interval) * EMA_SLOW_PERIOD * 4)
+        logger.debug("Indicators warmed up with %d recorded ticks.", fed)
+        if risk_engine is not None:
+            fed = risk_engine.history.warm_from_store(tick_store, start=time.time() - RISK_HORIZON_HOURS * 3600 * 4)
+            logger.debug("Monte Carlo returns warmed up with %d recorded ticks.", fed)
+    STARTUP_MARKS.setdefault("session/limiter/store setup", time.perf_counter())
 
-               
-            # --- MENSAJE DE CIERRE ---
-            print("=========================================================================================")
-            print(f"Updating in {args.interval} seconds... (Ctrl+C to stop 🛑)")
+    cache = None if args.no_cache else ResponseCache()
+    if memory_monitor is not None and cache is not None:
+        memory_monitor.add_trim(cache.clear)
+    source: PriceSource = RestPollingSource(session, args.cryptos, args.currency, args.interval, per_page=args.per_page,
+                                            max_concurrency=args.max_concurrency, limiter=limiter, cache=cache)
+    if args.aggregate:
+        try:
+            exchanges = build_exchange_sources([name.strip() for name in args.aggregate.split(",") if name.strip()],
+                                               dict(url.split("=", 1) for url in args.exchange_url or []), timeout=args.source_timeout)
+        except ValueError as e:
+            logger.error("%s", e)
+            sys.exit(1)
+        source = AggregatedSource(source, exchanges, quorum=args.quorum, method=args.aggregate_method, timeout=args.source_timeout)
+    if args.source == "coinbase-ws":
+        source = CoinbaseTickerSource(source, url=args.ws_url, max_fps=args.max_fps)
 
-            time.sleep(max(1, args.interval))
+    server = SnapshotServer(args.serve).start() if args.serve else None
+    if live_config is not None:
+        live_config.source = source
+        live_config.start()
 
+    try:
+        run_pipeline(args, session, limiter, coinbase_client, telegram_token, telegram_chat,
+                     max_ticks=1 if args.profile_startup else None,
+                     tick_store=tick_store, indicator_engine=indicator_engine, cache=cache, source=source,
+                     risk_engine=risk_engine.start() if risk_engine is not None else None, server=server, config=live_config)
+        if args.profile_startup:
+            if not coinbase_client.done():
+                logger.info("Coinbase auth still running in the background after the first frame.")
+            print_startup_profile()
     except KeyboardInterrupt:
         print("\nAnalyzer stopped. Happy trading in the 🌐 Coinbase advanced!")
-        sys.exit(0)
+        sys.exit(MEMORY_GUARD_EXIT_CODE if memory_monitor is not None and memory_monitor.tripped else 0)
     except Exception as e:
         logger.critical(f"An unexpected error occurred: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if live_config is not None:
+            live_config.stop()
+        if server is not None:
+            server.stop()
+        for process in stand_ins:
+            process.terminate()
+
 
+STARTUP_MARKS.setdefault("module body", time.perf_counter())
 
 if __name__ == "__main__":
     main()
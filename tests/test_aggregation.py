@@ -0,0 +1,84 @@
+import pytest
+
+import price_checker as pc
+
+NOW = 1_700_000_000.0
+
+
+def quote(price, volume=None, age=0.0):
+    return pc.Quote(price, volume, NOW - age)
+
+
+def test_outlier_rejected_with_three_sources():
+    price, used, rejected = pc.merge_quotes([quote(101, 1), quote(125, 1)], now=NOW, baseline=quote(100))
+    assert (price, used, rejected) == (100.5, 2, 1)
+
+
+def test_two_disagreeing_sources_keep_the_baseline():
+    price, used, rejected = pc.merge_quotes([quote(125, 1)], now=NOW, baseline=quote(100))
+    assert (price, used, rejected) == (100, 1, 1)
+
+
+def test_two_disagreeing_exchanges_without_baseline_skip_the_coin():
+    assert pc.merge_quotes([quote(100, 1), quote(125, 1)], now=NOW) == (None, 0, 2)
+
+
+def test_two_agreeing_sources_are_merged():
+    price, used, _ = pc.merge_quotes([quote(100.4, 1)], now=NOW, baseline=quote(100))
+    assert used == 2 and price == pytest.approx(100.2)
+
+
+def test_vwap_does_not_drop_the_unweighted_baseline():
+    price, _, _ = pc.merge_quotes([quote(80, 5)], "vwap", now=NOW, baseline=quote(100))
+    assert price == 100
+    price, used, _ = pc.merge_quotes([quote(100.6, 1), quote(100.4, 3)], "vwap", now=NOW, baseline=quote(100))
+    # El baseline pesa como la mediana de los volúmenes (2)
+    assert used == 3 and price == pytest.approx((100 * 2 + 100.6 * 1 + 100.4 * 3) / 6)
+
+
+def test_stale_quotes_are_ignored():
+    price, used, rejected = pc.merge_quotes([quote(125, 1, age=pc.QUOTE_MAX_AGE + 1)], now=NOW, baseline=quote(100))
+    assert (price, used, rejected) == (100, 1, 1)
+
+
+class FlappingRest:
+    """Each CoinGecko answer is a new list whose 24h change (and so reference) is tagged by market cap."""
+    currency, frame_interval = "usd", 1.0
+
+    def __init__(self):
+        self.version = 0
+
+    def snapshot(self):
+        self.version += 1
+        change = float(self.version % 7)
+        return [pc.MarketRecord("bitcoin", "btc", 100.0, float(self.version), change, change)]
+
+
+class SteadyExchange:
+    name, latency = "steady", None
+
+    def fetch(self, symbols, quote):
+        return {"BTC": pc.Quote(100.4, None, pc.time.time())}
+
+    def observe(self, elapsed):
+        pass
+
+    def hedge_delay(self, budget):
+        return budget
+
+    def close(self):
+        pass
+
+
+def test_repriced_records_use_the_references_of_their_own_baseline(monkeypatch):
+    references = pc.market_references
+    # Referencias lentas: abre la ventana en la que el hilo del pool ya cambió la lista pero no sus referencias
+    monkeypatch.setattr(pc, "market_references", lambda coin: (pc.time.sleep(0.002), references(coin))[1])
+    source = pc.AggregatedSource(FlappingRest(), [SteadyExchange()], quorum=1, timeout=1.0)
+    try:
+        for _ in range(50):
+            coin = source.snapshot()[0]
+            change = float(int(coin.market_cap) % 7)
+            assert coin.change_24h == pytest.approx(pc._pct_change(coin.price, 100.0 / (1 + change / 100)))
+    finally:
+        source.stop()
@@ -0,0 +1,68 @@
+import json
+
+import price_checker as pc
+
+
+class Response:
+    def __init__(self, payload, status_code=200, **headers):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode()
+        self.headers = {name.replace("_", "-"): value for name, value in headers.items()}
+
+
+KEY = pc.ResponseCache.key({"ids": "bitcoin", "vs_currency": "usd"})
+COINS = [{"id": "bitcoin", "symbol": "btc", "current_price": 100.0, "market_cap": 1.0}]
+
+
+def _fresh(cache):
+    entry = cache.get(KEY)
+    return entry is not None and entry.fresh_until > pc.time.monotonic()
+
+
+def test_key_normalizes_id_order_and_whitespace():
+    assert pc.ResponseCache.key({"ids": "b, a", "page": 1}) == pc.ResponseCache.key({"page": "1", "ids": "a,b"})
+
+
+def test_max_age_minus_age_makes_an_entry_fresh():
+    cache = pc.ResponseCache()
+    cache.store(KEY, Response(COINS, Cache_Control="public, max-age=60", Age="10"), None)
+    assert _fresh(cache)
+    cache.store(KEY, Response(COINS, Cache_Control="max-age=60", Age="90"), None)
+    assert not _fresh(cache)
+
+
+def test_no_cache_overrides_max_age_in_either_order():
+    for header in ("no-cache, max-age=60", "max-age=60, no-cache"):
+        cache = pc.ResponseCache()
+        assert cache.store(KEY, Response(COINS, Cache_Control=header, ETag='"v1"'), None)[0].id == "bitcoin"
+        entry = cache.get(KEY)
+        assert entry.etag == '"v1"' and not _fresh(cache)
+
+
+def test_no_store_overrides_max_age_and_drops_the_entry():
+    for header in ("no-store, max-age=60", "max-age=60, no-store"):
+        cache = pc.ResponseCache()
+        cache.store(KEY, Response(COINS, Cache_Control="max-age=0", ETag='"v1"'), None)
+        previous = cache.get(KEY)
+        assert cache.store(KEY, Response(COINS, Cache_Control=header), previous)[0].id == "bitcoin"
+        assert cache.get(KEY) is None
+        assert cache.store(KEY, Response(None, status_code=304, Cache_Control=header), previous) is previous.payload
+
+
+def test_not_modified_and_identical_bodies_reuse_the_payload_object():
+    cache = pc.ResponseCache()
+    payload = cache.store(KEY, Response(COINS, ETag='"v1"'), None)
+    assert cache.store(KEY, Response(None, status_code=304), cache.get(KEY)) is payload
+    assert cache.store(KEY, Response(COINS), cache.get(KEY)) is payload
+    assert cache.get(KEY).etag == '"v1"'
+    assert cache.store(KEY, Response([dict(COINS[0], current_price=101.0)]), cache.get(KEY)) is not payload
+
+
+def test_lru_evicts_the_least_recently_used_key():
+    cache = pc.ResponseCache(max_entries=2)
+    keys = [pc.ResponseCache.key({"page": page}) for page in range(3)]
+    cache.store(keys[0], Response(COINS), None)
+    cache.store(keys[1], Response(COINS), None)
+    cache.get(keys[0])
+    cache.store(keys[2], Response(COINS), None)
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None
@@ -0,0 +1,42 @@
+import argparse
+
+import pytest
+
+import price_checker as pc
+
+
+def _live_config(tmp_path, body):
+    path = tmp_path / "config.json"
+    path.write_text(body, encoding="utf-8")
+    return pc.LiveConfig(str(path), argparse.Namespace(cryptos="bitcoin", currency="usd", interval=60))
+
+
+@pytest.mark.parametrize("value", ["2.5", "true", '"30"', "null"])
+def test_interval_must_be_whole_seconds(tmp_path, value):
+    config = _live_config(tmp_path, f'{{"interval": {value}}}')
+    with pytest.raises(ValueError, match="interval"):
+        config.reload(strict=True)
+
+
+def test_integral_interval_and_rules_are_applied(tmp_path):
+    config = _live_config(tmp_path, '{"interval": 30.0, "plr_discount": 0.05}')
+    assert config.reload(strict=True)
+    assert config.args.interval == 30 and isinstance(config.args.interval, int)
+    assert config.rules.plr_discount == 0.05
+
+
+def test_changes_are_signalled_without_a_source_and_reach_it_once_attached(tmp_path):
+    config = _live_config(tmp_path, '{"plr_discount": 0.05}')
+    assert config.reload(strict=True) and config.changed.is_set()
+
+    class Source:
+        calls = []
+
+        def reconfigure(self, cryptos, currency, interval):
+            self.calls.append((cryptos, currency, interval))
+
+    config.changed.clear()
+    config.source = Source()
+    (tmp_path / "config.json").write_text('{"plr_discount": 0.05, "cryptos": ["bitcoin", "ethereum"]}', encoding="utf-8")
+    assert config.reload() and config.changed.is_set()
+    assert Source.calls == [("bitcoin,ethereum", "usd", 60)]
@@ -0,0 +1,109 @@
+import json
+import threading
+
+import requests
+
+import price_checker as pc
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode()
+        self.headers = {}
+        self.raw = None
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+
+class FakeSession:
+    """Answers /coins/markets like CoinGecko from a fixed universe; ids in `failing` fail their request."""
+
+    def __init__(self, coins, failing=()):
+        self.coins = {coin["id"]: coin for coin in coins}
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        with self._lock:
+            self.calls.append(dict(params))
+        ids = params["ids"].split(",")
+        if self.failing & set(ids):
+            raise requests.exceptions.ConnectionError("boom")
+        found = sorted((self.coins[i] for i in ids if i in self.coins), key=lambda c: -c["market_cap"])
+        per_page, page = int(params["per_page"]), int(params["page"])
+        return FakeResponse(found[(page - 1) * per_page:page * per_page])
+
+
+def _coins(n):
+    return [{"id": f"coin-{i:04d}", "symbol": f"c{i}", "current_price": 1.0 + i, "market_cap": float(i)} for i in range(n)]
+
+
+def test_chunk_ids_stays_under_the_limit_and_keeps_order():
+    ids = [f"coin-{i}" for i in range(300)]
+    chunks = pc.chunk_ids(ids, max_chars=200)
+    assert [i for chunk in chunks for i in chunk] == ids
+    assert all(len(",".join(chunk)) <= 200 for chunk in chunks)
+    assert len(chunks) > 1
+
+
+def test_chunk_ids_keeps_an_oversized_id_alone():
+    assert pc.chunk_ids(["x" * 50, "a", "b"], max_chars=10) == [["x" * 50], ["a", "b"]]
+
+
+def test_chunked_fetch_pages_dedups_and_sorts_by_market_cap():
+    session = FakeSession(_coins(450))
+    ids = [coin["id"] for coin in _coins(450)] + ["coin-0001", "missing"]
+    data = pc.fetch_data(session, ",".join(ids), "usd", per_page=100, max_concurrency=4)
+    assert [coin["id"] for coin in data] == [f"coin-{i:04d}" for i in reversed(range(450))]
+    assert all(len(call["ids"]) <= pc.MAX_IDS_PARAM_CHARS for call in session.calls)
+    assert len(session.calls) >= 5
+
+
+def test_chunked_fetch_returns_partial_data_or_none():
+    coins = _coins(300)
+    ids = ",".join(coin["id"] for coin in coins)
+    partial = pc.fetch_data_chunked(FakeSession(coins, failing={"coin-0000"}), ids.split(","), "usd", per_page=100)
+    assert partial and len(partial) < 300
+    assert pc.fetch_data_chunked(FakeSession(coins, failing={c["id"] for c in coins}), ids.split(","), "usd", per_page=100) is None
+
+
+def test_small_watchlist_uses_a_single_request():
+    session = FakeSession(_coins(3))
+    data = pc.fetch_data(session, "coin-0000,coin-0002", "usd")
+    assert [coin["id"] for coin in data] == ["coin-0002", "coin-0000"]
+    assert len(session.calls) == 1
+
+
+class BodySession:
+    def __init__(self, body):
+        self.body = body
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        resp = FakeResponse([])
+        resp.content = self.body
+        return resp
+
+
+def test_malformed_bodies_are_a_failed_fetch_with_or_without_cache():
+    params = pc._market_params("usd", "bitcoin", 10, 1)
+    for body in (b"<html>502 Bad Gateway</html>", b'{"error": "maintenance"}', b"[1, 2]"):
+        assert pc._fetch_page(BodySession(body), params, 5) is None
+        cache = pc.ResponseCache()
+        assert pc._fetch_page(BodySession(body), params, 5, cache=cache) is None
+        assert cache.get(pc.ResponseCache.key(params)) is None
+
+
+def test_benchmark_drives_the_live_source_and_renderer():
+    requests_before = pc.METRICS.counters.get("coingecko_requests_total", 0)
+    report = pc.run_benchmark(iterations=2, coins=300, per_page=100)
+    assert report["failed"] == 0 and report["requests_per_tick"] > 1
+    assert pc.METRICS.counters.get("coingecko_requests_total", 0) - requests_before == 2 * report["requests_per_tick"]
+    assert set(report) >= {"fetch", "signal", "render", "total", "coins_per_second"}
+    assert pc.API_URL.startswith("https://api.coingecko.com")
@@ -0,0 +1,97 @@
+import math
+import random
+import statistics
+
+import pytest
+
+import price_checker as pc
+
+
+def _walk(n, seed=5):
+    rng = random.Random(seed)
+    price, out = 100.0, []
+    for _ in range(n):
+        price *= 1 + rng.gauss(0, 0.02)
+        out.append(price)
+    return out
+
+
+def test_ema_matches_recursive_definition():
+    ema, expected = pc.EMA(12), None
+    alpha = 2.0 / 13
+    for x in _walk(100):
+        expected = x if expected is None else alpha * x + (1 - alpha) * expected
+        assert math.isclose(ema.update(x), expected, rel_tol=1e-12)
+
+
+def test_wilder_rsi_matches_batch_reference():
+    prices = _walk(80)
+    rsi = pc.WilderRSI(14)
+    values = [rsi.update(x) for x in prices]
+    assert values[13] is None and values[14] is not None  # 14 deltas para la semilla
+
+    deltas = [b - a for a, b in zip(prices, prices[1:])]
+    gain = sum(max(d, 0.0) for d in deltas[:14]) / 14
+    loss = sum(max(-d, 0.0) for d in deltas[:14]) / 14
+    for d in deltas[14:]:
+        gain = (gain * 13 + max(d, 0.0)) / 14
+        loss = (loss * 13 + max(-d, 0.0)) / 14
+    assert math.isclose(values[-1], 100.0 - 100.0 / (1.0 + gain / loss), rel_tol=1e-9)
+
+
+def test_rsi_is_100_without_losses():
+    rsi = pc.WilderRSI(3)
+    for x in (1.0, 2.0, 3.0, 4.0):
+        rsi.update(x)
+    assert rsi.value == 100.0
+
+
+def test_rolling_stats_track_the_last_window():
+    stats = pc.RollingStats(5)
+    assert stats.mean is None and stats.std is None
+    prices = _walk(23)
+    for x in prices:
+        stats.update(x)
+    assert math.isclose(stats.mean, statistics.fmean(prices[-5:]), rel_tol=1e-9)
+    assert math.isclose(stats.std, statistics.pstdev(prices[-5:]), rel_tol=1e-6)
+
+
+def test_crosses_drive_sentiment_and_dip_confirmation():
+    state = pc.CoinIndicators()
+    for _ in range(pc.EMA_SLOW_PERIOD):
+        state.update(100.0)
+    assert state.ready and state.last_cross == 0
+    state.update(110.0)  # La EMA rápida cruza por encima de la lenta
+    assert state.last_cross == 1
+    assert pc.SENTIMENT_LABELS[state.sentiment_code()] == "FUERTE COMPRA (Golden Cross)"
+    assert not state.dip_confirmed()  # Precio por encima de la SMA: el DIP no cuenta
+    for _ in range(3):
+        state.update(80.0)
+    assert state.last_cross == -1
+    assert pc.SENTIMENT_LABELS[state.sentiment_code()] == "FUERTE VENTA (Death Cross)"
+    assert state.dip_confirmed()
+
+
+def test_warming_up_state_never_vetoes_or_overrides():
+    state = pc.CoinIndicators()
+    state.update(100.0)
+    assert not state.ready
+    assert state.sentiment_code() == 0 and state.dip_confirmed()
+
+
+def test_engine_aligns_states_with_snapshot():
+    engine = pc.IndicatorEngine()
+    engine.update_snapshot([{"id": "bitcoin", "current_price": 1.0}])
+    states = engine.update_snapshot([{"id": "ethereum", "current_price": None}, {"id": "bitcoin", "current_price": 2.0}, {"id": None}])
+    assert states[0] is None and states[2] is None
+    assert states[1] is engine.coins["bitcoin"] and states[1].ticks == 2
+
+
+def test_warm_from_store_replays_recorded_ticks(tmp_path):
+    pytest.importorskip("numpy")
+    store = pc.TickStore(str(tmp_path), segment_rows=8)
+    for ts in range(1, 6):
+        store.append([{"id": "bitcoin", "current_price": float(ts)}, {"id": "ethereum", "current_price": ts * 2.0}], float(ts))
+    engine = pc.IndicatorEngine()
+    assert engine.warm_from_store(store, start=3.0) == 6
+    assert engine.coins["bitcoin"].ticks == 3 and engine.coins["ethereum"].price == 10.0
@@ -0,0 +1,61 @@
+import argparse
+from email.utils import format_datetime
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+import price_checker as pc
+
+
+def test_burst_is_served_then_callers_are_rejected_past_max_wait():
+    limiter = pc.TokenBucketLimiter(60, burst=3)  # 1 llamada/s
+    assert all(limiter.acquire(max_wait=0) for _ in range(3))
+    assert limiter.acquire(max_wait=0.1) is False
+    assert limiter.stats()["rejected"] == 1 and limiter.stats()["delayed"] == 0
+
+
+def test_acquire_waits_for_the_next_slot(monkeypatch):
+    slept = []
+    monkeypatch.setattr(pc.time, "sleep", slept.append)
+    limiter = pc.TokenBucketLimiter(600, burst=1)  # 10 llamadas/s
+    assert limiter.acquire() and limiter.acquire()
+    assert len(slept) == 1 and 0 < slept[0] <= 0.1
+    assert limiter.stats()["delayed"] == 1
+
+
+def test_429_halves_the_rate_and_honours_retry_after_then_recovers():
+    limiter = pc.TokenBucketLimiter(120, burst=5)
+    limiter.feedback(429, retry_after=30)
+    assert limiter.stats()["calls_per_minute"] == 60
+    assert limiter.acquire(max_wait=10) is False  # Bloqueado por Retry-After
+    for _ in range(40):
+        limiter.feedback(200)
+    assert limiter.stats()["calls_per_minute"] == 120
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_rate_never_drops_below_the_floor():
+    limiter = pc.TokenBucketLimiter(30, min_calls_per_minute=5)
+    for _ in range(10):
+        limiter.feedback(429)
+    assert limiter.stats()["calls_per_minute"] == 5
+
+
+@pytest.mark.parametrize("rate", [0, -1, float("nan")])
+def test_non_positive_rates_are_rejected(rate):
+    with pytest.raises(ValueError):
+        pc.TokenBucketLimiter(rate)
+
+
+@pytest.mark.parametrize("value", ["0", "-5", "nan", "inf", "abc"])
+def test_rate_limit_flag_must_be_positive(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        pc.positive_float(value)
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert pc.parse_retry_after("12") == 12.0
+    assert pc.parse_retry_after(None) is None
+    assert pc.parse_retry_after("garbage") is None
+    later = format_datetime(datetime.now(UTC) + timedelta(seconds=90), usegmt=True)
+    assert 80 < pc.parse_retry_after(later) <= 90
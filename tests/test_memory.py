@@ -0,0 +1,43 @@
+import sys
+
+import price_checker as pc
+
+
+def _coin(coin_id, price=100.0):
+    return pc.MarketRecord(coin_id, coin_id, price, 1.0, -5.0, 2.0)
+
+
+def test_retain_evicts_unwatched_coins_and_reuses_their_slots():
+    book = pc.PriceBook(3)
+    book.update({"a": 1.0, "b": 2.0, "c": 3.0})
+    assert book.retain({"a"}) == 2 and "b" not in book and len(book) == 1
+    book.update({"d": 4.0})
+    assert len(book.prices) == 3 and book.get("d") == 4.0
+
+    data = [_coin("a"), _coin("b")]
+    tracker = pc.SignalStateTracker()
+    signals = pc.compute_signals([c.price for c in data], [c.change_24h for c in data], [c.change_7d for c in data])
+    tracker.apply([c.id for c in data], [c.price for c in data], [-5.0, -5.0], [2.0, 2.0], signals)
+    assert tracker.retain({"a"}) == 1
+    tracker.apply(["c"], [100.0], [-5.0], [2.0], {key: values[:1] for key, values in signals.items()})
+    assert len(tracker.alert) == 2 and set(tracker.index) == {"a", "c"}
+
+    engine = pc.IndicatorEngine()
+    history = pc.ReturnHistory()
+    for ts, price in enumerate((100.0, 101.0)):
+        for coin_id in ("a", "b"):
+            engine.update(coin_id, price)
+            history.update(coin_id, price, ts * 3600.0)
+    assert engine.retain({"b"}) == 1 and set(engine.coins) == {"b"}
+    assert history.retain(set()) == 2 and not history.returns and not history.last
+
+    view = pc.TableView(top=1)
+    view.select(data, signals, {})
+    assert view.retain({"a"}) == 1 and view.retain({"a"}) == 0
+
+
+def test_soak_keeps_rss_flat_while_the_watchlist_rotates(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["price_checker.py", "--interval", "1800", "--no-clear"])
+    args = pc.parse_args()
+    assert pc.run_soak(args, days=3, watch=100)
+    assert pc.API_URL.startswith("https://api.coingecko.com")
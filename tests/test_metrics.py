@@ -0,0 +1,74 @@
+import json
+import threading
+import urllib.request
+
+import price_checker as pc
+
+
+def test_histogram_buckets_use_upper_bounds():
+    hist = pc.Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        hist.observe(value)
+    counts, total, count = hist.read()
+    assert counts == [2, 1, 1]  # le=0.1 incluye el límite; el último bucket es +Inf
+    assert count == 4 and abs(total - 2.65) < 1e-12
+
+
+def test_concurrent_observations_are_not_lost():
+    hist = pc.Histogram()
+
+    def worker():
+        for _ in range(5000):
+            hist.observe(0.003)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counts, _, count = hist.read()
+    assert count == sum(counts) == 40000
+
+
+def test_prometheus_buckets_are_cumulative():
+    registry = pc.MetricsRegistry()
+    hist = registry.histogram("fetch")
+    assert registry.histogram("fetch") is hist
+    for value in (0.0005, 0.02, 60.0):
+        hist.observe(value)
+    registry.inc("http_429_total", 2)
+    text = registry.prometheus()
+    assert 'price_checker_stage_seconds_bucket{stage="fetch",le="0.001"} 1' in text
+    assert 'price_checker_stage_seconds_bucket{stage="fetch",le="30.0"} 2' in text
+    assert 'price_checker_stage_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'price_checker_stage_seconds_count{stage="fetch"} 3' in text
+    assert "price_checker_http_429_total 2" in text
+    snapshot = registry.snapshot()
+    assert snapshot["stages"]["fetch"]["buckets"]["+Inf"] == 1 and snapshot["counters"] == {"http_429_total": 2}
+
+
+def test_instrumented_records_failures_too():
+    @pc.instrumented("test_stage")
+    def boom():
+        raise ValueError
+
+    before = pc.METRICS.histogram("test_stage").read()[2]
+    try:
+        boom()
+    except ValueError:
+        pass
+    assert pc.METRICS.histogram("test_stage").read()[2] == before + 1
+
+
+def test_metrics_endpoint_serves_both_formats():
+    server = pc.start_metrics_server(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            assert b"price_checker_stage_seconds" in resp.read()
+        with urllib.request.urlopen(base + "/metrics.json") as resp:
+            assert "stages" in json.loads(resp.read())
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,50 @@
+from concurrent.futures import Future
+
+import pytest
+
+import price_checker as pc
+
+
+def _signal(symbol, limit=95.0):
+    return {"symbol": symbol, "name": symbol.lower(), "limit_price_value": limit}
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    placed = []
+    responses = {}
+
+    def place(client, symbol, limit_price, usd_amount):
+        placed.append(symbol)
+        return responses.get(symbol, {"id": "order", "status": "created"})
+
+    monkeypatch.setattr(pc, "HAS_COINBASE", True)
+    monkeypatch.setattr(pc, "place_limit_order_coinbase", place)
+    return placed, responses
+
+
+def test_failed_orders_do_not_start_the_cooldown(orders):
+    placed, responses = orders
+    responses["BTC"] = None
+    responses["ETH"] = {"id": "order", "status": "canceled"}
+    executor = pc.OrderExecutor(object())
+    executor.execute([_signal("BTC"), _signal("ETH"), _signal("SOL")])
+    assert executor.failed == 2 and set(executor.recent) == {"SOL"}
+
+    executor.execute([_signal("BTC"), _signal("ETH"), _signal("SOL")])
+    assert sorted(placed) == ["BTC", "BTC", "ETH", "ETH", "SOL"] and executor.skipped == 1
+
+
+def test_auth_failure_is_resolved_once_and_disables_trading(orders):
+    placed, _ = orders
+    future = Future()
+    future.set_result(None)
+    executor = pc.OrderExecutor(future)
+    assert executor.execute([_signal("BTC")]) == []
+    assert executor.disabled and executor.client is None
+
+    failing = Future()
+    failing.set_exception(RuntimeError("401"))
+    executor = pc.OrderExecutor(failing)
+    assert executor.execute([_signal("BTC")]) == [] and executor.disabled
+    assert placed == []
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+import price_checker as pc
+
+
+def test_full_stage_drops_the_oldest_item():
+    started, gate = threading.Event(), threading.Event()
+    seen = []
+    stage = pc.PipelineStage("render", lambda item: (started.set(), gate.wait(), seen.append(item)), maxsize=1,
+                             drop_oldest=True).start()
+    stage.submit("busy")
+    started.wait(1)  # El consumidor ya tiene 'busy' en mano
+    for frame in ("a", "b", "c"):
+        stage.submit(frame)
+    assert stage.dropped == 2
+    gate.set()
+    stage.stop()
+    assert seen == ["busy", "c"]
+
+
+def test_full_trade_stage_waits_instead_of_dropping():
+    started, gate = threading.Event(), threading.Event()
+    seen = []
+    stage = pc.PipelineStage("trade", lambda item: (started.set(), gate.wait(), seen.append(item)), maxsize=1).start()
+    stage.submit("busy")
+    started.wait(1)
+    stage.submit("queued")
+    producer = threading.Thread(target=stage.submit, args=("blocked",))
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()  # La cola está llena: el productor espera, no descarta
+    gate.set()
+    producer.join(1)
+    stage.stop()
+    assert seen == ["busy", "queued", "blocked"] and stage.dropped == 0
+
+
+def test_stop_drains_pending_items():
+    seen = []
+    stage = pc.PipelineStage("trade", seen.append, maxsize=4).start()
+    for item in range(3):
+        stage.submit(item)
+    stage.stop()
+    assert seen == [0, 1, 2]
+
+
+def test_handler_errors_do_not_kill_the_stage():
+    seen = []
+
+    def handler(item):
+        if item == "bad":
+            raise RuntimeError("boom")
+        seen.append(item)
+
+    stage = pc.PipelineStage("notify", handler, maxsize=4).start()
+    stage.submit("bad")
+    stage.submit("ok")
+    stage.stop()
+    assert seen == ["ok"]
+
+
+def test_build_table_returns_lines_without_printing(capsys):
+    data = [{"id": "bitcoin", "symbol": "btc", "current_price": 100.0,
+             "price_change_percentage_24h_in_currency": 1.0, "price_change_percentage_7d_in_currency": 2.0}]
+    result = pc.build_table(data, {"bitcoin": 50.0}, "usd")
+    assert capsys.readouterr().out == ""
+    assert result["prev_prices"] == {"bitcoin": 100.0}
+    header, separator, row, closing = result["lines"]
+    assert header.startswith("| Moneda") and separator == closing == "-" * len(header)
+    assert "+100.00%" in row and len(row) == len(header)
+
+
+def test_build_table_never_places_orders(monkeypatch):
+    monkeypatch.setattr(pc, "place_limit_order_coinbase", lambda **kwargs: pytest.fail("build_table placed an order"))
+    data = [{"id": "bitcoin", "symbol": "btc", "current_price": 100.0,
+             "price_change_percentage_24h_in_currency": -5.0, "price_change_percentage_7d_in_currency": 2.0}]
+    result = pc.build_table(data, {}, "usd")
+    assert [signal["name"] for signal in result["buy_signals"]] == ["bitcoin"]
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import price_checker as pc
+
+np = pytest.importorskip("numpy")
+
+
+def market(coin_id, price, symbol=None):
+    return {"id": coin_id, "symbol": symbol or coin_id[:3], "current_price": price,
+            "price_change_percentage_24h_in_currency": -5.0, "price_change_percentage_7d_in_currency": 2.0, "market_cap": 1.0}
+
+
+@pytest.fixture
+def snapshot():
+    shared = pc.SharedSnapshot("usd", ["bitcoin", "ethereum", "solana"])
+    yield shared
+    shared.close()
+
+
+def test_write_fills_the_idle_slot_and_reports_new_symbols(snapshot):
+    slot, symbols = snapshot.write([market("ethereum", 2.0), market("dogecoin", 9.0)])
+    assert symbols == {"ethereum": "ETH"}
+    assert snapshot.seqs[slot] % 2 == 0
+    block = pc.read_snapshot_slot(snapshot.seqs, snapshot.array, slot, np.array([1, 0]))
+    assert block[0, 0] == 2.0 and np.isnan(block[1]).all()
+    assert snapshot.write([market("ethereum", 3.0)]) == ((slot + 1) % pc.SNAPSHOT_SLOTS, {})
+
+
+def test_seqlock_read_gives_up_on_a_slot_being_written(snapshot, monkeypatch):
+    slot, _ = snapshot.write([market("bitcoin", 1.0)])
+    monkeypatch.setattr(pc, "SNAPSHOT_READ_RETRIES", 3)
+    snapshot.seqs[slot] += 1  # Escritor a medias: contador impar
+    assert pc.read_snapshot_slot(snapshot.seqs, snapshot.array, slot, np.array([0])) is None
+
+
+def test_seqlock_read_retries_when_the_slot_changes_underneath(snapshot):
+    slot, _ = snapshot.write([market("bitcoin", 1.0)])
+
+    class BumpOnce:
+        """Contador que avanza entre la primera y la segunda lectura, como un escritor concurrente."""
+        def __init__(self, seqs):
+            self.seqs, self.reads = seqs, 0
+
+        def __getitem__(self, i):
+            self.reads += 1
+            return self.seqs[i] + (2 if self.reads >= 2 else 0)
+
+    seqs = BumpOnce(snapshot.seqs)
+    block = pc.read_snapshot_slot(seqs, snapshot.array, slot, np.array([0]))
+    assert block[0, 0] == 1.0 and seqs.reads == 4
+
+
+def test_profiles_load_and_union_watchlists(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"profiles": [
+        {"name": "a", "cryptos": "bitcoin, ethereum", "plr_discount": 0.05},
+        {"cryptos": ["ethereum", "solana"], "currency": "EUR"},
+        {"name": "empty", "cryptos": ""},
+    ]}))
+    profiles = pc.load_profiles(str(path))
+    assert [p.name for p in profiles] == ["a", "profile-1"]
+    assert profiles[0].plr_discount == 0.05 and profiles[1].currency == "eur"
+    assert pc.union_watchlists(profiles + [pc.Profile("b", ["solana", "bitcoin"])]) == {
+        "usd": ["bitcoin", "ethereum", "solana"], "eur": ["ethereum", "solana"]}
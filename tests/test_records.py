@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import price_checker as pc
+
+PAYLOAD = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "current_price": 65000.5, "market_cap": 1.2e12,
+     "price_change_percentage_24h_in_currency": -4.5, "price_change_percentage_7d_in_currency": 2.25, "ath": 73000},
+    {"id": "newcoin", "symbol": "new", "current_price": None, "market_cap": None,
+     "price_change_percentage_24h_in_currency": None},
+]
+
+
+def _records():
+    return pc.decode_market_payload(json.dumps(PAYLOAD).encode())
+
+
+def test_decode_keeps_only_the_used_fields():
+    btc, new = _records()
+    assert isinstance(btc, pc.MarketRecord)
+    assert (btc.id, btc.symbol, btc.price, btc.market_cap, btc.change_24h, btc.change_7d) == ("bitcoin", "btc", 65000.5, 1.2e12, -4.5, 2.25)
+    assert btc.as_dict() == {field: PAYLOAD[0][field] for field in pc.MARKET_FIELDS}
+    assert (new.price, new.change_7d) == (None, None)
+
+
+def test_records_read_like_the_raw_dicts():
+    btc, new = _records()
+    for field in pc.MARKET_FIELDS:
+        assert btc.get(field) == btc[field] == PAYLOAD[0][field]
+    assert new.get("current_price") is None and new["current_price"] is None
+    assert new.get("current_price", 0.0) == 0.0
+    assert btc.get("ath") is None
+    with pytest.raises(KeyError):
+        btc["ath"]
+
+
+def test_ids_are_interned_across_ticks():
+    first, second = _records(), _records()
+    assert first[0].id is second[0].id
+
+
+def test_tick_store_records_decoded_snapshots(tmp_path):
+    pytest.importorskip("numpy")
+    store = pc.TickStore(str(tmp_path), segment_rows=16)
+    assert store.append(_records(), 1000.0) == 1  # Sin precio: no se graba
+    rows = [row for chunk in store.scan() for row in chunk.tolist()]
+    assert len(rows) == 1
+    ts, coin, price, c24, c7 = rows[0]
+    assert (ts, store.ids[coin], price) == (1000.0, "bitcoin", 65000.5)
+    assert (c24, c7) == pytest.approx((-4.5, 2.25))
+    store.close()
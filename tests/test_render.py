@@ -0,0 +1,69 @@
+import io
+import logging
+import os
+
+import price_checker as pc
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_first_frame_clears_then_only_changed_lines_are_rewritten():
+    out = io.StringIO()
+    renderer = pc.DiffRenderer(out)
+    assert renderer.draw(["a", "b", "c"]) == 3
+    assert out.getvalue() == pc.DiffRenderer.CLEAR + "a\nb\nc\n"
+    out.seek(0)
+    out.truncate()
+    assert renderer.draw(["a", "B", "c"]) == 1
+    assert out.getvalue() == "\x1b[2;1HB\x1b[K\x1b[4;1H"
+
+
+def test_line_count_change_forces_full_redraw():
+    out = io.StringIO()
+    renderer = pc.DiffRenderer(out)
+    renderer.draw(["a", "b"])
+    assert renderer.draw(["a", "b", "c"]) == 3
+    assert out.getvalue().count(pc.DiffRenderer.CLEAR) == 2
+
+
+def test_logged_record_forces_full_redraw():
+    log_handler = logging.StreamHandler(io.StringIO())
+    out = io.StringIO()
+    renderer = pc.DiffRenderer(out, log_handler=log_handler)
+    renderer.draw(["a", "b"])
+    assert renderer.draw(["a", "b"]) == 0
+    log_handler.handle(logging.LogRecord("x", logging.WARNING, __file__, 1, "aviso", None, None))
+    assert renderer.draw(["a", "b"]) == 2
+    log_handler.removeFilter(renderer)
+
+
+def test_terminal_frames_are_clipped_to_width_and_height(monkeypatch):
+    monkeypatch.setattr(pc.shutil, "get_terminal_size", lambda: os.terminal_size((6, 4)))
+    out = FakeTerminal()
+    renderer = pc.DiffRenderer(out)
+    renderer.draw(["0123456789", "🚀🚀🚀🚀", "x", "y", "z"])
+    frame = out.getvalue()[len(pc.DiffRenderer.CLEAR):].split("\n")
+    assert frame[:2] == ["01234", "🚀🚀"]  # 5 celdas útiles; cada emoji ocupa dos
+    assert frame[2].startswith("… 3 l") and len(frame) == 4  # Aviso de líneas ocultas, también recortado
+
+    monkeypatch.setattr(pc.shutil, "get_terminal_size", lambda: os.terminal_size((8, 4)))
+    assert renderer.draw(["0123456789", "🚀🚀🚀🚀", "x", "y", "z"]) == 3  # Cambio de tamaño: redibujo completo
+
+
+def test_clip_to_width_counts_wide_and_zero_width_cells():
+    assert pc.clip_to_width("abc", 3) == "abc"
+    assert pc.clip_to_width("a✨b", 3) == "a✨"
+    assert pc.clip_to_width("é" * 4, 2) == "éé"
+
+
+def test_build_table_column_widths_only_grow():
+    row = {"id": "bitcoin", "symbol": "btc", "price_change_percentage_24h_in_currency": 1.0,
+           "price_change_percentage_7d_in_currency": 2.0}
+    widths = {}
+    wide = pc.build_table([dict(row, current_price=123456.0)], {}, "usd", col_widths=widths)["lines"]
+    narrow = pc.build_table([dict(row, current_price=1.0)], {}, "usd", col_widths=widths)["lines"]
+    assert len(narrow[0]) == len(wide[0])
+    assert len(pc.build_table([dict(row, current_price=1.0)], {}, "usd")["lines"][0]) < len(wide[0])
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import price_checker as pc
+
+pytest.importorskip("numpy")
+
+
+def test_dip_opens_one_order_per_entry_and_fills_at_the_limit():
+    backtester = pc.Backtester(horizon_hours=1, interval=60)
+    for n in range(3):  # Tres ticks seguidos en DIP: una sola entrada, una sola orden
+        backtester.feed(n * 60.0, ["bitcoin"], [100.0], [-5.0], [2.0])
+    assert int(backtester.entries[pc.ALERT_DIP]) == 1 and backtester.orders == 1
+    backtester.feed(240.0, ["bitcoin"], [97.0], [0.0], [0.0])
+    assert backtester.fills == 1
+    assert backtester.entry_price[backtester.index["bitcoin"]] == pytest.approx(100.0 * (1 - pc.PLR_DISCOUNT))
+
+
+def test_replay_reads_json_lines(tmp_path, capsys):
+    path = tmp_path / "ticks.jsonl"
+    snapshot = [{"id": "bitcoin", "current_price": 100.0, "price_change_percentage_24h_in_currency": -5.0,
+                 "price_change_percentage_7d_in_currency": 2.0}]
+    path.write_text("\n".join(json.dumps({"ts": ts, "data": snapshot}) for ts in (0, 60, 120)) + "\n")
+    backtester = pc.run_replay(str(path), horizon_hours=1, interval=60)
+    assert backtester.snapshots == 3 and backtester.rows == 3
+    assert "Estrategia PLR" in capsys.readouterr().out
+
+
+def test_store_ticks_split_across_segments_replay_as_one_snapshot(tmp_path):
+    store = pc.TickStore(str(tmp_path), segment_rows=4)
+    for ts in (1.0, 2.0, 3.0):  # 3 monedas por tick en segmentos de 4 filas: cada tick cruza un borde
+        store.append([{"id": coin, "current_price": ts, "price_change_percentage_24h_in_currency": 1.0,
+                       "price_change_percentage_7d_in_currency": 2.0} for coin in ("a", "b", "c")], ts)
+    store.close()
+    snapshots = list(pc.iter_replay_snapshots(str(tmp_path)))
+    assert [(ts, ids) for ts, ids, *_ in snapshots] == [(ts, ["a", "b", "c"]) for ts in (1.0, 2.0, 3.0)]
+
+
+def test_sample_clock_matches_live_and_replay_cadence():
+    live, replay = pc.SampleClock(), pc.SampleClock()
+    # En vivo: frames de 1 s con --interval 10 -> una muestra cada 10 frames, aunque lleguen con jitter
+    assert sum(live.due(t + (0.2 if t % 2 else -0.2), 10, 1.0) for t in range(100)) == 10
+    # Backtest: ticks grabados cada ~60 s; el frame es el propio intervalo, así que un tick adelantado también cuenta
+    assert [replay.due(ts, 60, 60) for ts in (0.0, 59.0, 61.0, 120.0, 179.7)] == [True, True, False, True, True]
@@ -0,0 +1,40 @@
+import math
+
+import pytest
+
+import price_checker as pc
+
+np = pytest.importorskip("numpy")
+
+
+def test_simulation_hits_a_near_limit_more_often_than_a_far_one():
+    prices = np.array([100.0, 100.0])
+    limits = np.array([99.0, 50.0])
+    chunk = pc.simulate_risk_chunk(prices, limits, [0.01, 0.01], [None, None], paths=500, seed=1)
+    assert chunk["p_hit_48h"][0] > 0.5 > chunk["p_hit_48h"][1]
+    assert chunk["p_hit_24h"][0] <= chunk["p_hit_48h"][0]
+    assert math.isnan(chunk["median_hours"][1])
+    low, mid, high = chunk["band"][0]
+    assert low < mid < high
+
+
+def test_return_history_skips_repeated_frames():
+    history = pc.ReturnHistory()
+    history.update("bitcoin", 100.0, 0.0)
+    history.update("bitcoin", 101.0, 0.5)
+    history.update("bitcoin", 102.0, 3600.0)
+    assert history.returns["bitcoin"].count == 1
+    sigma, residuals = history.sigma_hour("bitcoin", 1.0, 2.0)
+    assert sigma > 0 and residuals is None
+
+
+def test_pool_results_keep_job_order():
+    engine = pc.RiskEngine(paths=200, workers=2).start()
+    try:
+        ids = [f"c{i}" for i in range(pc.RISK_CHUNK_COINS * 2 + 1)]
+        results = engine.run(ids, [100.0] * len(ids), [0.001] * (len(ids) - 1) + [0.05], [None] * len(ids))
+    finally:
+        engine.stop()
+    assert list(results) == ids
+    assert results[ids[-1]].p_hit_48h > results[ids[0]].p_hit_48h
+    assert all(estimate.method == "gbm" for estimate in results.values())
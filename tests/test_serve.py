@@ -0,0 +1,62 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import price_checker as pc
+
+
+def _coin(coin_id, price, change_24h=1.0, change_7d=1.0):
+    return {"id": coin_id, "symbol": coin_id[:3], "current_price": price, "market_cap": 1.0,
+            "price_change_percentage_24h_in_currency": change_24h, "price_change_percentage_7d_in_currency": change_7d}
+
+
+@pytest.fixture
+def server():
+    server = pc.SnapshotServer("127.0.0.1:0").start()
+    yield server
+    server.stop()
+
+
+def _publish(server, data):
+    signals = pc.compute_signals([c["current_price"] for c in data], [c["price_change_percentage_24h_in_currency"] for c in data],
+                                 [c["price_change_percentage_7d_in_currency"] for c in data])
+    return server.publish(data, signals, {}, ["tabla"], 0.0)
+
+
+def _get(server, path, etag=None):
+    request = urllib.request.Request(server.url + path, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as resp:
+            return resp.status, resp.read(), resp.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(), e.headers.get("ETag")
+
+
+def test_snapshot_filters_and_coin_lookup(server):
+    _publish(server, [_coin("bitcoin", 100.0), _coin("ether", 50.0, change_24h=-5.0, change_7d=2.0)])
+    status, body, _ = _get(server, "/snapshot?alert=dip")
+    assert status == 200 and [record["id"] for record in json.loads(body)["coins"]] == ["ether"]
+    status, body, _ = _get(server, "/coins/bitcoin")
+    assert status == 200 and json.loads(body)["price"] == 100.0
+    assert _get(server, "/coins/nope")[0] == 404
+    assert _get(server, "/table")[1] == b"tabla\n"
+
+
+def test_etag_answers_304_until_the_next_tick(server):
+    assert _get(server, "/snapshot")[0] == 503
+    _publish(server, [_coin("bitcoin", 100.0)])
+    status, _, etag = _get(server, "/snapshot")
+    assert status == 200 and _get(server, "/snapshot", etag)[0] == 304
+    _publish(server, [_coin("bitcoin", 101.0)])
+    assert _get(server, "/snapshot", etag)[0] == 200
+
+
+def test_etag_only_applies_to_resources_that_exist(server):
+    _publish(server, [_coin("bitcoin", 100.0)])
+    etag = _get(server, "/snapshot")[2]
+    assert _get(server, "/nope", etag)[0] == 404
+    assert _get(server, "/coins/nope", etag)[0] == 404
+    assert _get(server, "/coins/bitcoin", etag)[0] == 304
+    assert _get(server, "/table", etag)[0] == 304
@@ -0,0 +1,102 @@
+import math
+import random
+
+import pytest
+
+import price_checker as pc
+
+np = pytest.importorskip("numpy")
+
+THRESHOLDS = sorted({t for _, clauses in pc.ALERT_RULES + pc.SENTIMENT_RULES for _, _, t in clauses})
+
+
+def _columns(n=2000, seed=7):
+    rng = random.Random(seed)
+    prices, c24, c7 = [], [], []
+    for _ in range(n):
+        prices.append(rng.choice([None, 0.0, rng.lognormvariate(0, 3)]) if rng.random() < 0.05 else rng.lognormvariate(0, 3))
+        # Valores exactamente en los umbrales: ahí es donde > y >= se distinguen
+        c24.append(rng.choice(THRESHOLDS) if rng.random() < 0.3 else (None if rng.random() < 0.03 else rng.gauss(0, 6)))
+        c7.append(rng.choice(THRESHOLDS) if rng.random() < 0.3 else (None if rng.random() < 0.03 else rng.gauss(0, 12)))
+    return prices, c24, c7
+
+
+def _same(a, b):
+    return (math.isnan(a) and math.isnan(b)) if isinstance(a, float) and isinstance(b, float) and (math.isnan(a) or math.isnan(b)) else a == b
+
+
+def test_batch_matches_scalar_engine():
+    prices, c24, c7 = _columns()
+    batch = pc.compute_signals_batch(prices, c24, c7)
+    scalar = pc._compute_signals_scalar(prices, c24, c7)
+    for key in ("alert", "sentiment", "plr_status"):
+        assert batch[key].tolist() == scalar[key], key
+    for key in ("projection", "limit", "plr_hours"):
+        assert all(_same(a, b) or math.isclose(a, b, rel_tol=1e-12) for a, b in zip(batch[key].tolist(), scalar[key])), key
+
+
+def test_batch_matches_original_per_coin_functions():
+    prices, c24, c7 = _columns(seed=11)
+    batch = pc.compute_signals_batch(prices, c24, c7)
+    for i, (price, d24, d7) in enumerate(zip(prices, c24, c7)):
+        alert = pc.compute_alert(d24, d7)
+        assert pc.ALERT_LABELS[batch["alert"][i]] == alert
+        if d24 is not None and d7 is not None:
+            assert pc.SENTIMENT_LABELS[batch["sentiment"][i]] == pc.compute_technical_sentiment(d24, d7)
+        limit = price * (1 - pc.PLR_DISCOUNT) if alert == pc.ALERT_LABELS[pc.ALERT_DIP] and price is not None else None
+        assert pc.format_plr_hours(batch["plr_status"][i], batch["plr_hours"][i]) == pc.compute_time_to_plr(price, d24, limit)
+
+
+def test_dip_veto_and_indicator_overlay():
+    batch = pc.compute_signals_batch([100.0, 100.0], [-5.0, -5.0], [2.0, 2.0],
+                                     indicator_sentiment=[0, 1], dip_confirmed=[True, False])
+    assert batch["alert"].tolist() == [pc.ALERT_DIP, 0]
+    assert math.isclose(batch["limit"][0], 100.0 * (1 - pc.PLR_DISCOUNT))
+    assert math.isnan(batch["limit"][1])
+    assert batch["sentiment"][1] == 1
+
+
+def _chain(rules, default, c24, c7):
+    return pc._first_matching_rule(rules, (c24, c7)) or default
+
+
+@pytest.mark.parametrize("rules,default", [(pc.ALERT_RULES, 0), (pc.SENTIMENT_RULES, pc.SENTIMENT_DEFAULT)])
+def test_rule_table_matches_first_matching_rule(rules, default):
+    table = pc.RuleTable(rules, default)
+    rng = random.Random(3)
+    # Cada umbral, justo a cada lado y puntos al azar
+    edges = [t + d for t in THRESHOLDS for d in (-1e-9, 0.0, 1e-9)]
+    points = [(x, y) for x in edges for y in edges] + [(rng.gauss(0, 8), rng.gauss(0, 15)) for _ in range(2000)]
+    c24 = np.array([x for x, _ in points])
+    c7 = np.array([y for _, y in points])
+    codes = table.codes(c24, c7, np.ones(len(points), dtype=bool)).tolist()
+    for (x, y), code in zip(points, codes):
+        assert table.code(x, y) == code == _chain(rules, default, x, y), (x, y)
+
+
+def test_config_overrides_reach_the_tables():
+    rules = pc.signal_rules_from_config({"alerts": {"dip": [["24h", "<", -2.0], ["7d", ">", 0.0]]},
+                                         "sentiments": {"buy": [["24h", ">=", 1.0]]}, "plr_discount": 0.05})
+    assert rules.alerts.code(-3.0, 1.0) == pc.ALERT_DIP
+    assert pc.DEFAULT_SIGNAL_RULES.alerts.code(-3.0, 1.0) != pc.ALERT_DIP
+    assert pc.SENTIMENT_LABELS[rules.sentiments.code(1.0, -20.0)] == "COMPRA"
+    batch = pc.compute_signals_batch([100.0], [-3.0], [1.0], rules.plr_discount, rules=rules)
+    assert batch["alert"].tolist() == [pc.ALERT_DIP]
+    assert math.isclose(batch["limit"][0], 95.0)
+    for c24, c7 in [(-2.0, 0.0), (-2.0 - 1e-9, 1e-9), (1.0, -20.0), (0.999, 3.0)]:
+        assert rules.alerts.code(c24, c7) == _chain(rules.alert_rules, 0, c24, c7)
+        assert rules.sentiments.code(c24, c7) == _chain(rules.sentiment_rules, pc.SENTIMENT_DEFAULT, c24, c7)
+    assert pc.alert_code(-3.0, 1.0, rules) == pc.ALERT_DIP != pc.alert_code(-3.0, 1.0)
+    assert pc.compute_alert(-3.0, 1.0, rules=rules) == pc.ALERT_LABELS[pc.ALERT_DIP]
+    assert pc.compute_technical_sentiment(1.0, -20.0, rules=rules) == "COMPRA" != pc.compute_technical_sentiment(1.0, -20.0)
+    assert pc.sentiment_code(None, 1.0, rules) == pc.alert_code(1.0, None) == 0
+
+
+def test_replay_uses_config_rules():
+    rules = pc.signal_rules_from_config({"alerts": {"dip": [["24h", "<", -2.0], ["7d", ">", 0.0]]}})
+    counts = []
+    for rules_used in (None, rules):
+        backtester = pc.Backtester(interval=60, rules=rules_used)
+        backtester.feed(0.0, ["bitcoin"], [100.0], [-3.0], [1.0])
+        counts.append(int(backtester.entries[pc.ALERT_DIP]))
+    assert counts == [0, 1]
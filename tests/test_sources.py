@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+import price_checker as pc
+
+
+def _ticker_source():
+    source = pc.CoinbaseTickerSource(pc.RestPollingSource(None, "bitcoin,tether", "usd", 60))
+    source._products = {"BTC-USD": "bitcoin", "BTC-USDT": "bitcoin", "USDT-USD": "tether"}
+    return source
+
+
+def test_rejection_blacklists_only_the_named_product():
+    source = _ticker_source()
+    source._on_message(json.dumps({"type": "error", "message": "Failed to subscribe", "reason": "BTC-USDT is not a valid product"}))
+    assert source._rejected == {"BTC-USDT"}
+
+
+def test_rejection_of_unknown_product_is_ignored():
+    source = _ticker_source()
+    source._on_message(json.dumps({"type": "error", "message": "Failed to subscribe", "reason": "BTC-US is not a valid product"}))
+    assert source._rejected == set()
+
+
+def test_sources_must_implement_their_fetch_methods():
+    class Incomplete(pc.ExchangeQuotes):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        pc.PriceSource()
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ("numpy._core", "http.server", "socketserver", "multiprocessing", "tracemalloc", "tomllib", "ctypes", "orjson")
+
+
+def test_import_defers_optional_subsystems():
+    code = ("import sys, price_checker; "
+            f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_lazy_numpy_loads_on_first_use():
+    pytest.importorskip("numpy")
+    import price_checker as pc
+    signals = pc.compute_signals([100.0, 50.0], [-6.0, 1.0], [-20.0, 2.0])
+    assert list(signals["alert"]) == [pc.alert_code(-6.0, -20.0), pc.alert_code(1.0, 2.0)]
+    assert pc.tick_dtype().names == ("ts", "coin", "price", "change_24h", "change_7d")
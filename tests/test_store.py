@@ -0,0 +1,42 @@
+import pytest
+
+import price_checker as pc
+
+pytest.importorskip("numpy")
+
+
+def snapshot(*prices):
+    return [{"id": coin, "current_price": price, "price_change_percentage_24h_in_currency": 1.0,
+             "price_change_percentage_7d_in_currency": None}
+            for coin, price in zip(("bitcoin", "ethereum", "solana"), prices)]
+
+
+def test_append_rolls_over_into_new_segments(tmp_path):
+    store = pc.TickStore(str(tmp_path), segment_rows=4)
+    for ts in (1.0, 2.0, 3.0):
+        assert store.append(snapshot(ts, ts * 10, ts * 100), ts) == 3
+    store.close()
+    assert sorted(p.name for p in tmp_path.glob("ticks-*.bin")) == ["ticks-00000.bin", "ticks-00001.bin", "ticks-00002.bin"]
+    history = store.history("ethereum")
+    assert list(history["ts"]) == [1.0, 2.0, 3.0]
+    assert list(history["price"]) == [10.0, 20.0, 30.0]
+    assert [len(chunk) for chunk in store.scan(start=2.0, end=3.0)] == [1, 2]  # El tick 2 cruza dos segmentos
+
+
+def test_reopened_store_resumes_after_the_last_filled_row(tmp_path):
+    store = pc.TickStore(str(tmp_path), segment_rows=4)
+    store.append(snapshot(1.0, 2.0, 3.0), 1.0)
+    store.close()
+
+    reopened = pc.TickStore(str(tmp_path), segment_rows=4)
+    assert reopened.ids == ["bitcoin", "ethereum", "solana"]
+    reopened.append(snapshot(4.0, None, 6.0), 2.0)  # Sin precio no se escribe fila
+    assert list(reopened.history("bitcoin")["price"]) == [1.0, 4.0]
+    assert list(reopened.history("ethereum")["ts"]) == [1.0]
+    assert len(list(tmp_path.glob("ticks-*.bin"))) == 2
+
+
+def test_unknown_coin_and_empty_snapshot(tmp_path):
+    store = pc.TickStore(str(tmp_path), segment_rows=4)
+    assert store.append([{"id": "bitcoin", "current_price": None}], 1.0) == 0
+    assert len(store.history("dogecoin")) == 0
@@ -0,0 +1,33 @@
+import price_checker as pc
+
+
+class Response:
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class Http:
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, url, data=None, timeout=None):
+        return self.response
+
+
+def test_throttled_reply_uses_retry_after_from_body_or_header():
+    ok = Response(429, {"ok": False, "parameters": {"retry_after": 7}})
+    assert pc._post_telegram(Http(ok), "t", "c", "hi") == (False, 7.0)
+    for body in (ValueError("not json"), ["unexpected"], {"parameters": None}, {"parameters": {"retry_after": None}}):
+        assert pc._post_telegram(Http(Response(429, body, {"Retry-After": "3"})), "t", "c", "hi") == (False, 3.0)
+    assert pc._post_telegram(Http(Response(429, "busy")), "t", "c", "hi") == (False, 1.0)
+    assert pc._post_telegram(Http(Response(200, {"ok": True})), "t", "c", "hi") == (True, None)
@@ -0,0 +1,48 @@
+import math
+
+import price_checker as pc
+
+
+def tick(tracker, c24, c7=2.0, price=100.0, now=0.0, coin="bitcoin"):
+    signals = pc.compute_signals([price], [c24], [c7])
+    signals = {key: list(values) for key, values in signals.items()}
+    return signals, tracker.apply([coin], [price], [c24], [c7], signals, now=now)
+
+
+def alerts(transitions):
+    return [(t.previous, t.current) for t in transitions if t.field == "alert"]
+
+
+def test_entering_dip_is_reported_once():
+    tracker = pc.SignalStateTracker()
+    _, first = tick(tracker, -5.0)
+    _, second = tick(tracker, -5.0, now=10.0)
+    assert alerts(first) == [(0, pc.ALERT_DIP)] and alerts(second) == []
+    assert pc.entered_dip(first) == {"bitcoin"} and pc.entered_dip(second) == set()
+
+
+def test_threshold_noise_does_not_flap_inside_the_band():
+    tracker = pc.SignalStateTracker()
+    tick(tracker, -4.5)
+    for c24 in (-3.9, -3.5, -4.1, -3.2):  # Fuera de la regla cruda, dentro de la banda de 1 punto
+        signals, transitions = tick(tracker, c24)
+        assert alerts(transitions) == [] and signals["alert"][0] == pc.ALERT_DIP
+        assert math.isclose(signals["limit"][0], 100.0 * (1 - pc.PLR_DISCOUNT))
+    signals, transitions = tick(tracker, -2.5, now=60.0)
+    assert alerts(transitions) == [(pc.ALERT_DIP, 0)]
+    assert signals["alert"][0] == 0 and math.isnan(signals["limit"][0])
+
+
+def test_missing_data_keeps_the_previous_state():
+    tracker = pc.SignalStateTracker()
+    tick(tracker, -5.0)
+    assert tick(tracker, None)[1] == []  # Hueco de datos: sin transiciones
+    assert tracker.alert[tracker.index["bitcoin"]] == pc.ALERT_DIP
+
+
+def test_transitions_carry_time_in_state():
+    tracker = pc.SignalStateTracker()
+    tick(tracker, -5.0, now=100.0)
+    _, transitions = tick(tracker, 0.0, now=160.0)
+    exit_ = next(t for t in transitions if t.field == "alert")
+    assert (exit_.at, exit_.held_for) == (160.0, 60.0)
@@ -0,0 +1,60 @@
+import random
+
+import price_checker as pc
+
+
+def _coin(coin_id, market_cap, price=100.0, change_24h=1.0, change_7d=1.0):
+    return {
+        "id": coin_id,
+        "symbol": coin_id[:3],
+        "current_price": price,
+        "market_cap": market_cap,
+        "price_change_percentage_24h_in_currency": change_24h,
+        "price_change_percentage_7d_in_currency": change_7d,
+    }
+
+
+def _signals(data):
+    return pc.compute_signals(
+        [coin["current_price"] for coin in data],
+        [coin["price_change_percentage_24h_in_currency"] for coin in data],
+        [coin["price_change_percentage_7d_in_currency"] for coin in data],
+    )
+
+
+def test_sorted_index_incremental_updates_match_a_full_sort():
+    rng = random.Random(7)
+    keys = {f"c{i}": (rng.random(),) for i in range(200)}
+    index = pc.SortedIndex()
+    index.update(dict(keys))
+    for _ in range(50):
+        changed = {f"c{rng.randrange(200)}": (rng.random(),) for _ in range(3)}
+        keys.update(changed)
+        index.update(changed)
+    expected = [coin_id for _, coin_id in sorted(((key, coin_id) for coin_id, key in keys.items()), reverse=True)]
+    assert list(index.descending()) == expected
+
+
+def test_top_k_by_market_cap_only_reorders_changed_records():
+    data = [_coin(f"c{i}", market_cap=i) for i in range(10)]
+    view = pc.TableView(top=3)
+    assert [data[i]["id"] for i in view.select(data, _signals(data), {})] == ["c9", "c8", "c7"]
+
+    data[0] = _coin("c0", market_cap=100)
+    assert [data[i]["id"] for i in view.select(data, _signals(data), {})] == ["c0", "c9", "c8"]
+
+
+def test_filters_and_delta_sort():
+    data = [_coin("flat", 3), _coin("dip", 2, change_24h=-5.0, change_7d=2.0), _coin("jump", 1, price=150.0)]
+    signals = _signals(data)
+    assert pc.TableView(alerts=["DIP"]).select(data, signals, {}) == [1]
+    prev = {"flat": 100.0, "dip": 100.0, "jump": 100.0}
+    assert pc.TableView(top=1, sort_by="delta").select(data, signals, prev) == [2]
+
+
+def test_view_formats_only_visible_rows_but_keeps_every_buy_signal():
+    data = [_coin(f"c{i}", market_cap=100 - i) for i in range(5)]
+    data.append(_coin("dip", market_cap=1, change_24h=-5.0, change_7d=2.0))
+    result = pc.build_table(data, {}, "usd", view=pc.TableView(top=2))
+    assert [line.split()[1] for line in result["lines"][2:-1]] == ["C0", "C1"]
+    assert [signal["name"] for signal in result["buy_signals"]] == ["dip"]